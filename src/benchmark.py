@@ -0,0 +1,641 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Headless benchmark of the character controller.
+
+Each scenario builds a small level, places a headless character in it and
+drives it with scripted input for a fixed amount of frames. Every scenario
+runs in its own process, once for each chosen physics engine, as the engine
+is chosen at import time of the character controller. A scenario fails if
+the character didn't reach the state it is meant to measure or ended up
+outside of the expected area. Failed checks and scenarios are reported
+with their results while the others still run.
+
+Usage:
+    python benchmark.py --frames 600 --output result.json
+    python benchmark.py --baseline result.json --tolerance 0.15
+    python benchmark.py --physics internal
+
+The JSON written with --output can later be passed as --baseline to
+compare a new run against it. Before the scenarios, the checks make sure
+the controller behaves as expected. The script exits with 1 if any check
+failed or any value got worse than the baseline by more than the
+tolerance."""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+MAIN_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(MAIN_DIR, "..", "data", "config.json")
+
+PHYSICS = ("internal", "bullet")
+DEFAULT_PHYSICS = "both"
+PERCENTILES = (50, 90, 95, 99)
+FRAME_DT = 1.0 / 60.0
+# how far a replay may end from the recorded position
+REPLAY_TOLERANCE = 0.01
+
+# the values compared against the baseline, lower is better for all
+COMPARED_VALUES = (
+    ("frame_ms", "p50"),
+    ("frame_ms", "p95"),
+    ("rays_per_frame", "mean"),
+    ("alloc_bytes_per_frame", "mean"))
+
+
+def percentile(values, p):
+    """Returns the p-th percentile of the values, interpolating linearly
+    between the closest ranks"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = (len(values) - 1) * p / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def summarize(values):
+    summary = {"mean": sum(values) / len(values) if values else 0.0}
+    for p in PERCENTILES:
+        summary["p{}".format(p)] = percentile(values, p)
+    summary["max"] = max(values) if values else 0.0
+    return summary
+
+
+#
+# LEVEL SETUP
+#
+class Scene:
+    """Builds the collision geometry of a scenario for the internal
+    physics or bullet"""
+    def __init__(self, useBullet):
+        self.useBullet = useBullet
+        self.root = render.attachNewNode("benchmark-level")
+        self.platforms = []
+        self.intervals = []
+        if useBullet:
+            from panda3d.bullet import BulletWorld
+            self.world = BulletWorld()
+            self.world.setGravity(0, 0, -9.81)
+            taskMgr.add(self.updateBullet, "task_benchmark_bullet", priority=-20)
+        else:
+            from panda3d.core import CollisionTraverser
+            from panda3d.physics import ForceNode, LinearVectorForce
+            base.enableParticles()
+            base.cTrav = CollisionTraverser("base collision traverser")
+            base.cTrav.setRespectPrevTransform(True)
+            gravityFN = ForceNode("world-forces")
+            self.root.attachNewNode(gravityFN)
+            gravityForce = LinearVectorForce(0, 0, -9.81)
+            gravityFN.addForce(gravityForce)
+            base.physicsMgr.addLinearForce(gravityForce)
+            self.world = base.cTrav
+        # long enough to not run off of it in any scenario
+        self.addBox("Ground", (0, 40, -0.5), (50, 100, 0.5))
+
+    def updateBullet(self, task):
+        # same stepping as in the demo
+        self.world.doPhysics(globalClock.getDt(), 10, 1.0/180.0)
+        return task.cont
+
+    def addBox(self, name, center, halfExtents, tags=None, parent=None, kinematic=False):
+        """Add a solid box with the given center and half extents"""
+        from panda3d.core import BitMask32, Point3, Vec3
+        if parent is None:
+            parent = self.root
+        if self.useBullet:
+            from panda3d.bullet import BulletRigidBodyNode, BulletBoxShape
+            node = BulletRigidBodyNode(name)
+            node.addShape(BulletBoxShape(Vec3(*halfExtents)))
+            node.setIntoCollideMask(BitMask32.allOn())
+            node.setKinematic(kinematic)
+            np = parent.attachNewNode(node)
+            np.setPos(*center)
+            self.world.attachRigidBody(node)
+        else:
+            from panda3d.core import CollisionNode, CollisionBox
+            np = parent.attachNewNode(CollisionNode(name))
+            np.node().addSolid(CollisionBox(Point3(*center), *halfExtents))
+        for key, value in (tags or {}).items():
+            np.setTag(key, value)
+        return np
+
+    def addPlatform(self, name, startPos, endPos, halfExtents, duration):
+        """Add a platform moving between the two positions"""
+        from direct.interval.IntervalGlobal import Sequence, Wait
+        platform = self.root.attachNewNode(name)
+        platform.setPos(*startPos)
+        self.addBox(name, (0, 0, 0), halfExtents, parent=platform, kinematic=True)
+        interval = Sequence(
+            platform.posInterval(duration, endPos),
+            Wait(1.0),
+            platform.posInterval(duration, startPos),
+            Wait(1.0))
+        interval.loop()
+        self.platforms.append(platform)
+        self.intervals.append(interval)
+        return platform
+
+
+#
+# SCENARIOS
+#
+# Each scenario builds its level and returns the start position of the
+# character and the scripted input events. An event is a tuple of the
+# frame it happens in, the action and its value. The character runs
+# along the positive Y axis when moving forward.
+#
+def flatRun(scene):
+    return (0, 0, 0), [
+        (0, "move", (0, -1, 0)),
+        (120, "sprint", True),
+        (360, "sprint", False)]
+
+def stairs(scene):
+    for step in range(12):
+        scene.addBox(
+            "Stair{}".format(step),
+            (0, 4 + step * 0.6, (step + 1) * 0.2 - 0.5),
+            (2, 0.3, 0.5))
+    # the bullet character slows down at every step, the top is long
+    # enough for both physics to stop on it after running up the stairs
+    scene.addBox("StairsTop", (0, 20, 1.2), (2, 9.1, 1.2))
+    return (0, 0, 0), [
+        (0, "move", (0, -1, 0)),
+        (220, "move", (0, 0, 0))]
+
+def movingPlatform(scene):
+    # jump onto the platform and ride it standing still, the idle state
+    # doesn't check for steps, so the ride depends on the landing
+    scene.addPlatform("FloatingPlatform0", (0, 0, 0.25), (0, 12, 0.25), (3, 3, 0.25), 8.0)
+    return (0, 0, 0.5), [
+        (0, "jump", True),
+        (5, "jump", False)]
+
+def wallRunCorridor(scene):
+    # the walls are within reach of the side rays, holding the action
+    # button after jumping starts the wall run
+    scene.addBox("WallLeft", (-1.2, 20, 2), (0.2, 18, 2))
+    scene.addBox("WallRight", (1.2, 20, 2), (0.2, 18, 2))
+    return (0.4, 0, 0), [
+        (0, "move", (0, -1, 0)),
+        (0, "sprint", True),
+        (90, "jump", True),
+        (95, "jump", False),
+        (100, "intel-action", True),
+        (200, "intel-action", False)]
+
+def ledgeGrab(scene):
+    # the top of the ledge is in reach of the ledge detection ray, so
+    # walking against it with the action button held grabs it. Jumping
+    # pulls the character up onto the ledge where it stops.
+    scene.addBox("Ledge", (0, 7, 0.8), (3, 2, 0.8))
+    return (0, 0, 0), [
+        (0, "move", (0, -1, 0)),
+        (60, "intel-action", True),
+        (300, "intel-action", False),
+        (300, "jump", True),
+        (305, "jump", False),
+        (360, "move", (0, 0, 0))]
+
+def climbWall(scene):
+    scene.addBox(
+        "ClimbWall", (0, 3, 2), (3, 0.2, 2),
+        tags={"Type": "climbable", "Direction": "both"})
+    return (0, 0, 0), [
+        (0, "move", (0, -1, 0)),
+        (0, "intel-action", True),
+        (60, "intel-action", False),
+        (240, "move", (1, 0, 0)),
+        (360, "move", (0, -1, 0))]
+
+SCENARIOS = {
+    "flat_run": flatRun,
+    "stairs": stairs,
+    "moving_platform": movingPlatform,
+    "wall_run_corridor": wallRunCorridor,
+    "ledge_grab": ledgeGrab,
+    "climb_wall": climbWall,
+}
+
+def perSecond(speed):
+    """Return a bound for the distance covered with the given speed in
+    units per second, which grows with the simulated time"""
+    return lambda seconds: speed * seconds
+
+# A scenario only measures its feature if the character got there, so
+# each one names a state that has to be reached and the bounds the end
+# position has to be in. The distance of running characters depends on
+# the amount of frames and is bound by their speed instead.
+EXPECTATIONS = {
+    "flat_run": ("Sprint", (-2, perSecond(6), -0.1), (2, perSecond(11), 0.1)),
+    "stairs": ("Idle", (-2, 10.9, 2.3), (2, 29.1, 2.5)),
+    "moving_platform": ("Land", (-3, 1, 0.4), (3, 12.5, 0.6)),
+    "wall_run_corridor": ("WallRun", (-1, perSecond(4), -0.1), (1, perSecond(11), 0.1)),
+    "ledge_grab": ("LedgeGrab", (-3, 5, 1.5), (3, 9, 1.7)),
+    # the climb state only lasts until the climb direction is known,
+    # which may happen within the same frame
+    "climb_wall": ("ClimbHorizontal", (-50, 3.2, -0.1), (50, perSecond(11), 0.1)),
+}
+
+def checkExpectations(physics, scenario, states, endPos, seconds):
+    """Return why the scenario didn't reach its expected state or ended
+    outside of its bounds after the given simulated time, or None if it
+    did"""
+    state, lower, upper = EXPECTATIONS[scenario]
+    if state not in states:
+        return "never reached the {} state, got {}".format(state, sorted(states))
+    for axis, value, low, high in zip("xyz", endPos, lower, upper):
+        if callable(low): low = low(seconds)
+        if callable(high): high = high(seconds)
+        if not low <= value <= high:
+            return "ended at {} {:.3f}, expected {:.3f} to {:.3f}".format(
+                axis, value, low, high)
+    return None
+
+
+#
+# CHECKS
+#
+# Checks make sure the controller behaves as expected rather than
+# measuring it. Each one gets the physics name and an empty scene to
+# build its level in and raises a CheckFailed error with the reason if
+# the controller misbehaves.
+#
+class CheckFailed(Exception):
+    pass
+
+def checkFreshStateRestore(physics, scene):
+    # a character has a complete state right after being spawned
+    character = createCharacter(scene)
+    character.startPlayer()
+    state = character.saveState()
+    character.restoreState(state)
+    if character.saveState() != state:
+        raise CheckFailed("restoring the state of a new character changed it")
+
+def checkFixedTimestepRun(physics, scene):
+    # the character is simulated at 60 Hz while rendering with a lower,
+    # the same and a higher frame rate. Once running on flat ground it
+    # has to keep running, no matter how many substeps a frame has.
+    from panda3d.core import ClockObject
+    globalClock.setMode(ClockObject.MNonRealTime)
+    for frameRate in (30.0, 60.0, 144.0):
+        character = createCharacter(
+            scene, fixed_timestep_enabled=True, fixed_timestep_rate=60.0)
+        character.startPlayer()
+        character.setStartPos((0, 0, 0))
+        character.inputPlugins[0].setMovementVec((0, -1, 0))
+        states = []
+        for frame in range(int(3 * frameRate)):
+            globalClock.setDt(1.0 / frameRate)
+            taskMgr.step()
+            states.append(character.state)
+        character.stopPlayer()
+        if "Run" not in states:
+            raise CheckFailed("never started running at {} fps".format(frameRate))
+        left = set(states[states.index("Run"):]) - {"Run"}
+        if left:
+            raise CheckFailed("left the run for {} at {} fps".format(sorted(left), frameRate))
+
+def checkRecordReplay(physics, scene):
+    # a recorded session played back from its first frame has to pass
+    # through the same states and end at the same position
+    from panda3d.core import ClockObject
+    from characterController.inputPlugins.plugReplay import Plugin as ReplayPlugin
+    globalClock.setMode(ClockObject.MNonRealTime)
+    globalClock.setDt(FRAME_DT)
+    character = createCharacter(scene)
+    character.startPlayer()
+    character.setStartPos((0, 0, 0))
+    inputPlugin = character.inputPlugins[0]
+    events = {
+        0: lambda: inputPlugin.setMovementVec((0, -1, 0)),
+        60: lambda: inputPlugin.setButton("jump", True),
+        63: lambda: inputPlugin.setButton("jump", False),
+        120: lambda: inputPlugin.setMovementVec((-1, -1, 0)),
+        150: lambda: inputPlugin.setButton("camera-left", 0.5),
+        180: lambda: inputPlugin.setMovementVec((0, 0, 0))}
+
+    with tempfile.NamedTemporaryFile(suffix=".ccir", delete=False) as recordingFile:
+        pass
+    try:
+        character.startInputRecording(recordingFile.name, 30)
+        recorded = []
+        for frame in range(240):
+            if frame in events:
+                events[frame]()
+            taskMgr.step()
+            recorded.append(character.state)
+        character.stopInputRecording()
+        recordedPos = character.main_node.getPos(render)
+
+        character.stopControl()
+        replay = ReplayPlugin(character, "replay")
+        replay.loadRecording(recordingFile.name)
+    finally:
+        os.remove(recordingFile.name)
+    if not any(frame[3][0] == 0.5 for frame in replay.recording.frames):
+        raise CheckFailed("the analog camera value hasn't been recorded")
+    replayed = []
+    while replay.playFrame():
+        replayed.append(character.state)
+    replay.stopReplay()
+    replayedPos = character.main_node.getPos(render)
+    character.stopPlayer()
+
+    if len(replayed) != len(recorded):
+        raise CheckFailed("replayed {} of {} frames".format(len(replayed), len(recorded)))
+    for frame, (state, replayedState) in enumerate(zip(recorded, replayed)):
+        if state != replayedState:
+            raise CheckFailed("replay was in {} instead of {} at frame {}".format(
+                replayedState, state, frame))
+    distance = (replayedPos - recordedPos).length()
+    if distance > REPLAY_TOLERANCE:
+        raise CheckFailed("replay ended {:.3f} units away from the recording".format(distance))
+
+CHECKS = {
+    "fresh_state_restore": checkFreshStateRestore,
+    "fixed_timestep_run": checkFixedTimestepRun,
+    "record_replay": checkRecordReplay,
+}
+
+def runCheck(physics, check):
+    """Run a single check in this process and return its result"""
+    scene = startEngine(physics)
+    try:
+        CHECKS[check](physics, scene)
+    except CheckFailed as error:
+        return {"failure": str(error)}
+    return {"failure": None}
+
+
+#
+# WORKER
+#
+def startEngine(physics):
+    """Start a headless ShowBase using the given physics engine and
+    return an empty scene for it"""
+    from panda3d.core import loadPrcFileData
+    loadPrcFileData("", """
+window-type none
+audio-library-name null
+model-path $MAIN_DIR
+notify-level warning
+""")
+    from direct.showbase.ShowBase import ShowBase
+
+    # the physics engine is chosen when the controller gets imported
+    import characterController.Config
+    characterController.Config.USEINTERNAL = physics == "internal"
+    characterController.Config.USEBULLET = physics == "bullet"
+
+    ShowBase()
+    return Scene(physics == "bullet")
+
+def createCharacter(scene, **configValues):
+    """Create a headless character in the given scene which has to be
+    built already. The keyword arguments override values of the config
+    file."""
+    from characterController.PlayerController import PlayerController
+    with open(CONFIG_FILE) as configFile:
+        config = json.load(configFile)
+    config["headless"] = True
+    config.update(configValues)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as configFile:
+        json.dump(config, configFile)
+    try:
+        character = PlayerController(scene.world, configFile.name)
+    finally:
+        os.remove(configFile.name)
+    for platform in scene.platforms:
+        character.registerPlatform(platform)
+    character.buildCollisionIndex(scene.root)
+    return character
+
+def runScenario(physics, scenario, frames, warmup, traceAllocations):
+    """Run a single scenario in this process and return its results"""
+    from panda3d.core import ClockObject
+
+    scene = startEngine(physics)
+    start, events = SCENARIOS[scenario](scene)
+    character = createCharacter(scene)
+    character.startPlayer()
+    character.setStartPos(start)
+
+    # count the rays that get cast
+    rays = [0]
+    if physics == "internal":
+        prepareRayTraversal = character.prepareRayTraversal
+        def countRays(ray_ids):
+            rays[0] += len(ray_ids)
+            prepareRayTraversal(ray_ids)
+        character.prepareRayTraversal = countRays
+    else:
+        rayTestClosest = scene.world.rayTestClosest
+        def countRays(*args):
+            rays[0] += 1
+            return rayTestClosest(*args)
+        class World:
+            def __getattr__(self, name):
+                return getattr(scene.world, name)
+        character.physic_world = World()
+        character.physic_world.rayTestClosest = countRays
+
+    inputPlugin = character.inputPlugins[0]
+    globalClock.setMode(ClockObject.MNonRealTime)
+    globalClock.setDt(FRAME_DT)
+    if traceAllocations:
+        tracemalloc.start()
+
+    frameTimes = []
+    rayCounts = []
+    allocBytes = []
+    states = set()
+    events = sorted(events, key=lambda event: event[0])
+    for frame in range(warmup + frames):
+        while events and events[0][0] <= frame:
+            _, action, value = events.pop(0)
+            if action == "move":
+                inputPlugin.setMovementVec(value)
+            else:
+                inputPlugin.setButton(action, value)
+        rays[0] = 0
+        if traceAllocations:
+            tracemalloc.clear_traces()
+        globalClock.setDt(FRAME_DT)
+        frameStart = time.perf_counter()
+        taskMgr.step()
+        frameTime = time.perf_counter() - frameStart
+        if frame < warmup: continue
+        if traceAllocations:
+            allocBytes.append(tracemalloc.get_traced_memory()[1])
+        frameTimes.append(frameTime * 1000.0)
+        rayCounts.append(rays[0])
+        states.add(character.state)
+
+    endPos = character.main_node.getPos(render)
+
+    if traceAllocations:
+        tracemalloc.stop()
+        return {"alloc_bytes_per_frame": summarize(allocBytes)}
+    return {
+        "failure": checkExpectations(
+            physics, scenario, states, endPos, (warmup + frames) * FRAME_DT),
+        "frame_ms": summarize(frameTimes),
+        "rays_per_frame": summarize(rayCounts),
+        "states": sorted(states),
+        "end_pos": [round(v, 3) for v in endPos],
+    }
+
+
+#
+# RUNNER
+#
+def runWorker(physics, scenario, frames, warmup, traceAllocations=False):
+    """Run the scenario or check in a new process and return its results.
+    If the process failed, only the failure is returned."""
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--worker", physics, scenario,
+        "--frames", str(frames),
+        "--warmup", str(warmup)]
+    if traceAllocations:
+        command.append("--trace-allocations")
+    process = subprocess.run(
+        command, cwd=MAIN_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    if process.returncode != 0:
+        # the last line of the traceback names the error
+        errors = process.stderr.strip().splitlines()
+        return {"failure": errors[-1] if errors else "exit code {}".format(process.returncode)}
+    # the result is the last line, everything before is engine output
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def compare(results, baseline, tolerance):
+    """Print the changes against the baseline and return the list of
+    values which got worse by more than the tolerance"""
+    regressions = []
+    for physics, scenarios in results.items():
+        for scenario, values in scenarios.items():
+            base = baseline.get(physics, {}).get(scenario)
+            if base is None: continue
+            for group, key in COMPARED_VALUES:
+                new = values.get(group, {}).get(key)
+                old = base.get(group, {}).get(key)
+                if new is None or old is None: continue
+                change = (new - old) / old if old else 0.0
+                name = "{} {} {}.{}".format(physics, scenario, group, key)
+                flag = ""
+                if change > tolerance:
+                    flag = "  REGRESSION"
+                    regressions.append(name)
+                print("{:<60} {:>10.3f} -> {:>10.3f} {:>+7.1%}{}".format(name, old, new, change, flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless character controller benchmark")
+    parser.add_argument("--frames", type=int, default=600, help="measured frames per scenario")
+    parser.add_argument("--warmup", type=int, default=30, help="frames to run before measuring")
+    parser.add_argument("--physics", choices=PHYSICS + ("both",), default=DEFAULT_PHYSICS)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only the given scenarios")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the allocation tracing runs")
+    parser.add_argument("--check", action="append", choices=sorted(CHECKS), help="run only the given checks")
+    parser.add_argument("--no-checks", action="store_true", help="skip the checks")
+    parser.add_argument("--worker", nargs=2, metavar=("PHYSICS", "SCENARIO"), help=argparse.SUPPRESS)
+    parser.add_argument("--trace-allocations", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        physics, name = args.worker
+        if name in CHECKS:
+            result = runCheck(physics, name)
+        else:
+            result = runScenario(physics, name, args.frames, args.warmup, args.trace_allocations)
+        print(json.dumps(result))
+        return 0
+
+    physicsList = PHYSICS if args.physics == "both" else (args.physics,)
+    scenarios = args.scenario or list(SCENARIOS)
+    checks = [] if args.no_checks else args.check or list(CHECKS)
+    results = {}
+    checkResults = {}
+    failures = []
+    for physics in physicsList:
+        checkResults[physics] = {}
+        for check in checks:
+            result = runWorker(physics, check, args.frames, args.warmup)
+            checkResults[physics][check] = result
+            if result["failure"] is not None:
+                failures.append("{} {}".format(physics, check))
+                print("{:<9} {:<20} FAILED: {}".format(physics, check, result["failure"]))
+            else:
+                print("{:<9} {:<20} passed".format(physics, check))
+
+    for physics in physicsList:
+        results[physics] = {}
+        for scenario in scenarios:
+            result = runWorker(physics, scenario, args.frames, args.warmup)
+            if not args.no_allocations and "frame_ms" in result:
+                # traced separately as tracing slows down the frames
+                allocations = runWorker(physics, scenario, args.frames, args.warmup, True)
+                if "failure" in allocations:
+                    result["failure"] = result["failure"] or allocations["failure"]
+                else:
+                    result.update(allocations)
+            results[physics][scenario] = result
+            if "frame_ms" in result:
+                print("{:<9} {:<20} p50 {:7.3f} ms  p95 {:7.3f} ms  rays {:6.1f}/frame".format(
+                    physics, scenario,
+                    result["frame_ms"]["p50"], result["frame_ms"]["p95"],
+                    result["rays_per_frame"]["mean"]))
+            if result["failure"] is not None:
+                failures.append("{} {}".format(physics, scenario))
+                print("{:<9} {:<20} FAILED: {}".format(physics, scenario, result["failure"]))
+
+    output = {
+        "meta": {
+            "frames": args.frames,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+        "checks": checkResults,
+    }
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            json.dump(output, outputFile, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("{} values got worse than the baseline".format(len(regressions)))
+            return 1
+    if failures:
+        print("{} checks and scenarios failed".format(len(failures)))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -69,8 +69,8 @@ class Animator:
     def pauseAnimator(self):
         self.pre_pause_anim = self.getCurrentAnim()
         self.pre_pause_frame = self.getCurrentFrame(self.pre_pause_anim)
-        if self.current_seq:
-            self.current_seq.pause()
+        # the current sequence doesn't need to be paused, it only moves
+        # on with the updates of the character, see stepCurSeq
         # stop the current running animation
         self.stop()
 
@@ -79,9 +79,6 @@ class Animator:
         if self.pre_pause_anim is None: self.pre_pause_anim = self.IDLE
         self.pose(self.pre_pause_anim, self.pre_pause_frame)
         self.loop(self.pre_pause_anim, restart = False)
-        if self.current_seq:
-            if self.current_seq.getState() != Sequence.SFinal:
-                self.current_seq.resume()
 
     def cleanup(self):
         if self.pause_from_idle_task is not None:
@@ -96,7 +93,7 @@ class Animator:
             if anim in self.skip_play_rate_changes:
                 continue
             self.setPlayRate(rate, anim)
-            base.messenger.send(self.getConfig("audio_set_walk_playrate_evt"), [rate])
+            base.messenger.send(self.cfg.audio_set_walk_playrate_evt, [rate])
 
     def tryRequest(self, state):
         if self.state != self.STATE_JUMP and not self.isInTransition():
@@ -108,9 +105,7 @@ class Animator:
                     logging.exception("requested invalid state {} while in {}".format(state, self.state))
 
     def startCurSeq(self, animFrom, animTo, easeIn, easeOut, finalState):
-        if self.current_seq != None:
-            self.current_seq.finish()
-        self.current_seq = Sequence(
+        self.playCurSeq(Sequence(
             Func(self.enableBlend),
             Func(self.loop, animTo),
             Parallel(
@@ -118,8 +113,27 @@ class Animator:
                 easeIn),
             Func(self.stop, animFrom),
             Func(self.disableBlend),
-            Func(self.tryRequest, finalState))
-        self.current_seq.start()
+            Func(self.tryRequest, finalState)))
+
+    def playCurSeq(self, seq):
+        """Play the given sequence as the current one. It isn't started
+        with the clock but stepped by stepCurSeq with the time of the
+        movement updates, so the states it requests follow the simulated
+        time, even if the character is simulated manually."""
+        if self.current_seq is not None:
+            self.current_seq.finish()
+        self.current_seq = seq
+        seq.setT(0)
+
+    def stepCurSeq(self, dt):
+        """Move the current sequence on by dt seconds"""
+        seq = self.current_seq
+        if seq is None or seq.getState() == Sequence.SFinal: return
+        t = seq.getT() + dt
+        if t >= seq.getDuration():
+            seq.finish()
+        else:
+            seq.setT(t)
 
     def endCurSeq(self):
         if self.current_seq is not None:
@@ -133,16 +147,16 @@ class Animator:
     # NORMAL MOVEMENT STATES
     #
     def enterIdle(self):
-        base.messenger.send(self.getConfig("audio_stop_walk_evt"))
+        base.messenger.send(self.cfg.audio_stop_walk_evt)
         self.current_animations = [self.IDLE]
         if not self.getCurrentAnim() == self.IDLE:
             self.loop(self.IDLE)
 
         self.pause_from_idle_task = taskMgr.doMethodLater(
-            self.getConfig("idle_to_pause_time"),
+            self.cfg.idle_to_pause_time,
             base.messenger.send,
-            self.getConfig("idle_to_pause_task_name"),
-            extraArgs=[self.getConfig("idle_to_pause_event_name")])
+            self.plugin_getUniqueName(self.cfg.idle_to_pause_task_name),
+            extraArgs=[self.cfg.idle_to_pause_event_name])
 
     def exitIdle(self):
         taskMgr.remove(self.pause_from_idle_task)
@@ -163,37 +177,37 @@ class Animator:
             self.loop(self.SPRINT)
 
     def enterIdleToWalk(self):
-        base.messenger.send(self.getConfig("audio_play_walk_evt"))
+        base.messenger.send(self.cfg.audio_play_walk_evt)
         self.current_animations = [self.IDLE, self.WALK]
-        self.ease_out_idle.duration = self.getConfig("enter_walk_duration")
-        self.ease_in_walk.duration = self.getConfig("enter_walk_duration")
+        self.ease_out_idle.duration = self.cfg.enter_walk_duration
+        self.ease_in_walk.duration = self.cfg.enter_walk_duration
         self.startCurSeq(self.IDLE, self.WALK, self.ease_in_walk, self.ease_out_idle, self.STATE_WALK)
     def exitIdleToWalk(self):
         self.stop(self.IDLE)
         self.endCurSeq()
 
     def enterIdleToRun(self):
-        base.messenger.send(self.getConfig("audio_play_run_evt"))
+        base.messenger.send(self.cfg.audio_play_run_evt)
         self.current_animations = [self.IDLE, self.RUN]
-        self.ease_out_idle.duration = self.getConfig("enter_run_duration")
-        self.ease_in_run.duration = self.getConfig("enter_run_duration")
+        self.ease_out_idle.duration = self.cfg.enter_run_duration
+        self.ease_in_run.duration = self.cfg.enter_run_duration
         self.startCurSeq(self.IDLE, self.RUN, self.ease_in_run, self.ease_out_idle, self.STATE_RUN)
     def exitIdleToRun(self):
         self.stop(self.IDLE)
         self.endCurSeq()
 
     def enterIdleToSprint(self):
-        base.messenger.send(self.getConfig("audio_play_sprint_evt"))
+        base.messenger.send(self.cfg.audio_play_sprint_evt)
         self.current_animations = [self.IDLE, self.SPRINT]
-        self.ease_out_idle.duration = self.getConfig("enter_sprint_duration")
-        self.ease_in_sprint.duration = self.getConfig("enter_sprint_duration")
+        self.ease_out_idle.duration = self.cfg.enter_sprint_duration
+        self.ease_in_sprint.duration = self.cfg.enter_sprint_duration
         self.startCurSeq(self.IDLE, self.SPRINT, self.ease_in_sprint, self.ease_out_idle, self.STATE_SPRINT)
     def exitIdleToSprint(self):
         self.stop(self.IDLE)
         self.endCurSeq()
 
     def enterWalkToIdle(self):
-        base.messenger.send(self.getConfig("audio_play_walk_evt"))
+        base.messenger.send(self.cfg.audio_play_walk_evt)
         self.current_animations = [self.WALK, self.IDLE]
         self.ease_out_walk.duration = self.current_accleration/self.current_max_accleration
         self.ease_in_idle.duration = self.current_accleration/self.current_max_accleration
@@ -203,10 +217,10 @@ class Animator:
         self.endCurSeq()
 
     def enterWalkToRun(self):
-        base.messenger.send(self.getConfig("audio_play_run_evt"))
+        base.messenger.send(self.cfg.audio_play_run_evt)
         self.current_animations = [self.WALK, self.RUN]
-        self.ease_in_run.duration = self.getConfig("enter_run_duration")
-        self.ease_out_walk.duration = self.getConfig("enter_run_duration")
+        self.ease_in_run.duration = self.cfg.enter_run_duration
+        self.ease_out_walk.duration = self.cfg.enter_run_duration
         self.startCurSeq(self.WALK, self.RUN, self.ease_in_run, self.ease_out_walk, self.STATE_RUN)
     def exitWalkToRun(self):
         self.stop(self.WALK)
@@ -222,20 +236,20 @@ class Animator:
         self.endCurSeq()
 
     def enterRunToWalk(self):
-        base.messenger.send(self.getConfig("audio_play_walk_evt"))
+        base.messenger.send(self.cfg.audio_play_walk_evt)
         self.current_animations = [self.RUN, self.WALK]
-        self.ease_in_walk.duration = self.getConfig("enter_walk_duration")
-        self.ease_out_run.duration = self.getConfig("enter_walk_duration")
+        self.ease_in_walk.duration = self.cfg.enter_walk_duration
+        self.ease_out_run.duration = self.cfg.enter_walk_duration
         self.startCurSeq(self.RUN, self.WALK, self.ease_in_walk, self.ease_out_run, self.STATE_WALK)
     def exitRunToWalk(self):
         self.stop(self.RUN)
         self.endCurSeq()
 
     def enterRunToSprint(self):
-        base.messenger.send(self.getConfig("audio_play_sprint_evt"))
+        base.messenger.send(self.cfg.audio_play_sprint_evt)
         self.current_animations = [self.RUN, self.SPRINT]
-        self.ease_in_sprint.duration = self.getConfig("enter_sprint_duration")
-        self.ease_out_run.duration = self.getConfig("enter_sprint_duration")
+        self.ease_in_sprint.duration = self.cfg.enter_sprint_duration
+        self.ease_out_run.duration = self.cfg.enter_sprint_duration
         self.startCurSeq(self.RUN, self.SPRINT, self.ease_in_sprint, self.ease_out_run, self.STATE_SPRINT)
     def exitRunToSprint(self):
         self.stop(self.RUN)
@@ -251,35 +265,34 @@ class Animator:
         self.endCurSeq()
 
     def enterSprintToRun(self):
-        base.messenger.send(self.getConfig("audio_play_run_evt"))
+        base.messenger.send(self.cfg.audio_play_run_evt)
         self.current_animations = [self.WALK, self.RUN]
-        self.ease_in_run.duration = self.getConfig("enter_run_duration")
-        self.ease_out_sprint.duration = self.getConfig("enter_run_duration")
+        self.ease_in_run.duration = self.cfg.enter_run_duration
+        self.ease_out_sprint.duration = self.cfg.enter_run_duration
         self.startCurSeq(self.SPRINT, self.RUN, self.ease_in_run, self.ease_out_sprint, self.STATE_RUN)
     def exitSprintToRun(self):
         self.stop(self.SPRINT)
         self.endCurSeq()
 
     def enterJump(self):
-        base.messenger.send(self.getConfig("audio_stop_walk_evt"))
-        base.messenger.send(self.getConfig("audio_play_jump_evt"))
+        base.messenger.send(self.cfg.audio_stop_walk_evt)
+        base.messenger.send(self.cfg.audio_play_jump_evt)
         self.current_animations = [self.JUMP_START]
         if not self.getCurrentAnim() == self.JUMP_START:
-            self.current_seq = Sequence(
+            self.playCurSeq(Sequence(
                 self.actorInterval(self.JUMP_START, False),
-                Func(self.tryRequest, self.STATE_FALL))
-            self.current_seq.start()
+                Func(self.tryRequest, self.STATE_FALL)))
     def exitJump(self):
         self.endCurSeq()
 
     def enterFall(self):
-        base.messenger.send(self.getConfig("audio_stop_walk_evt"))
-        base.messenger.send(self.getConfig("audio_play_fall_evt"))
+        base.messenger.send(self.cfg.audio_stop_walk_evt)
+        base.messenger.send(self.cfg.audio_play_fall_evt)
         if self.getCurrentAnim() != self.FALL and self.getCurrentAnim() != self.JUMP_START:
             self.loop(self.FALL)
 
     def enterLand(self):
-        base.messenger.send(self.getConfig("audio_play_land_evt"))
+        base.messenger.send(self.cfg.audio_play_land_evt)
         self.current_animations = [self.JUMP_LAND]
         next_state = self.STATE_IDLE
         if self.pre_jump_state == self.STATE_RUN \
@@ -291,31 +304,30 @@ class Animator:
         or self.pre_jump_state == self.STATE_RUN_TO_WALK:
             self.LandToWalk()
         else:
-            self.current_seq = Sequence(
+            self.playCurSeq(Sequence(
                 self.actorInterval(self.JUMP_LAND, False),
-                Func(self.tryRequest, self.STATE_IDLE))
-            self.current_seq.start()
+                Func(self.tryRequest, self.STATE_IDLE)))
     def exitLand(self):
-        self.ease_in_walk.duration = self.getConfig("enter_walk_duration")
-        self.ease_in_run.duration = self.getConfig("enter_run_duration")
+        self.ease_in_walk.duration = self.cfg.enter_walk_duration
+        self.ease_in_run.duration = self.cfg.enter_run_duration
         self.endCurSeq()
 
     def LandToWalk(self):
-        base.messenger.send(self.getConfig("audio_play_walk_evt"))
+        base.messenger.send(self.cfg.audio_play_walk_evt)
         self.current_animations = [self.JUMP_LAND, self.WALK]
         self.ease_out_land.duration = 0.5
         self.ease_in_walk.duration = 0.5
         self.startCurSeq(self.JUMP_LAND, self.WALK, self.ease_in_walk, self.ease_out_land, self.STATE_WALK)
 
     def LandToRun(self):
-        base.messenger.send(self.getConfig("audio_play_run_evt"))
+        base.messenger.send(self.cfg.audio_play_run_evt)
         self.current_animations = [self.JUMP_LAND, self.RUN]
         self.ease_out_land.duration = 0.25
         self.ease_in_run.duration = 0.25
         self.startCurSeq(self.JUMP_LAND, self.RUN, self.ease_in_run, self.ease_out_land, self.STATE_RUN)
 
     def LandToSprint(self):
-        base.messenger.send(self.getConfig("audio_play_sprint_evt"))
+        base.messenger.send(self.cfg.audio_play_sprint_evt)
         self.current_animations = [self.JUMP_LAND, self.SPRINT]
         self.ease_out_land.duration = 0.25
         self.ease_in_sprint.duration = 0.25
@@ -0,0 +1,273 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PYTHON IMPORTS
+#
+import time
+
+#
+# CHARACTER SPECIFIC IMPORTS
+#
+from .Config import USEBULLET, USEINTERNAL
+from .PlayerController import PlayerController
+if USEBULLET:
+    from .PhysicsBullet import RayTraversal
+elif USEINTERNAL:
+    from .PhysicsInternal import RayTraversal
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+#
+# MULTI CHARACTER UPDATES
+#
+class CharacterManager:
+    """This class updates many characters in one task instead of one
+    movement task per character. The update is done in phases, each
+    phase is run for all characters before the next one starts:
+
+    input    - gather the input of all characters
+    physics  - one ray traversal for all characters
+    control  - movement logic and control plugins
+    position - write the new positions and request the FSM states
+
+    The time spent in each phase of the last update can be read with
+    getPhaseTimes and getCostPerCharacter.
+
+    Characters far away from the viewer can be updated less often, see
+    setLodDistances. The tiers are:
+
+    full      - updated every frame
+    half      - updated every 2nd frame
+    quarter   - updated every 4th frame
+    eighth    - updated every 8th frame
+    animation - not updated at all, only the current animation plays
+
+    Characters in the reduced tiers get the time of the skipped frames
+    added to their next update and their plugin rays are disabled unless
+    they are in a state of a plugin, like climbing. The amount of
+    characters in each tier can be read with getLodCounts."""
+
+    PHASES = ("input", "physics", "control", "position")
+
+    LOD_FULL = 0
+    LOD_HALF = 1
+    LOD_QUARTER = 2
+    LOD_EIGHTH = 3
+    LOD_ANIMATION = 4
+    LOD_NAMES = ("full", "half", "quarter", "eighth", "animation")
+    # update every n-th frame for each tier but the animation tier
+    LOD_INTERVALS = (1, 2, 4, 8)
+
+    def __init__(self, taskName="task_character_manager", taskPriority=-15, lodDistances=None, lodCenter=None):
+        self.characters = []
+        self.task_name = taskName
+        self.task_priority = taskPriority
+        # shared by all characters created through this manager
+        self.ray_traversal = RayTraversal()
+        self.platform_registry = None
+        self.collision_grid = None
+        # time in seconds spent in each phase in the last update
+        self.phase_times = dict.fromkeys(self.PHASES, 0.0)
+        # number of characters updated in the last update
+        self.updated_count = 0
+        # the upper distance of the full, half, quarter and eighth tier
+        self.lod_distances = None
+        self.lod_center = lodCenter
+        self.setLodDistances(lodDistances)
+        # number of characters in each tier in the last update
+        self.lod_counts = [0] * len(self.LOD_NAMES)
+        self.frame = 0
+
+    def createCharacter(self, physic_world, configFile, **kwargs):
+        """Create a new PlayerController which shares the ray traversal,
+        platform registry and collision grid of this manager and add it.
+        The collision index only has to be built for one of them."""
+        kwargs.setdefault("rayTraversal", self.ray_traversal)
+        kwargs.setdefault("platformRegistry", self.platform_registry)
+        kwargs.setdefault("collisionGrid", self.collision_grid)
+        character = PlayerController(physic_world, configFile, **kwargs)
+        if self.platform_registry is None:
+            self.platform_registry = character.platform_registry
+        if self.collision_grid is None and USEINTERNAL:
+            self.collision_grid = character.collision_grid
+        self.addCharacter(character)
+        return character
+
+    def addCharacter(self, character):
+        """Let this manager update the given character. Its own movement
+        task will be stopped."""
+        if character in self.characters: return
+        taskMgr.remove(character.plugin_getUniqueName("task_movement"))
+        character.character_manager = self
+        # spread the updates of characters in the same tier over the
+        # frames of the tiers interval
+        character.lod_offset = len(self.characters)
+        character.lod_tier = self.LOD_FULL
+        character.lod_dt = 0.0
+        character.lod_plugin_rays = True
+        self.characters.append(character)
+
+    def removeCharacter(self, character):
+        """Stop updating the given character. If its control is still
+        active, it will be updated by its own task again."""
+        if character not in self.characters: return
+        self.characters.remove(character)
+        self.setLodTier(character, self.LOD_FULL)
+        character.resumeRays()
+        character.character_manager = None
+        if character.control_active:
+            character.startControl()
+
+    def start(self):
+        """Start updating all characters of this manager"""
+        taskMgr.add(self.updateTask, self.task_name, priority=self.task_priority)
+
+    def stop(self):
+        taskMgr.remove(self.task_name)
+
+    def updateTask(self, task):
+        self.update(globalClock.getDt())
+        return task.cont
+
+    def update(self, dt):
+        """Run all update phases for all active characters which are due
+        in this frame"""
+        self.frame += 1
+        self.updateLod()
+
+        active = []
+        for character in self.characters:
+            if not character.control_active:
+                continue
+            if character.state_flags[character.state] & character.STATE_FLAG_IGNORE_INPUT \
+            or character.lod_tier == self.LOD_ANIMATION:
+                # not moved, but running transitions have to go on
+                character.stepCurSeq(dt)
+                continue
+            character.lod_dt += dt
+            if (self.frame + character.lod_offset) % self.LOD_INTERVALS[character.lod_tier]:
+                # not due in this frame
+                character.suspendRays()
+                continue
+            character.resumeRays()
+            active.append(character)
+        self.updated_count = len(active)
+
+        start = time.perf_counter()
+        for character in active:
+            character.updateInput(character.lod_dt)
+            character.lod_dt = 0.0
+        inputDone = time.perf_counter()
+
+        # with a shared ray traversal, the first call will traverse the
+        # rays of all characters and the others only their moved rays
+        for character in active:
+            if character.simulation_suspended:
+                # stepped manually, see Mover.stepMovement
+                character.invalidatePhysics()
+            character.updatePhysics()
+        physicsDone = time.perf_counter()
+
+        # the control phase runs per character. Most of its time goes to
+        # the state logic and plugins, the accleration, stamina and
+        # airborn timers are only a small part which isn't worth copying
+        # into NumPy arrays and back for every update.
+        for character in active:
+            character.updateControl()
+        controlDone = time.perf_counter()
+
+        for character in active:
+            character.updatePosition()
+            if character.simulation_suspended:
+                character.stepSimulation(character.dt)
+        positionDone = time.perf_counter()
+
+        self.phase_times["input"] = inputDone - start
+        self.phase_times["physics"] = physicsDone - inputDone
+        self.phase_times["control"] = controlDone - physicsDone
+        self.phase_times["position"] = positionDone - controlDone
+
+    #
+    # UPDATE LEVEL OF DETAIL
+    #
+    def setLodDistances(self, distances):
+        """Set the upper distances to the viewer of the full, half,
+        quarter and eighth update tier. Characters further away will
+        only play their animation. Pass None to update all characters
+        every frame."""
+        if distances is not None:
+            distances = tuple(distances)
+            if len(distances) != len(self.LOD_INTERVALS):
+                raise ValueError("Expected {} LOD distances, got {}".format(
+                    len(self.LOD_INTERVALS), len(distances)))
+        self.lod_distances = distances
+
+    def setLodCenter(self, center):
+        """Set the node the LOD distances are measured from, if not set
+        the camera will be used"""
+        self.lod_center = center
+
+    def getLodTier(self, distance):
+        """Returns the tier for a character at the given distance"""
+        if self.lod_distances is None:
+            return self.LOD_FULL
+        for tier, maxDistance in enumerate(self.lod_distances):
+            if distance <= maxDistance:
+                return tier
+        return self.LOD_ANIMATION
+
+    def updateLod(self):
+        """Put all characters into the tier of their current distance to
+        the LOD center"""
+        center = self.lod_center
+        if center is None:
+            center = base.camera
+        counts = [0] * len(self.LOD_NAMES)
+        for character in self.characters:
+            tier = self.LOD_FULL
+            if self.lod_distances is not None and center is not None:
+                tier = self.getLodTier(character.main_node.getDistance(center))
+            self.setLodTier(character, tier)
+            counts[tier] += 1
+        self.lod_counts = counts
+
+    def setLodTier(self, character, tier):
+        """Move the character into the given tier"""
+        if tier != character.lod_tier:
+            if tier == self.LOD_ANIMATION:
+                character.suspendSimulation()
+                character.suspendRays()
+                character.lod_dt = 0.0
+            elif character.lod_tier == self.LOD_ANIMATION:
+                character.resumeSimulation()
+                character.resumeRays()
+            character.lod_tier = tier
+
+        # the plugins need their rays to finish what they are doing
+        pluginRays = tier == self.LOD_FULL or character.state not in character.core_states
+        if pluginRays != character.lod_plugin_rays:
+            character.setPluginRaysEnabled(pluginRays)
+            character.lod_plugin_rays = pluginRays
+
+    def getLodCounts(self):
+        """Returns a dict with the amount of characters in each tier in
+        the last update"""
+        return dict(zip(self.LOD_NAMES, self.lod_counts))
+
+    def getPhaseTimes(self):
+        """Returns a dict with the seconds spent in each phase of the
+        last update"""
+        return dict(self.phase_times)
+
+    def getCostPerCharacter(self):
+        """Returns a dict with the average seconds each character took in
+        each phase of the last update"""
+        if self.updated_count == 0:
+            return dict.fromkeys(self.PHASES, 0.0)
+        return {phase: t / self.updated_count for phase, t in self.phase_times.items()}
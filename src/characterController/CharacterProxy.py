@@ -0,0 +1,236 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PYTHON IMPORTS
+#
+import collections
+import itertools
+import logging
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from direct.actor.Actor import Actor
+from direct.fsm.FSM import FSM
+from panda3d.core import Point3, Vec3
+
+#
+# CHARACTER SPECIFIC IMPORTS
+#
+from .Config import Config
+from .Animator import Animator
+from .PlayerController import PlayerController
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+# a position, heading and state of the character at the given time
+ProxySample = collections.namedtuple("ProxySample", "time pos heading state velocity")
+
+
+#
+# REMOTE CHARACTER PROXY
+#
+class CharacterProxy(FSM, Config, Actor, Animator):
+    """A character which is only displayed, like a remote player or an
+    NPC moved by an AI. It has no physics, rays, input or control
+    plugins, instead it gets samples of the position, heading and state
+    of the character it represents with addSample and plays the
+    animations of the same Animator FSM as the PlayerController.
+
+    The proxy is shown proxy_interpolation_delay seconds behind the
+    newest sample, so it can interpolate between the two samples around
+    that time. If no newer sample arrived in time, the position is
+    extrapolated with the last known velocity for at most
+    proxy_max_extrapolation_time seconds.
+
+    States of control plugins don't have animations on the proxy, it
+    keeps the animation of the previous state while in one of those,
+    unless an enter function for that state is added to it like the
+    plugins do on the PlayerController."""
+
+    # use the same animation and state names as the full character
+    IDLE = PlayerController.IDLE
+    WALK = PlayerController.WALK
+    RUN = PlayerController.RUN
+    SPRINT = PlayerController.SPRINT
+    JUMP_START = PlayerController.JUMP_START
+    JUMP_LAND = PlayerController.JUMP_LAND
+    FALL = PlayerController.FALL
+
+    STATE_IDLE = PlayerController.STATE_IDLE
+    STATE_IDLE_TO_WALK = PlayerController.STATE_IDLE_TO_WALK
+    STATE_IDLE_TO_RUN = PlayerController.STATE_IDLE_TO_RUN
+    STATE_IDLE_TO_SPRINT = PlayerController.STATE_IDLE_TO_SPRINT
+    STATE_WALK = PlayerController.STATE_WALK
+    STATE_WALK_TO_IDLE = PlayerController.STATE_WALK_TO_IDLE
+    STATE_WALK_TO_RUN = PlayerController.STATE_WALK_TO_RUN
+    STATE_RUN = PlayerController.STATE_RUN
+    STATE_RUN_TO_IDLE = PlayerController.STATE_RUN_TO_IDLE
+    STATE_RUN_TO_WALK = PlayerController.STATE_RUN_TO_WALK
+    STATE_RUN_TO_SPRINT = PlayerController.STATE_RUN_TO_SPRINT
+    STATE_SPRINT = PlayerController.STATE_SPRINT
+    STATE_SPRINT_TO_IDLE = PlayerController.STATE_SPRINT_TO_IDLE
+    STATE_SPRINT_TO_RUN = PlayerController.STATE_SPRINT_TO_RUN
+    STATE_JUMP = PlayerController.STATE_JUMP
+    STATE_LAND = PlayerController.STATE_LAND
+    STATE_FALL = PlayerController.STATE_FALL
+
+    # the states in which the animation speed follows the movement speed
+    # and the maximum accleration of them
+    MOVE_STATES = {
+        STATE_WALK: "max_accleration_walk",
+        STATE_RUN: "max_accleration_run",
+        STATE_SPRINT: "max_accleration_sprint"}
+    AIRBORN_STATES = (STATE_JUMP, STATE_FALL)
+
+    # used to give every proxy its own default ID
+    __instance_counter = itertools.count()
+
+    def __init__(self, configFile, proxyId=None):
+        logging.info("INIT CHARACTER PROXY...")
+        if proxyId is None:
+            proxyId = "proxy{}".format(next(CharacterProxy.__instance_counter))
+        self.controller_id = proxyId
+        Config.__init__(self, configFile)
+
+        # the samples ordered by time, the oldest ones get dropped
+        self.samples = collections.deque(maxlen=self.getConfig("proxy_sample_buffer_size"))
+        # the time of the samples the proxy is currently shown at
+        self.render_time = None
+        # the last state given by the samples which has been applied
+        self.sample_state = None
+        # used by the Animator to ease into the idle animations
+        self.current_accleration = 0.0
+        self.current_max_accleration = self.cfg.max_accleration_run
+
+        Actor.__init__(self, self.getConfig("model"))
+        self.setBlend(frameBlend=self.getConfig("enable_interpolation"))
+        self.loadAnims({
+            self.IDLE: self.getConfig("anim_idle"),
+            self.WALK: self.getConfig("anim_walk"),
+            self.RUN: self.getConfig("anim_run"),
+            self.SPRINT: self.getConfig("anim_sprint"),
+            self.JUMP_START: self.getConfig("anim_jumpstart"),
+            self.JUMP_LAND: self.getConfig("anim_jumpland"),
+            self.FALL: self.getConfig("anim_falling")})
+        self.bindAllAnims()
+        Animator.__init__(self)
+        FSM.__init__(self, "FSM-Proxy")
+        # the states are given by the samples, so any transition is fine
+        self.defaultTransitions = None
+        logging.info("INIT CHARACTER PROXY DONE")
+
+    def plugin_getUniqueName(self, name):
+        """Returns the given task or event name prefixed with the ID of
+        this proxy, so multiple proxies won't interfere"""
+        return "{}-{}".format(self.controller_id, name)
+
+    def startProxy(self):
+        """Show the proxy and start updating it every frame"""
+        self.reparentTo(render)
+        self.show()
+        taskMgr.add(self.updateTask, self.plugin_getUniqueName("task_proxy"), priority=-15)
+
+    def stopProxy(self):
+        """Stop the proxy and clean it up completely"""
+        taskMgr.remove(self.plugin_getUniqueName("task_proxy"))
+        Animator.cleanup(self)
+        Actor.cleanup(self)
+        self.removeNode()
+
+    def addSample(self, time, pos, heading, state, velocity=None):
+        """Add the position, heading and FSM state the character had at
+        the given time in seconds, e.g. as received from the network.
+        Without a velocity, it will be calculated from the previous
+        sample for extrapolation. Samples older than the newest one are
+        ignored."""
+        if self.samples and time <= self.samples[-1].time:
+            return
+        pos = Point3(pos)
+        if velocity is None:
+            if self.samples:
+                last = self.samples[-1]
+                velocity = (pos - last.pos) / (time - last.time)
+            else:
+                velocity = Vec3()
+        self.samples.append(ProxySample(time, pos, heading, state, Vec3(velocity)))
+        if self.render_time is None:
+            # show the first sample right away
+            self.render_time = time - self.cfg.proxy_interpolation_delay
+            self.applySample(self.samples[0], self.samples[0].pos, heading)
+
+    def clearSamples(self):
+        """Forget all samples, e.g. after the character got teleported"""
+        self.samples.clear()
+        self.render_time = None
+
+    def updateTask(self, task):
+        self.update(globalClock.getDt())
+        return task.cont
+
+    def update(self, dt):
+        """Move the proxy on by dt seconds along its samples"""
+        self.stepCurSeq(dt)
+        if not self.samples: return
+        self.render_time += dt
+        # stay about the delay behind the newest sample. Falling behind
+        # further or running out of the extrapolation time means the
+        # samples came in bursts or the senders clock jumped.
+        newest = self.samples[-1].time
+        if self.render_time < newest - 2 * self.cfg.proxy_interpolation_delay \
+        or self.render_time > newest + self.cfg.proxy_max_extrapolation_time:
+            self.render_time = newest - self.cfg.proxy_interpolation_delay
+
+        sample, nextSample = self.getSamplesAround(self.render_time)
+        if nextSample is None:
+            # dead reckoning from the last sample
+            elapsed = min(self.render_time - sample.time, self.cfg.proxy_max_extrapolation_time)
+            pos = sample.pos + sample.velocity * max(0.0, elapsed)
+            heading = sample.heading
+        else:
+            t = (self.render_time - sample.time) / (nextSample.time - sample.time)
+            t = min(max(t, 0.0), 1.0)
+            pos = sample.pos + (nextSample.pos - sample.pos) * t
+            # turn the shorter way round
+            turn = (nextSample.heading - sample.heading + 180.0) % 360.0 - 180.0
+            heading = sample.heading + turn * t
+        self.applySample(sample, pos, heading)
+
+    def getSamplesAround(self, time):
+        """Returns the last sample up to the given time and the one
+        following it, which is None if there is no newer sample"""
+        previous = self.samples[0]
+        for sample in itertools.islice(self.samples, 1, None):
+            if sample.time > time:
+                return previous, sample
+            previous = sample
+        return previous, None
+
+    def applySample(self, sample, pos, heading):
+        """Place the proxy and play the animations of the samples state"""
+        self.setPos(pos)
+        self.setH(heading)
+
+        if sample.state != self.sample_state:
+            if sample.state in self.AIRBORN_STATES \
+            and self.sample_state not in self.AIRBORN_STATES:
+                # the landing animation depends on the state before the jump
+                self.pre_jump_state = self.sample_state
+            self.sample_state = sample.state
+            if self.state != sample.state:
+                self.forceTransition(sample.state)
+
+        # the animation speed follows the horizontal speed
+        speed = sample.velocity.getXy().length()
+        if self.state in self.MOVE_STATES:
+            self.current_max_accleration = getattr(self.cfg, self.MOVE_STATES[self.state])
+            self.current_accleration = min(speed / self.cfg.speed, self.current_max_accleration)
+            if self.current_accleration > 0:
+                self.setCurrentAnimsPlayRate(self.current_accleration / self.current_max_accleration)
+        elif self.state not in self.AIRBORN_STATES:
+            self.current_accleration = min(speed / self.cfg.speed, self.current_max_accleration)
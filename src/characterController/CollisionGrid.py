@@ -0,0 +1,182 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PYTHON IMPORTS
+#
+import math
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from panda3d.core import NodePath, BitMask32
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+# set on the main node of every character, the collision nodes below
+# it move around and hence will not be indexed
+CHARACTER_TAG = "character_controller"
+
+
+#
+# SPATIAL INDEX OF STATIC COLLISION GEOMETRY
+#
+class CollisionGrid:
+    """A uniform grid on the X/Y plane over all static collision nodes
+    of a level. It is used to build small local subtrees around a given
+    position which can be traversed instead of the whole scene graph.
+
+    The collision nodes are not moved, they get instanced below holder
+    nodes which carry the net transform of the nodes original parent.
+    The local roots these holders get instanced to are stashed below
+    render, so they are neither rendered nor traversed by traversers
+    that run on render itself. A grid can be shared by many characters,
+    as long as each of them uses its own local root names."""
+
+    class LocalRoot:
+        def __init__(self, name):
+            self.np = render.attachNewNode(name)
+            self.np.stash()
+            # the range of cells currently attached to this root
+            self.cell_range = None
+            # the instances of the holders below this root by holder
+            self.holders = {}
+            # holders of dynamic nodes, like moving platforms, which
+            # will be kept attached and updated on each request
+            self.dynamic_holders = {}
+
+    def __init__(self, cellSize):
+        self.cell_size = float(cellSize)
+        # maps (x, y) cell indices to the holders of all collision
+        # nodes which overlap that cell
+        self.cells = {}
+        # collision nodes with infinite bounds, like planes, they will
+        # be part of every local root
+        self.unbounded = []
+        self.local_roots = {}
+        # set once the grid has been built, until then the characters
+        # traverse the whole scene graph
+        self.built = False
+
+    def build(self, levelRoot, ignore=None, cellSize=None):
+        """Index all collision nodes below levelRoot. Nodes that can't
+        be collided into, nodes of characters and nodes below any of the
+        node paths in the ignore list will be skipped."""
+        self.clear()
+        if cellSize is not None:
+            self.cell_size = float(cellSize)
+        if ignore is None:
+            ignore = []
+        for np in levelRoot.findAllMatches("**/+CollisionNode"):
+            if np.node().getIntoCollideMask() == BitMask32.allOff(): continue
+            if not np.findNetTag(CHARACTER_TAG).isEmpty(): continue
+            if any(i == np or i.isAncestorOf(np) for i in ignore): continue
+            self.addNode(np)
+        self.built = True
+
+    def addNode(self, np):
+        """Add a single static collision node to the grid"""
+        # the bounds of a node are given in the space of its parent
+        parentTransform = np.getParent().getNetTransform()
+        holder = NodePath("{}-grid-holder".format(np.getName()))
+        holder.setTransform(parentTransform)
+        np.instanceTo(holder)
+
+        bounds = np.node().getBounds()
+        if bounds.isInfinite():
+            self.unbounded.append(holder)
+            self.__invalidate()
+            return
+        if bounds.isEmpty(): return
+        bounds = bounds.makeCopy()
+        bounds.xform(parentTransform.getMat())
+        minX, minY, maxX, maxY = self.__getCellRange(bounds.getMin(), bounds.getMax())
+        for x in range(minX, maxX + 1):
+            for y in range(minY, maxY + 1):
+                self.cells.setdefault((x, y), []).append(holder)
+        self.__invalidate()
+
+    def clear(self):
+        """Remove all nodes from the grid"""
+        self.cells = {}
+        self.unbounded = []
+        for localRoot in self.local_roots.values():
+            localRoot.np.removeNode()
+        self.local_roots = {}
+        self.built = False
+
+    def removeLocalRoot(self, name):
+        """Remove the local root with the given name, e.g. when the
+        character using it is removed"""
+        localRoot = self.local_roots.pop(name, None)
+        if localRoot is not None:
+            localRoot.np.removeNode()
+
+    def getLocalRoot(self, name, pos, radius, dynamicRoots=None):
+        """Returns the root node of a subtree which contains all static
+        collision nodes within the given radius around pos as well as
+        the given dynamic nodes. Every name keeps its own local root, so
+        different checks won't replace each others subtrees."""
+        localRoot = self.local_roots.get(name)
+        if localRoot is None:
+            localRoot = self.LocalRoot(name)
+            self.local_roots[name] = localRoot
+
+        cellRange = self.__getCellRange(
+            (pos[0] - radius, pos[1] - radius),
+            (pos[0] + radius, pos[1] + radius))
+        if cellRange != localRoot.cell_range:
+            self.__attachCells(localRoot, cellRange)
+
+        if dynamicRoots is None:
+            dynamicRoots = []
+        self.__updateDynamicRoots(localRoot, dynamicRoots)
+        return localRoot.np
+
+    def __attachCells(self, localRoot, cellRange):
+        minX, minY, maxX, maxY = cellRange
+        holders = set(self.unbounded)
+        for x in range(minX, maxX + 1):
+            for y in range(minY, maxY + 1):
+                holders.update(self.cells.get((x, y), ()))
+        for holder in set(localRoot.holders) - holders:
+            localRoot.holders.pop(holder).removeNode()
+        # the holders are instanced, as the same holder can be part of
+        # the local roots of many checks and characters at once
+        for holder in holders - set(localRoot.holders):
+            localRoot.holders[holder] = holder.instanceTo(localRoot.np)
+        localRoot.cell_range = cellRange
+
+    def __updateDynamicRoots(self, localRoot, dynamicRoots):
+        dynamicNodes = set()
+        for root in dynamicRoots:
+            node = root.node()
+            dynamicNodes.add(node)
+            holder = localRoot.dynamic_holders.get(node)
+            if holder is None:
+                holder = localRoot.np.attachNewNode("{}-grid-holder".format(root.getName()))
+                root.instanceTo(holder)
+                localRoot.dynamic_holders[node] = holder
+            # dynamic nodes move around, so their parents transform has
+            # to be refreshed every time
+            if root.hasParent():
+                holder.setTransform(root.getParent().getNetTransform())
+        for node in list(localRoot.dynamic_holders.keys()):
+            if node not in dynamicNodes:
+                localRoot.dynamic_holders.pop(node).removeNode()
+
+    def __getCellRange(self, minPos, maxPos):
+        return (
+            int(math.floor(minPos[0] / self.cell_size)),
+            int(math.floor(minPos[1] / self.cell_size)),
+            int(math.floor(maxPos[0] / self.cell_size)),
+            int(math.floor(maxPos[1] / self.cell_size)))
+
+    def __invalidate(self):
+        # force all local roots to be rebuilt on the next request
+        for localRoot in self.local_roots.values():
+            localRoot.cell_range = None
@@ -1,7 +1,9 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import os
 import json
+import logging
 
 from panda3d.core import KeyboardButton, MouseButton, ButtonHandle, Point3F, Vec3
 from panda3d.core import InputDevice, Filename
@@ -19,6 +21,21 @@ USEINTERNAL = True
 # Bullet engine
 USEBULLET = not USEINTERNAL
 
+#
+# COMPILED CONFIGURATIONS
+#
+class ConfigValues:
+    """Base class of the compiled configurations. Config creates a
+    subclass of this with one slot per config key, so the values can be
+    read as plain attributes instead of looking them up by string."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join("{}={!r}".format(key, getattr(self, key)) for key in self.__slots__))
+
+
 #
 # PLAYER CONFIGURATIONS
 #
@@ -29,26 +46,183 @@ class Config:
     Most of the variables are set to represent a normal modern jump and
     run game feeling. Not to realistic but also not to floaty and should
     fit with characters created with measurements as 1 unit = 1 meter
+
+    All values can be read by name with getConfig or as attributes of
+    the compiled cfg object, e.g. self.cfg.deaccleration, which should
+    be preferred in code that runs every frame. Lists of three numbers
+    will be compiled to Vec3, which are shared and hence have to be
+    copied before they get changed.
+    Values in DERIVED_CONFIG are calculated from other values and only
+    available on cfg. Observers added with addConfigObserver will be
+    called whenever setConfig changes a value or a value derived of it.
+
+    With config_hot_reload enabled, the config file will be watched
+    while the player runs and changed values will be applied in place,
+    see startConfigWatcher.
     """
+
+    # name: (keys the value depends on, function to calculate the value
+    # given the cfg object)
+    DERIVED_CONFIG = {
+        "airborn_deaccleration": (
+            ("deaccleration", "jump_airborn_deaccleration_multiplier"),
+            lambda cfg: cfg.deaccleration * cfg.jump_airborn_deaccleration_multiplier),
+    }
+
     def __init__(self, configFile):
         # Make sure, the given path is in the correct form
         osSpecificConfigPath = Filename(configFile).toOsSpecific()
         with open(osSpecificConfigPath) as json_data_file:
             self.config = json.load(json_data_file)
+        self.config_file = osSpecificConfigPath
+        self.config_file_mtime = os.path.getmtime(osSpecificConfigPath)
+        # the values as they have been read from the file, used to only
+        # apply values changed in the file on reload and keep the ones
+        # changed at runtime otherwise
+        self.config_file_values = json.loads(json.dumps(self.config))
 
         self.used_device = None
         for device in base.devices.getDevices(InputDevice.DeviceClass.gamepad):
             if device.name == self.config["selectedDevice"]:
                 self.used_device = device
 
-        self.config["win_width_half"] = base.win.getXSize() // 2
-        self.config["win_height_half"] = base.win.getYSize() // 2
+        # without a window, e.g. with window-type none on a server, the
+        # character will run in headless mode
+        if base.win is None:
+            self.config["headless"] = True
+            self.config["win_width_half"] = 0
+            self.config["win_height_half"] = 0
+        else:
+            self.config["win_width_half"] = base.win.getXSize() // 2
+            self.config["win_height_half"] = base.win.getYSize() // 2
+
+        # callbacks by the config key they observe
+        self.config_observers = {}
+        # keys which have been changed since the last clearDirtyConfig
+        self.config_dirty = set()
+        self.compileConfig()
+
+    def compileConfig(self):
+        """Create the cfg object holding all config and derived values"""
+        keys = tuple(self.config) + tuple(
+            name for name in self.DERIVED_CONFIG if name not in self.config)
+        compiledClass = type("CompiledConfig", (ConfigValues,), {"__slots__": keys})
+        self.cfg = compiledClass()
+        self.config_slots = frozenset(keys)
+        for key, value in self.config.items():
+            setattr(self.cfg, key, self.__compileValue(value))
+
+        # the derived values to recalculate by the key they depend on
+        self.config_dependents = {}
+        for name, (dependencies, calculate) in self.DERIVED_CONFIG.items():
+            for key in dependencies:
+                self.config_dependents.setdefault(key, []).append(name)
+            setattr(self.cfg, name, calculate(self.cfg))
+
+    def __compileValue(self, value):
+        if isinstance(value, list) and len(value) == 3 \
+        and all(isinstance(v, (int, float)) for v in value):
+            return Vec3(*value)
+        return value
 
     def getConfig(self, configString):
         return self.config[configString]
 
     def setConfig(self, configString, value):
+        if configString in self.config and self.config[configString] == value:
+            # nothing changed, so no one needs to know
+            return
         self.config[configString] = value
+        if configString not in self.config_slots:
+            self.compileConfig()
+        else:
+            setattr(self.cfg, configString, self.__compileValue(value))
+
+        changed = [configString]
+        for name in self.config_dependents.get(configString, ()):
+            setattr(self.cfg, name, self.DERIVED_CONFIG[name][1](self.cfg))
+            changed.append(name)
+        self.config_dirty.update(changed)
+        for key in changed:
+            # observers may remove themselves while being called
+            for callback in list(self.config_observers.get(key, ())):
+                callback(key, getattr(self.cfg, key))
+
+    def addConfigObserver(self, configString, callback):
+        """Call callback(key, value) whenever the config or derived
+        value with the given key gets changed"""
+        self.config_observers.setdefault(configString, []).append(callback)
+
+    def removeConfigObserver(self, configString, callback):
+        observers = self.config_observers.get(configString, [])
+        if callback in observers:
+            observers.remove(callback)
+
+    def isConfigDirty(self, configString):
+        """Returns True if the value with the given key has been changed
+        since the last call to clearDirtyConfig"""
+        return configString in self.config_dirty
+
+    def getDirtyConfig(self):
+        """Returns the keys of all values which have been changed since
+        the last call to clearDirtyConfig"""
+        return set(self.config_dirty)
+
+    def clearDirtyConfig(self):
+        self.config_dirty.clear()
+
+    def reloadConfig(self):
+        """Read the config file again and apply all values which have
+        been changed in the file since it has been read the last time.
+        Returns the keys of the changed values."""
+        try:
+            with open(self.config_file) as json_data_file:
+                fileValues = json.load(json_data_file)
+        except ValueError as e:
+            # probably saved while editing, keep the current values
+            logging.warning("Couldn't reload config file {}: {}".format(self.config_file, e))
+            return []
+        changed = [
+            key for key, value in fileValues.items()
+            if key not in self.config_file_values
+            or self.config_file_values[key] != value]
+        self.config_file_values = fileValues
+        for key in changed:
+            self.setConfig(key, fileValues[key])
+        if changed:
+            logging.info("Reloaded config values: {}".format(", ".join(changed)))
+            self.configReloaded(changed)
+        return changed
+
+    def configReloaded(self, changedKeys):
+        """Called after values have been changed by reloadConfig, override
+        this to recalculate anything that has been derived from the
+        config values outside of DERIVED_CONFIG"""
+        pass
+
+    def startConfigWatcher(self, interval=None):
+        """Check the config file for changes every interval seconds and
+        reload it if it has been modified"""
+        if interval is None:
+            interval = self.cfg.config_hot_reload_interval
+        self.stopConfigWatcher()
+        taskMgr.doMethodLater(
+            interval, self.__checkConfigFile,
+            self.plugin_getUniqueName("task_config_watcher"))
+
+    def stopConfigWatcher(self):
+        taskMgr.remove(self.plugin_getUniqueName("task_config_watcher"))
+
+    def __checkConfigFile(self, task):
+        try:
+            mtime = os.path.getmtime(self.config_file)
+        except OSError:
+            # the file may be replaced by the editor right now
+            return task.again
+        if mtime != self.config_file_mtime:
+            self.config_file_mtime = mtime
+            self.reloadConfig()
+        return task.again
 
     def saveConfig(self, configFile):
         # Make sure, the given path is in the correct form
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+#
+# CONTROL PLUGIN DISPATCH
+#
+class ControlPluginPipeline:
+    """This class holds the control plugins of a character by their
+    priority and keeps a flat list of calls for each phase of the
+    movement update, ordered by priority and holding only the active
+    plugins. The lists are only rebuilt when a plugin gets added,
+    removed or toggled, so the mover doesn't have to sort and filter
+    the plugins every frame.
+
+    A plugin can declare the phases it implements in a phases tuple,
+    e.g. phases = ("action", "moveRestriction"). It will not be called
+    in any other phase. Plugins without that tuple are called in every
+    phase they have a method for."""
+
+    PHASES = ("action", "useStamina", "moveRestriction")
+
+    def __init__(self, plugins=None):
+        # the key will be used for setting the priority and the value
+        # will be a list of plugins in that specific priority
+        self.plugins = {}
+        # the bound phase methods of all active plugins by phase name
+        self.calls = {phase: [] for phase in self.PHASES}
+        if plugins is not None:
+            for priority, pluginList in plugins.items():
+                for plugin in pluginList:
+                    self.plugins.setdefault(priority, []).append(plugin)
+        self.rebuild()
+
+    def addPlugin(self, plugin, priority):
+        """Add the plugin with the given priority, lower priorities will
+        be called first"""
+        self.plugins.setdefault(priority, []).append(plugin)
+        self.rebuild()
+
+    def removePlugin(self, plugin):
+        """Remove the plugin from all priorities"""
+        for priority in list(self.plugins):
+            if plugin in self.plugins[priority]:
+                self.plugins[priority].remove(plugin)
+                if not self.plugins[priority]:
+                    del self.plugins[priority]
+        self.rebuild()
+
+    def setPluginActive(self, plugin, active):
+        """Activate or deactivate the given plugin"""
+        plugin.active = active
+        self.rebuild()
+
+    def getPlugins(self):
+        """Returns all plugins ordered by their priority, including the
+        inactive ones"""
+        return [
+            plugin
+            for priority in sorted(self.plugins)
+            for plugin in self.plugins[priority]]
+
+    def getPhases(self, plugin):
+        """Returns the phases the given plugin will be called in"""
+        phases = getattr(plugin, "phases", self.PHASES)
+        return [phase for phase in phases if hasattr(plugin, phase)]
+
+    def rebuild(self):
+        """Recreate the call lists of all phases. This has to be called
+        if the plugins dict or the active flag of a plugin has been
+        changed directly."""
+        calls = {phase: [] for phase in self.PHASES}
+        for plugin in self.getPlugins():
+            if not plugin.active: continue
+            for phase in self.getPhases(plugin):
+                calls[phase].append(getattr(plugin, phase))
+        # update the lists in place, so references to them stay valid
+        for phase in self.PHASES:
+            self.calls[phase][:] = calls[phase]
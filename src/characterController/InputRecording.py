@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PYTHON IMPORTS
+#
+import struct
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from panda3d.core import Filename, Vec3
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+#
+# FILE LAYOUT
+#
+# All values are little endian. A recording starts with the header.
+# Then for every movement update there is one frame record, which is
+# preceded by a keyframe record every keyframe_interval frames. The
+# keyframes hold the state of the character as saved by saveState.
+MAGIC = b"CCIR"
+VERSION = 3
+# magic, version, keyframe interval, size of a saved state
+HEADER = struct.Struct("<4sBHI")
+RECORD_FRAME = b"F"
+RECORD_KEYFRAME = b"K"
+# dt, movement vector, camera rotation, camera buttons, button flags
+FRAME = struct.Struct("<d3f3f4fH")
+
+# the InputSnapshot buttons in the order of their flag bits
+BUTTONS = (
+    "sprint",
+    "walk",
+    "center_cam",
+    "jump",
+    "intel_action",
+    "action1")
+
+# the InputSnapshot camera buttons, these are stored with their value as
+# gamepads give analog values for them
+CAM_BUTTONS = (
+    "cam_left",
+    "cam_right",
+    "cam_up",
+    "cam_down")
+
+
+def getFrame(dt, snapshot):
+    """Returns the frame tuple of dt, movement vector, rotation vector,
+    camera button values and button flags for the given InputSnapshot"""
+    flags = 0
+    for bit, button in enumerate(BUTTONS):
+        if getattr(snapshot, button):
+            flags |= 1 << bit
+    camera = tuple(float(getattr(snapshot, button)) for button in CAM_BUTTONS)
+    return (dt, Vec3(snapshot.move_direction), Vec3(snapshot.rotation), camera, flags)
+
+
+def packFrame(frame):
+    """Returns the given frame tuple as bytes"""
+    dt, move, rotation, camera, flags = frame
+    return FRAME.pack(
+        dt,
+        move.x, move.y, move.z,
+        rotation.x, rotation.y, rotation.z,
+        *camera,
+        flags)
+
+
+def unpackFrame(data, offset=0):
+    """Returns the frame tuple packed at the given offset of data"""
+    values = FRAME.unpack_from(data, offset)
+    return (
+        values[0],
+        Vec3(*values[1:4]),
+        Vec3(*values[4:7]),
+        values[7:11],
+        values[11])
+
+
+#
+# INPUT RECORDING
+#
+class InputRecorder:
+    """Writes the input a character consumes in each movement update
+    together with the dt of that update to a binary file. Every
+    keyframe_interval frames the state of the character gets stored as
+    well, so a replay can start from there instead of the beginning."""
+
+    def __init__(self, core, filename, keyframeInterval):
+        self.core = core
+        self.keyframe_interval = max(1, keyframeInterval)
+        self.frame = 0
+        # reused for every keyframe
+        self.state_buffer = bytearray(core.getStateSize())
+        self.file = open(Filename(filename).toOsSpecific(), "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.keyframe_interval, len(self.state_buffer)))
+
+    def recordFrame(self, dt, snapshot):
+        """Store the input of the given InputSnapshot for a movement
+        update of dt seconds"""
+        if self.frame % self.keyframe_interval == 0:
+            self.file.write(RECORD_KEYFRAME)
+            self.file.write(self.core.saveState(self.state_buffer))
+        self.file.write(RECORD_FRAME)
+        self.file.write(packFrame(getFrame(dt, snapshot)))
+        self.frame += 1
+
+    def close(self):
+        self.file.close()
+
+
+class InputRecording:
+    """A recording as read from a file written by the InputRecorder.
+
+    frames    - a list of (dt, movement vector, rotation vector,
+                camera button values, flags)
+    keyframes - a dict of the saved states by the frame they have been
+                captured at"""
+
+    def __init__(self, filename):
+        with open(Filename(filename).toOsSpecific(), "rb") as recordingFile:
+            data = recordingFile.read()
+
+        magic, version, self.keyframe_interval, self.state_size = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a supported input recording".format(filename))
+        offset = HEADER.size
+
+        self.frames = []
+        self.keyframes = {}
+        end = len(data)
+        while offset < end:
+            record = data[offset:offset+1]
+            offset += 1
+            if record == RECORD_FRAME:
+                self.frames.append(unpackFrame(data, offset))
+                offset += FRAME.size
+            elif record == RECORD_KEYFRAME:
+                self.keyframes[len(self.frames)] = data[offset:offset+self.state_size]
+                offset += self.state_size
+            else:
+                raise ValueError("Broken input recording {} at byte {}".format(filename, offset-1))
+
+    def getKeyframeBefore(self, frame):
+        """Returns the number of the last frame up to the given one which
+        has a keyframe, or None if there is none"""
+        candidates = [key for key in self.keyframes if key <= frame]
+        if not candidates:
+            return None
+        return max(candidates)
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from panda3d.core import Vec3
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+#
+# PER FRAME INPUT
+#
+class InputSnapshot:
+    """The combined input of all active input plugins of a character for
+    one frame. It is collected once per frame and then read by the mover,
+    the control plugins and the camera, so every input plugin is only
+    asked once per frame and all of them see the same input.
+
+    The snapshot of a character is reused every frame, so don't keep a
+    reference to its vectors beyond the current frame."""
+
+    __slots__ = (
+        "frame",
+        "move_direction",
+        "rotation",
+        "sprint",
+        "walk",
+        "center_cam",
+        "jump",
+        "intel_action",
+        "action1",
+        "cam_left",
+        "cam_right",
+        "cam_up",
+        "cam_down")
+
+    def __init__(self):
+        # the frame this snapshot has been collected in
+        self.frame = -1
+        self.move_direction = Vec3()
+        self.rotation = Vec3()
+        self.reset()
+
+    def reset(self):
+        """Set all input back to not pressed"""
+        self.move_direction.set(0, 0, 0)
+        self.rotation.set(0, 0, 0)
+        self.sprint = False
+        self.walk = False
+        self.center_cam = False
+        self.jump = False
+        self.intel_action = False
+        self.action1 = False
+        self.cam_left = False
+        self.cam_right = False
+        self.cam_up = False
+        self.cam_down = False
+
+    def collect(self, plugins, frame):
+        """Gather the input of all active plugins of the given list. For
+        the movement and rotation vectors the value with the largest
+        amount of each axis is used, buttons are pressed if they are
+        pressed on any of the plugins."""
+        self.reset()
+        self.frame = frame
+        move_direction = self.move_direction
+        rotation = self.rotation
+        for plugin in plugins:
+            if not plugin.active: continue
+            plugin.centerGamepadAxes()
+            self.sprint = self.sprint or plugin.getSprintState()
+            self.walk = self.walk or plugin.getWalkState()
+            self.center_cam = self.center_cam or plugin.getCenterCamState()
+            self.jump = self.jump or plugin.getJumpState()
+            self.intel_action = self.intel_action or plugin.getIntelActionState()
+            self.action1 = self.action1 or plugin.getAction1State()
+            self.cam_left = self.cam_left or plugin.getCamButton("camera-left")
+            self.cam_right = self.cam_right or plugin.getCamButton("camera-right")
+            self.cam_up = self.cam_up or plugin.getCamButton("camera-up")
+            self.cam_down = self.cam_down or plugin.getCamButton("camera-down")
+
+            plugVec = plugin.getMovementVec()
+            for axis in range(3):
+                if abs(plugVec[axis]) > abs(move_direction[axis]):
+                    move_direction[axis] = plugVec[axis]
+
+            plugVec = plugin.getRotationVec()
+            for axis in range(3):
+                if abs(plugVec[axis]) > abs(rotation[axis]):
+                    rotation[axis] = plugVec[axis]
@@ -36,33 +36,58 @@ class Mover:
         # the actual accleration the character is at
         self.current_accleration = 0.0
         self.current_max_accleration = 0.0
+        # the accleration the movement input asks for in this frame
+        self.move_accleration = 0.0
         self.was_jumping = False
+        self.is_first_jump = True
+        self.is_airborn = False
+        self.pre_jump_state = self.STATE_IDLE
+        self.pre_jump_accleration = 0.0
         self.fall_time = 0.0
-        self.last_platform_position = None
-        self.last_platform_rotation = None
         self.update_speed = Point3()
         self.plugin_setMoveDirection(Vec3(0, 0, 0))
         self.cur_jump_press_time = 0.0
         # amount of stamina the player has left
-        self.stamina = self.getConfig("max_stamina")
+        self.stamina = self.cfg.max_stamina
         self.stamina_was_empty = False
 
         self.jump_direction = Vec3(0, 0, 0)
 
         self.last_platform_speed = Vec3(0)
 
+        # fixed timestep simulation, the time which hasn't been
+        # simulated yet and the poses of the last two simulation steps
+        # used to interpolate the visible pose in between
+        self.timestep_accumulator = 0.0
+        self.resetInterpolation()
+
+        # writes the consumed input to a file while recording
+        self.input_recorder = None
+
+        # set by the CharacterManager if it updates this character
+        self.character_manager = None
+        self.control_active = False
+
+        self.platform_speed = Vec3(0, 0, 0)
+        self.platform_rotation = 0.0
+
     def startControl(self):
         """Start the control module"""
-        taskMgr.add(self.move, "task_movement", priority=-15)
+        self.control_active = True
+        if self.character_manager is not None:
+            # the manager updates all its characters in one task
+            return
+        taskMgr.add(self.move, self.plugin_getUniqueName("task_movement"), priority=-15)
 
     def stopControl(self):
         """Stops the controller class"""
-        taskMgr.remove("task_movement")
+        self.control_active = False
+        taskMgr.remove(self.plugin_getUniqueName("task_movement"))
 
     def pauseControl(self):
         """Stops the controls from being usable by the gamer"""
         self.stopControl()
-        if self.state in self.on_ground_states:
+        if self.state_flags[self.state] & self.STATE_FLAG_ON_GROUND:
             self.current_accleration = 0.0
             self.current_max_accleration = 0.0
 
@@ -71,30 +96,132 @@ class Mover:
         self.fall_time = 0.0
         self.cur_jump_press_time = 0.0
         self.is_first_jump = True
-        if self.state in self.on_ground_states:
+        if self.state_flags[self.state] & self.STATE_FLAG_ON_GROUND:
             self.land()
         if self.was_jumping:
             self.was_jumping = False
             if self.move_key_pressed:
-                self.current_accleration = self.pre_jump_accleration * self.getConfig("jump_accleration_multiplier")
+                self.current_accleration = self.pre_jump_accleration * self.cfg.jump_accleration_multiplier
             else:
                 self.current_accleration = 0.0
-        self.setConfig("jump_strength", self.getConfig("jump_strength_default"))
+        self.setConfig("jump_strength", self.cfg.jump_strength_default)
         self.jump_direction = Vec3(0, 0, 0)
         self.last_platform_speed = Vec3(0, 0, 0)
 
     def move(self, task):
         """The main task for updating the players position according
-        to the keys pressed by the user"""
-        if self.state in self.ignore_input_states:
+        to the keys pressed by the user.
+        If the fixed timestep mode is enabled, the character will be
+        simulated in steps of a fixed length and the visible pose will
+        be interpolated between the last two simulated steps.
+        Characters taken out of the physics simulation, e.g. while their
+        input gets recorded, are stepped manually with stepMovement."""
+        update = self.stepMovement if self.simulation_suspended else self.updateMovement
+        if not self.cfg.fixed_timestep_enabled:
+            update(globalClock.getDt())
             return task.cont
 
-        # make sure the collisions are up to date
+        self.__restoreSimulationPose()
+
+        step = 1.0 / self.cfg.fixed_timestep_rate
+        self.timestep_accumulator += globalClock.getDt()
+        substeps = 0
+        while self.timestep_accumulator >= step:
+            if substeps >= self.cfg.fixed_timestep_max_substeps:
+                # we can't keep up, drop the time we are behind rather
+                # than slowing down even further
+                self.timestep_accumulator %= step
+                break
+            self.last_sim_pos = self.main_node.getPos(render)
+            self.last_sim_hpr = self.main_node.getHpr(render)
+            # the rays are only traversed once per frame, but the step
+            # check uses up the result of the foot ray, so it has to be
+            # traversed again for every substep to find the ground
+            self.markRayDirty(self.foot_ray_id)
+            update(step)
+            self.timestep_accumulator -= step
+            substeps += 1
+
+        self.__interpolatePose(self.timestep_accumulator / step)
+        return task.cont
+
+    def resetInterpolation(self):
+        """Drop the stored simulation poses, for example after the
+        character has been placed somewhere else, so the next frame
+        won't interpolate from the old position."""
+        self.last_sim_pos = None
+        self.last_sim_hpr = None
+        self.sim_pos = None
+        self.sim_hpr = None
+        self.interpolated_pos = None
+        self.interpolated_hpr = None
+
+    def __restoreSimulationPose(self):
+        """Place the character back at the pose of the last simulation
+        step. Changes that happened since the interpolated pose was set,
+        like the physics engine pushing the character, will be kept."""
+        if self.interpolated_pos is None: return
+        physicsShift = self.main_node.getPos(render) - self.interpolated_pos
+        physicsTurn = self.main_node.getHpr(render) - self.interpolated_hpr
+        self.main_node.setPos(render, self.sim_pos + physicsShift)
+        self.main_node.setHpr(render, self.sim_hpr + physicsTurn)
+        self.interpolated_pos = None
+        self.interpolated_hpr = None
+
+    def __interpolatePose(self, alpha):
+        """Set the visible pose of the character, and hence everything
+        attached to it like the camera, between the last two simulated
+        poses."""
+        self.sim_pos = self.main_node.getPos(render)
+        self.sim_hpr = self.main_node.getHpr(render)
+        if self.last_sim_pos is None:
+            self.last_sim_pos = self.sim_pos
+            self.last_sim_hpr = self.sim_hpr
+        pos = self.last_sim_pos + (self.sim_pos - self.last_sim_pos) * alpha
+        hpr = Vec3(self.last_sim_hpr)
+        for i in range(3):
+            # always turn the short way around
+            diff = (self.sim_hpr[i] - self.last_sim_hpr[i] + 180.0) % 360.0 - 180.0
+            hpr[i] += diff * alpha
+        self.main_node.setPos(render, pos)
+        self.main_node.setHpr(render, hpr)
+        self.interpolated_pos = self.main_node.getPos(render)
+        self.interpolated_hpr = self.main_node.getHpr(render)
+
+    def stepMovement(self, dt):
+        """Run one movement update of dt seconds with freshly tested rays
+        and step the physics of this character alone for the same time.
+        This is how characters taken out of the physics simulation are
+        simulated, so recordings, replays and predictions all step them
+        the same way."""
+        self.invalidatePhysics()
+        self.updateMovement(dt)
+        self.stepSimulation(dt)
+
+    def updateMovement(self, dt):
+        """Simulate the character for the given amount of seconds"""
+        if self.state_flags[self.state] & self.STATE_FLAG_IGNORE_INPUT:
+            if self.input_recorder is not None:
+                # the update still has to be replayed to keep its dt
+                self.input_recorder.recordFrame(dt, self.plugin_getInputSnapshot(True))
+            self.stepCurSeq(dt)
+            return
+
+        # make sure the collisions are up to date, this will only
+        # traverse all scheduled rays once a frame, even if the
+        # movement gets updated multiple times per frame
         self.updatePhysics()
 
+        self.updateInput(dt)
+        self.updateControl()
+        self.updatePosition()
+
+    def updateInput(self, dt):
+        """First step of a movement update. This resets the per frame
+        values and gathers the input of all active input plugins."""
         # reset some variables which should be fresh with every frame
-        self.dt = globalClock.getDt()
-        self.current_max_accleration = self.getConfig("max_accleration_run")
+        self.dt = dt
+        self.current_max_accleration = self.cfg.max_accleration_run
         self.rotation = None
         self.is_moving = self.current_accleration > 0
         self.is_airborn = False
@@ -105,54 +232,67 @@ class Mover:
 
         self.plugin_requestNewState(None)
 
-        self.do_sprint = False
-        self.do_walk = False
-        self.do_center_cam = False
-        self.do_jump = False
-        self.do_intel_action = False
-        self.do_pull_up = False
-        for plugin in self.inputPlugins:
-            if plugin.active:
-                plugin.centerGamepadAxes()
-                self.do_sprint = self.do_sprint or plugin.getSprintState()
-                self.do_walk = self.do_walk or plugin.getWalkState()
-                self.do_center_cam = self.do_center_cam or plugin.getCenterCamState()
-                self.do_jump = self.do_jump or plugin.getJumpState()
-                self.do_intel_action = self.do_intel_action or plugin.getIntelActionState()
-                self.do_pull_up = self.do_pull_up or plugin.getAction1State()
+        snapshot = self.plugin_getInputSnapshot(True)
+        self.do_sprint = snapshot.sprint
+        self.do_walk = snapshot.walk
+        self.do_center_cam = snapshot.center_cam
+        self.do_jump = snapshot.jump
+        self.do_intel_action = snapshot.intel_action
+        self.do_pull_up = snapshot.action1
+        if self.input_recorder is not None:
+            self.input_recorder.recordFrame(dt, snapshot)
+        # transitions waiting for an animation follow the movement
+        # updates, this has to be done after the keyframe got recorded
+        self.stepCurSeq(dt)
 
-        #
-        # CHECK IF PLAYER IS STILL AIRBORN
-        #
-        if self.state not in self.on_ground_states \
-        and self.state not in self.flying_states:
+        self.calcMoveDirection()
+
+    def updateControl(self):
+        """Second step of a movement update. This runs the movement
+        logic and all control plugins on the gathered input and the
+        current ray results."""
+        self.checkAirborn()
+        if self.is_airborn:
+            self.updateAirbornTimers()
+        self.checkMovementInput()
+        self.updateAccleration()
+        self.updateStates()
+        self.updateStamina(self.checkStaminaUse())
+        self.checkMoveRestrictions()
+
+    def checkAirborn(self):
+        """Check if the player is still airborn or has landed"""
+        if not self.state_flags[self.state] & self.STATE_FLAG_ON_GROUND \
+        and not self.state_flags[self.state] & self.STATE_FLAG_FLYING:
             # We are not on the ground and hence can't move
             self.is_airborn = True
-            if self.state in self.jump_and_fall_states:
-                self.fall_time += self.dt
-            # check if the player let go the jump key or the max jump
-            # time has been reached
-            if self.fall_time > self.getConfig("start_fall_time") \
-            and self.state != self.STATE_FALL \
-            and self.cur_jump_press_time > self.getConfig("max_jump_press_time"):
-                self.plugin_requestNewState(self.STATE_FALL)
-            self.cur_jump_press_time += self.dt
         else:
             # we probably landed somewhere
             self.resetAfterJump()
 
-        #
-        # PLAYER MOVEMENT
-        #
-        self.calcMoveDirection()
-
+    def updateAirbornTimers(self):
+        """Count the time the player is in the air and holds the jump
+        key and switch to falling if necessary"""
+        if self.state_flags[self.state] & self.STATE_FLAG_JUMP_AND_FALL:
+            self.fall_time += self.dt
+        # check if the player let go the jump key or the max jump
+        # time has been reached
+        if self.fall_time > self.cfg.start_fall_time \
+        and self.state != self.STATE_FALL \
+        and self.cur_jump_press_time > self.cfg.max_jump_press_time:
+            self.plugin_requestNewState(self.STATE_FALL)
+        self.cur_jump_press_time += self.dt
+
+    def checkMovementInput(self):
+        """Determine the heading, the accleration and the maximum
+        accleration the player should move with"""
         if self.was_jumping:
             # make sure the character is forced to jump for at least
             # a given minimum of jump time
-            self.do_jump = self.do_jump or self.cur_jump_press_time <= self.getConfig("min_jump_press_time")
+            self.do_jump = self.do_jump or self.cur_jump_press_time <= self.cfg.min_jump_press_time
 
-        if self.state in self.prevent_jump_states:
-            if self.prev_state not in self.flying_states:
+        if self.state_flags[self.state] & self.STATE_FLAG_PREVENT_JUMP:
+            if not self.state_flags[self.prev_state] & self.STATE_FLAG_FLYING:
                 self.do_jump = False
                 self.land()
                 self.doStep()
@@ -165,25 +305,21 @@ class Mover:
         # Stamina check
         #
         self.can_use_sprint = self.stamina > 0
-        if self.stamina_was_empty and self.stamina <= self.getConfig("min_stamina"):
+        if self.stamina_was_empty and self.stamina <= self.cfg.min_stamina:
             self.can_use_sprint = False
 
+        self.move_accleration = 0.0
         if self.is_airborn:
-            if self.current_accleration > 0:
-                # we are in the air, so deacclerate
-                self.current_accleration -= (self.getConfig("deaccleration") * self.getConfig("jump_airborn_deaccleration_multiplier")) * self.dt
-                if self.current_accleration < 0:
-                    self.current_accleration = 0
-                # calculate the players heading
             if not self.do_center_cam \
             and self.move_key_pressed \
-            and not self.getConfig("first_pserson_mode"):
+            and not self.cfg.first_pserson_mode:
+                # calculate the players heading
                 angle = math.atan2(self.plugin_getMoveDirection().getX(), self.plugin_getMoveDirection().getY())
                 self.rotation = angle * (180.0 / math.pi)
         elif self.move_key_pressed:
             self.is_moving = True
             if not self.do_center_cam \
-            and not self.getConfig("first_pserson_mode"):
+            and not self.cfg.first_pserson_mode:
                 # calculate the players heading
                 angle = math.atan2(self.plugin_getMoveDirection().getX(), self.plugin_getMoveDirection().getY())
                 self.rotation = angle * (180.0 / math.pi)
@@ -191,26 +327,17 @@ class Mover:
             # set the players accleration
             if self.do_sprint and self.can_use_sprint:
                 # sprint
-                accleration = self.getConfig("accleration_sprint")
-                self.current_max_accleration = self.getConfig("max_accleration_sprint")
+                accleration = self.cfg.accleration_sprint
+                self.current_max_accleration = self.cfg.max_accleration_sprint
             elif self.do_walk:
                 # walk
                 # set accleration
-                accleration = self.getConfig("accleration_walk")
-                self.current_max_accleration = self.getConfig("max_accleration_walk")
+                accleration = self.cfg.accleration_walk
+                self.current_max_accleration = self.cfg.max_accleration_walk
             else:
                 # run
-                accleration = self.getConfig("accleration_run")
-            accleration *= self.plugin_getMoveDirection().length()
-            # acclerate until we reached the maximum speed
-            if self.current_accleration < self.current_max_accleration:
-                self.current_accleration += accleration * self.dt
-                if self.current_accleration > self.current_max_accleration:
-                    self.current_accleration = self.current_max_accleration
-            elif self.current_accleration > self.current_max_accleration:
-                self.current_accleration -= self.getConfig("deaccleration") * self.dt
-                if self.current_accleration < self.current_max_accleration:
-                    self.current_accleration = self.current_max_accleration
+                accleration = self.cfg.accleration_run
+            self.move_accleration = accleration * self.plugin_getMoveDirection().length()
         elif self.current_accleration > 0:
             # Use a "move to idle" animation
             if self.state == self.STATE_WALK:
@@ -219,11 +346,35 @@ class Mover:
                 self.plugin_requestNewState(self.STATE_RUN_TO_IDLE)
             elif self.state == self.STATE_SPRINT:
                 self.plugin_requestNewState(self.STATE_SPRINT_TO_IDLE)
+
+    def updateAccleration(self):
+        """Acclerate or deacclerate the player as determined by
+        checkMovementInput"""
+        if self.is_airborn:
+            if self.current_accleration > 0:
+                # we are in the air, so deacclerate
+                self.current_accleration -= self.cfg.airborn_deaccleration * self.dt
+                if self.current_accleration < 0:
+                    self.current_accleration = 0
+        elif self.move_key_pressed:
+            # acclerate until we reached the maximum speed
+            if self.current_accleration < self.current_max_accleration:
+                self.current_accleration += self.move_accleration * self.dt
+                if self.current_accleration > self.current_max_accleration:
+                    self.current_accleration = self.current_max_accleration
+            elif self.current_accleration > self.current_max_accleration:
+                self.current_accleration -= self.cfg.deaccleration * self.dt
+                if self.current_accleration < self.current_max_accleration:
+                    self.current_accleration = self.current_max_accleration
+        elif self.current_accleration > 0:
             # deacclerate until we stopped completely again
-            self.current_accleration -= self.getConfig("deaccleration") * self.dt
+            self.current_accleration -= self.cfg.deaccleration * self.dt
             if self.current_accleration < 0:
                 self.current_accleration = 0
 
+    def updateStates(self):
+        """Request the movement states, run the control plugins and
+        calculate the jump and the movement speed"""
         #
         # PLAYER STATES
         #
@@ -290,15 +441,8 @@ class Mover:
         #
         # CALL ALL PLUGINS HERE
         #
-        skip = False
-        for key in sorted(self.controlPlugins):
-            plugins = self.controlPlugins[key]
-            for plugin in plugins:
-                if plugin.active:
-                    if plugin.action(self.do_intel_action):
-                        skip = True
-                        break
-            if skip:
+        for action in self.control_plugin_pipeline.calls["action"]:
+            if action(self.do_intel_action):
                 break
 
         #
@@ -308,38 +452,38 @@ class Mover:
         #
         # CALCULATE PLATFORM SPEED
         #
-        platform_speed = Vec3(0,0,0)
-        platform_rotation = 0.0
+        self.platform_speed = Vec3(0,0,0)
+        self.platform_rotation = 0.0
         if self.getActivePlatform() is not None:
-            platformPositionAbsolute = self.getActivePlatform().getPos()
-            # Character on moving platform
-            if self.last_platform_position is None:
-                self.last_platform_position = platformPositionAbsolute
-            platform_speed = platformPositionAbsolute - self.last_platform_position
-            self.last_platform_speed = platform_speed
-            self.last_platform_position = platformPositionAbsolute
-
-            if self.getConfig("respect_platform_rotation"):
-                if self.last_platform_rotation is None:
-                    self.last_platform_rotation = self.getActivePlatform().getH()
-                platform_rotation = self.getActivePlatform().getH() - self.last_platform_rotation
-                self.last_platform_rotation = self.getActivePlatform().getH()
+            # Character on moving platform, the registry samples each
+            # platform only once per frame for all characters
+            self.platform_speed = self.platform_registry.getPlatformVelocity(self.getActivePlatform())
+            if self.cfg.respect_platform_rotation:
+                self.platform_rotation = self.platform_registry.getPlatformRotation(self.getActivePlatform())
+
+            frame_dt = globalClock.getDt()
+            if frame_dt > 0 and self.dt != frame_dt:
+                # the platform movement is given per rendered frame, so
+                # spread it over the simulation steps of that frame
+                self.platform_speed *= self.dt / frame_dt
+                self.platform_rotation *= self.dt / frame_dt
+            self.last_platform_speed = self.platform_speed
 
         #
         # INITIATE JUMPING
         #
         if self.do_jump \
-        and self.getConfig("jump_enabled") \
-        and self.fall_time <= self.getConfig("jump_allow_after_fall_time"): #\
-            if self.STATE_JUMP in self.defaultTransitions[self.state]:
+        and self.cfg.jump_enabled \
+        and self.fall_time <= self.cfg.jump_allow_after_fall_time: #\
+            if self.isTransitionListed(self.STATE_JUMP):
                 self.was_jumping = True
                 self.is_airborn = True
                 self.pre_jump_state = self.state
                 self.pre_jump_accleration = self.current_accleration
                 self.plugin_requestNewState(self.STATE_JUMP)
                 self.cur_jump_press_time += self.dt
-            if self.cur_jump_press_time <= self.getConfig("max_jump_press_time"):
-                forward_speed = self.getConfig("speed") * self.current_accleration
+            if self.cur_jump_press_time <= self.cfg.max_jump_press_time:
+                forward_speed = self.cfg.speed * self.current_accleration
                 if self.is_first_jump == False:
                     # As we set the power of the forward force the first
                     # time and shouldn't speed up in mid air, we set the
@@ -350,7 +494,7 @@ class Mover:
                     # physical forces
                     self.land()
                 self.is_first_jump = False
-                if self.getConfig("platform_movement_affects_jump"):
+                if self.cfg.platform_movement_affects_jump:
                     self.doJump(forward_speed, self.jump_direction, self.last_platform_speed/self.dt)
                     self.last_platform_speed = Vec3(0)
                 else:
@@ -359,36 +503,38 @@ class Mover:
         #
         # CALCULATE MOVEMENT SPEED
         #
-        if self.is_airborn and self.state not in self.flying_states:
+        if self.is_airborn and not self.state_flags[self.state] & self.STATE_FLAG_FLYING:
             # character is jumping/falling/flying
             if self.move_key_pressed:
                 # move the player while he's airborn. As the current_acceleration
                 # can be 0, we check which speed is higher and move the player accordingly
                 self.current_speed = max(
-                    self.getConfig("speed_airborn") * self.dt,
-                    self.getConfig("speed") * self.current_accleration * self.dt)
+                    self.cfg.speed_airborn * self.dt,
+                    self.cfg.speed * self.current_accleration * self.dt)
                 self.update_speed = Point3(0, -self.current_speed, 0)
             else:
                 # No movement key was pressed, so move the player according
                 # to previous speed
-                self.current_speed = self.getConfig("speed") * self.current_accleration * self.dt
+                self.current_speed = self.cfg.speed * self.current_accleration * self.dt
                 self.update_speed = Point3(0, -self.current_speed, 0)
-        elif self.state not in self.flying_states:
+        elif not self.state_flags[self.state] & self.STATE_FLAG_FLYING:
             # normal walking/running
-            self.current_speed = self.getConfig("speed") * self.current_accleration * self.dt
+            self.current_speed = self.cfg.speed * self.current_accleration * self.dt
             self.update_speed = Point3(0, -self.current_speed, 0)
-        elif self.state in self.flying_states:
+        elif self.state_flags[self.state] & self.STATE_FLAG_FLYING:
             self.current_speed = Point3()
             self.update_speed = Point3()
             self.current_accleration = 0.0
-        if self.getConfig("first_pserson_mode"):
+        if self.cfg.first_pserson_mode:
             # as we don't rotate the character in first person mode, move
             # him in the direction of the movement vector
             self.update_speed = self.plugin_getMoveDirection() * self.update_speed.getY()
 
+    def checkStaminaUse(self):
+        """Returns True if the player uses stamina in this frame"""
         # check if we actually use stamina
         # 1. Player must be in a sprint state
-        use_stamina = self.state in self.sprint_states
+        use_stamina = self.hasStateFlag(self.STATE_FLAG_SPRINT)
         # 2. Player must not be in the air/hanging/flying/...
         use_stamina = use_stamina and not self.is_airborn
         # 3. Player must be sprinting
@@ -398,43 +544,39 @@ class Mover:
         # 5. Player must be moving
         use_stamina = use_stamina and self.is_moving
 
-        for key in sorted(self.controlPlugins):
-            plugins = self.controlPlugins[key]
-            for plugin in plugins:
-                if plugin.active:
-                    use_stamina = use_stamina or plugin.useStamina()
+        for useStamina in self.control_plugin_pipeline.calls["useStamina"]:
+            use_stamina = use_stamina or useStamina()
 
-        if use_stamina:
-            self.stamina -= self.getConfig("stamina_usage_per_second") * self.dt
+        return use_stamina
+
+    def updateStamina(self, useStamina):
+        """Use or regain stamina"""
+        if useStamina:
+            self.stamina -= self.cfg.stamina_usage_per_second * self.dt
             if self.stamina <= 0:
                 self.stamina_was_empty = True
-        elif self.stamina < self.getConfig("max_stamina"):
-            regain_stamina = self.dt * self.getConfig("stamina_recover_per_second_run")
-            if self.state in self.walk_states:
-                regain_stamina = self.dt * self.getConfig("stamina_recover_per_second_walk")
+        elif self.stamina < self.cfg.max_stamina:
+            regain_stamina = self.dt * self.cfg.stamina_recover_per_second_run
+            if self.state_flags[self.state] & self.STATE_FLAG_WALK:
+                regain_stamina = self.dt * self.cfg.stamina_recover_per_second_walk
             elif self.state is self.STATE_IDLE or self.STATE_FALL:
-                regain_stamina = self.dt * self.getConfig("stamina_recover_per_second_idle")
+                regain_stamina = self.dt * self.cfg.stamina_recover_per_second_idle
 
             self.stamina += regain_stamina
-            if self.stamina > self.getConfig("max_stamina"):
-                self.stamina = self.getConfig("max_stamina")
-            if self.stamina >= self.getConfig("min_stamina"):
+            if self.stamina > self.cfg.max_stamina:
+                self.stamina = self.cfg.max_stamina
+            if self.stamina >= self.cfg.min_stamina:
                 self.stamina_was_empty = False
 
-        #
-        # CHECK FOR PLUGINS MOVEMENT RESTRICTIONS
-        #
-        skip = False
-        for key in sorted(self.controlPlugins):
-            plugins = self.controlPlugins[key]
-            for plugin in plugins:
-                if plugin.active:
-                    if plugin.moveRestriction():
-                        skip = True
-                        break
-            if skip:
+    def checkMoveRestrictions(self):
+        """Let the control plugins restrict the movement"""
+        for moveRestriction in self.control_plugin_pipeline.calls["moveRestriction"]:
+            if moveRestriction():
                 break
 
+    def updatePosition(self):
+        """Last step of a movement update. This writes the new position
+        and heading of the character and requests the new FSM state."""
         #
         # UPDATE IN THE PHYSICS CLASS
         #
@@ -444,23 +586,18 @@ class Mover:
         # MOVE PLAYER WITH MOVING PLATFORM
         #
         # respect moving platforms
-        if self.getActivePlatform() is not None and not self.state in self.jump_and_fall_states:
+        if self.getActivePlatform() is not None and not self.state_flags[self.state] & self.STATE_FLAG_JUMP_AND_FALL:
             # now update the player position according to the platform
-            if self.state in self.flying_states:
-                self.updatePlayerPosFloating(platform_speed)
+            if self.state_flags[self.state] & self.STATE_FLAG_FLYING:
+                self.updatePlayerPosFloating(self.platform_speed)
             else:
-                self.updatePlayerPosFloatingFlyign(platform_speed)
+                self.updatePlayerPosFloatingFlyign(self.platform_speed)
 
             # check for the platforms self.rotation
-            if self.getConfig("respect_platform_rotation"):
-                self.updatePlayerHprFloating(platform_rotation, self.getActivePlatform())
-        else:
-            self.last_platform_position = None
-            self.last_platform_rotation = None
+            if self.cfg.respect_platform_rotation:
+                self.updatePlayerHprFloating(self.platform_rotation, self.getActivePlatform())
 
         #
         # REQUEST THE NEW FSM STATE
         #
         self.enterNewState()
-
-        return task.cont
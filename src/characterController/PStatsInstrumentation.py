@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from panda3d.core import PStatCollector
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+def timed(method, collector):
+    """Returns a function calling the given method while the collector
+    is started"""
+    start = collector.start
+    stop = collector.stop
+    def wrapper(*args, **kwargs):
+        start()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stop()
+    return wrapper
+
+
+class TimedProxy:
+    """Stands in for a backend object like a traverser or the bullet
+    world and times the given methods, all other attributes are taken
+    from the object itself"""
+    def __init__(self, target, collectors):
+        self._target = target
+        for name, collector in collectors.items():
+            setattr(self, name, timed(getattr(target, name), collector))
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+#
+# PSTATS INSTRUMENTATION
+#
+class PStatsInstrumentation:
+    """Times the phases of the character update with PStatCollectors,
+    so they show up in the Panda3D PStats server. The collectors are:
+
+    CharacterController:Input               - updateInput
+    CharacterController:Physics             - updatePhysics
+    CharacterController:Control             - updateControl
+    CharacterController:Control:<Plugin>:<Phase> - each plugin phase
+    CharacterController:Position            - updatePosition
+    CharacterController:Position:UpdatePlayerPos
+    CharacterController:Position:DoStep
+    CharacterController:FSM                 - state transitions
+    CharacterController:Animation           - animation sequences
+    CharacterController:Camera              - the camera update task
+    CharacterController:Backend:<Call>      - traverse, rayTestClosest
+                                              and contactTest
+
+    The collectors are shared by all characters. While disabled nothing
+    is changed on the character, so it doesn't cost anything. Enabling
+    it puts timing wrappers in place of the instrumented methods and
+    backend objects, disabling removes them again."""
+
+    PREFIX = "CharacterController"
+
+    # core methods and the collector they are timed with
+    CORE_METHODS = (
+        ("updateInput", "Input"),
+        ("updatePhysics", "Physics"),
+        ("updateControl", "Control"),
+        ("updatePosition", "Position"),
+        ("updatePlayerPos", "Position:UpdatePlayerPos"),
+        ("doStep", "Position:DoStep"),
+        ("request", "FSM"),
+        ("startCurSeq", "Animation"),
+        ("endCurSeq", "Animation"),
+        ("setCurrentAnimsPlayRate", "Animation"))
+
+    # backend objects of the physics modules and their timed methods
+    BACKEND_OBJECTS = (
+        ("ray_traversal", ("traverse",)),
+        ("rayCTrav", ("traverse",)),
+        ("stepCTrav", ("traverse",)),
+        ("futureCTrav", ("traverse",)),
+        ("physic_world", ("rayTestClosest", "contactTest")))
+
+    def __init__(self, core):
+        self.core = core
+        self.enabled = False
+        self.collectors = {}
+        # the objects and attribute names of all wrapped methods
+        self.wrapped = []
+        # the objects and attribute names of all proxied backends
+        self.proxied = []
+
+    def getCollector(self, name):
+        if name not in self.collectors:
+            self.collectors[name] = PStatCollector("{}:{}".format(self.PREFIX, name))
+        return self.collectors[name]
+
+    def enable(self):
+        """Put the timing wrappers in place"""
+        if self.enabled: return
+        self.enabled = True
+        for name, collectorName in self.CORE_METHODS:
+            self.wrapMethod(self.core, name, collectorName)
+        for attribute, methods in self.BACKEND_OBJECTS:
+            target = getattr(self.core, attribute, None)
+            if target is None: continue
+            methods = [method for method in methods if hasattr(target, method)]
+            if not methods: continue
+            setattr(self.core, attribute, TimedProxy(
+                target,
+                {method: self.getCollector("Backend:" + method) for method in methods}))
+            self.proxied.append((attribute, target))
+        for plugin in self.core.control_plugin_pipeline.getPlugins():
+            self.instrumentPlugin(plugin)
+        self.instrumentCamera()
+
+    def disable(self):
+        """Remove all timing wrappers again"""
+        if not self.enabled: return
+        self.enabled = False
+        for owner, name in reversed(self.wrapped):
+            del owner.__dict__[name]
+        self.wrapped = []
+        for attribute, target in self.proxied:
+            setattr(self.core, attribute, target)
+        self.proxied = []
+        self.core.control_plugin_pipeline.rebuild()
+        self.__updateCameraTask()
+
+    def wrapMethod(self, owner, name, collectorName):
+        """Time the method of the given object with the named collector"""
+        if name in owner.__dict__ or not hasattr(owner, name): return
+        setattr(owner, name, timed(getattr(owner, name), self.getCollector(collectorName)))
+        self.wrapped.append((owner, name))
+
+    def instrumentPlugin(self, plugin):
+        """Time each phase of the given control plugin with its own
+        collector"""
+        if not self.enabled: return
+        pluginName = plugin.__class__.__module__.rsplit(".", 1)[-1]
+        for phase in self.core.control_plugin_pipeline.getPhases(plugin):
+            self.wrapMethod(plugin, phase, "Control:{}:{}".format(pluginName, phase))
+        self.wrapMethod(plugin, "updateAnimations", "Animation")
+        self.core.control_plugin_pipeline.rebuild()
+
+    def instrumentCamera(self):
+        """Time the update of the current camera handler, this has to be
+        called again whenever the camera handler gets replaced"""
+        if not self.enabled: return
+        self.wrapMethod(self.core.camera_handler, "updateCamera", "Camera")
+        self.__updateCameraTask()
+
+    def __updateCameraTask(self):
+        # a running camera task still holds the method it was added with
+        if not hasattr(self.core.camera_handler, "updateCamera"): return
+        for task in taskMgr.getTasksNamed(self.core.plugin_getUniqueName("task_camActualisation")):
+            task.setFunction(self.core.camera_handler.updateCamera)
@@ -14,7 +14,6 @@ from panda3d.core import (
     Vec3,
     NodePath,
     BitMask32,
-    ModelRoot,
     TransformState,
     )
 from panda3d.bullet import (
@@ -30,17 +29,150 @@ See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 """
 
 
+#
+# CONTACT TRACKING
+#
+class ContactTracker:
+    """This class keeps track of the contacts of one node with others
+    over multiple frames. Contacts are stored by their (node, node) pair
+    so checking for new, still existing and lost contacts will only
+    need a few set operations per frame."""
+    def __init__(self, *names):
+        # the names will be used as prefixes for the events sent, each
+        # event will be sent once for every name
+        self.names = names
+        # maps the (node, node) pairs to the latest contact data
+        self.contacts = {}
+
+    def update(self, contacts):
+        """Update the tracker with the given dict mapping (node, node)
+        pairs to their contact data and returns three lists containing
+        the data of the entered, stayed and exited contacts"""
+        current = contacts.keys()
+        known = self.contacts.keys()
+        entered = [contacts[pair] for pair in current - known]
+        stayed = [contacts[pair] for pair in current & known]
+        exited = [self.contacts[pair] for pair in known - current]
+        self.contacts = contacts
+        return entered, stayed, exited
+
+    def sendEvents(self, contacts):
+        """Update the tracker with the given contacts and send the in,
+        again and out events for them. Events will be sent as
+        <name>-in and <name>-in-<other node name> similar to the
+        patterns used by the internal collision event handler."""
+        pairs = {}
+        for pair, data in contacts:
+            pairs[pair] = (pair[1].getName(), data)
+        entered, stayed, exited = self.update(pairs)
+        for name in self.names:
+            for into_name, data in entered:
+                base.messenger.send("{}-in".format(name), [data])
+                base.messenger.send("{}-in-{}".format(name, into_name), [data])
+            for into_name, data in stayed:
+                base.messenger.send("{}-again".format(name), [data])
+                base.messenger.send("{}-again-{}".format(name, into_name), [data])
+            for into_name, data in exited:
+                base.messenger.send("{}-out".format(name), [data])
+                base.messenger.send("{}-out-{}".format(name, into_name), [data])
+
+    def clear(self):
+        self.contacts = {}
+
+
+#
+# SHARED TICK CALLBACK
+#
+class TickDispatcher:
+    """A bullet world can only call one tick callback, so setting it
+    for every character would only leave the one of the last character.
+    This class registers one callback per world instead and calls the
+    tick callbacks of all characters living in that world."""
+    # maps the physic worlds to their dispatcher
+    dispatchers = {}
+
+    @classmethod
+    def getDispatcher(cls, world):
+        """Returns the dispatcher of the given world and creates it if
+        there is none yet"""
+        if world not in cls.dispatchers:
+            cls.dispatchers[world] = cls(world)
+        return cls.dispatchers[world]
+
+    def __init__(self, world):
+        self.world = world
+        self.members = []
+        self.world.setTickCallback(self.tick, False)
+
+    def addMember(self, physics):
+        if physics not in self.members:
+            self.members.append(physics)
+
+    def removeMember(self, physics):
+        if physics in self.members:
+            self.members.remove(physics)
+        if not self.members:
+            # nobody left to tick, release the world
+            self.world.clearTickCallback()
+            del self.dispatchers[self.world]
+
+    def tick(self, data):
+        for physics in self.members:
+            physics.tickCallback(data)
+
+
+#
+# SHARED RAY TESTS
+#
+class RayTraversal:
+    """Bullet version of the shared ray traversal. There is no traverser
+    to collect the rays in, but the rays which are always updated of
+    all members are tested in one pass per frame, so the characters
+    find the results stored by the time they request them. Pass one
+    instance to all characters which should share the pass, otherwise
+    each character will get its own."""
+    def __init__(self):
+        self.members = []
+        # the frame in which the rays have been tested the last time
+        self.frame = -1
+
+    def addMember(self, physics):
+        if physics not in self.members:
+            self.members.append(physics)
+
+    def removeMember(self, physics):
+        if physics in self.members:
+            self.members.remove(physics)
+
+    def traverse(self, frame):
+        """Test the rays of all members, this will only be done once for
+        the given frame."""
+        if frame == self.frame: return
+        self.frame = frame
+        for physics in self.members:
+            if physics.rays_suspended: continue
+            physics.testRays(physics.ray_ids + physics.ignore_ray_cycle)
+
+
 #
 # PHYSICS FUNCTIONS
 #
 class Physics:
     class Ray:
-        def __init__(self, point_a, point_b, parent):
+        def __init__(self, point_a, point_b, parent, max_age_frames=None, max_age_ms=None, priority=0):
             self.point_a = point_a
             self.point_b = point_b
             self.parent = parent
+            # Bullet rays are tested every frame or on request, hence
+            # these values are only stored to keep the same interface as
+            # the internal physics rays
+            self.max_age_frames = max_age_frames
+            self.max_age_ms = max_age_ms
+            self.priority = priority
 
-    def __init__(self):
+    def __init__(self, rayTraversal=None, collisionGrid=None):
+        # the collisionGrid is only used by the internal physics, bullet
+        # contact tests use the broadphase of the physics world
 
         self.char_collision_dict = {}
 
@@ -62,30 +194,63 @@ class Physics:
         self.raylist = {}
         self.ray_ids = []
         self.ignore_ray_cycle = []
-        point_a = Point3(0, 0, self.getConfig("player_height")/1.8)
-        point_b = Point3(0, 0, -self.getConfig("stepheight_down"))
+        # the frame in which the physics have been updated the last time
+        self.physics_frame = -1
+        # results of the ray tests done in the current frame stored by
+        # their ray id
+        self.ray_results = {}
+        self.ray_results_frame = -1
+        self.ray_stats = {"hit": 0, "miss": 0, "cached": 0}
+        # rays which won't be tested and have no result, see
+        # setRaysEnabled
+        self.disabled_rays = set()
+        self.rays_suspended = False
+        self.simulation_suspended = False
+        # set by toggleFlyMode, the body of a flying character is
+        # kinematic and gets moved directly instead of by the world
+        self.fly_mode = False
+        # the velocity of the character while it is suspended, the world
+        # would overwrite it on the kinematic body with every step
+        self.simulation_velocity = Vec3(0, 0, 0)
         self.foot_ray_id = "foot_ray_check"
-        self.registerRayCheck(self.foot_ray_id, point_a, point_b, self.main_node, True)
-
-        self.bodyCollisionList = []
-        self.eventCollisionList = []
+        if rayTraversal is None:
+            rayTraversal = RayTraversal()
+        self.ray_traversal = rayTraversal
+        self.ray_traversal.addMember(self)
+        self.setupRays()
+
+        # the body contacts are only of interest for this character while
+        # the event sphere events are also sent without the controller
+        # ID for the application to listen to
+        self.bodyContactTracker = ContactTracker(self.plugin_getUniqueName("charBody"))
+        self.eventContactTracker = ContactTracker(
+            self.cfg.char_collision_name,
+            self.plugin_getUniqueName(self.cfg.char_collision_name))
 
     def startPhysics(self):
         """Start and set up the remaining physics parts of the character
         Should be called at the character setup and base start method"""
 
         # some calculations for position and size of the characters body collision spheres
-        self.characterBodySphereRadius = self.getConfig("player_height") / 4.0
+        self.characterBodySphereRadius = self.cfg.player_height / 4.0
         r = self.characterBodySphereRadius
         # bottom sphere
         zA = r
         # top sphere
-        zB = self.getConfig("player_height") - r
+        zB = self.cfg.player_height - r
 
         # Main character spheres
         self.charCollisions = BulletRigidBodyNode("charBody")
         self.charCollisions.setKinematic(False)
-        self.charCollisions.setMass(1.0)#self.getConfig("player_mass"))
+        self.charCollisions.setMass(1.0)#self.cfg.player_mass)
+        # the movement is given by the velocity set with every tick, so
+        # the body neither needs friction, which would hold it on walls,
+        # nor may it be tilted by the world
+        self.charCollisions.setFriction(0)
+        self.charCollisions.setAngularFactor(Vec3(0, 0, 1))
+        # the body is driven by the input rather than by the world, so it
+        # must never be put to sleep
+        self.charCollisions.setDeactivationEnabled(False)
         self.charCollisions.addShape(
             BulletSphereShape(r),
             TransformState.makePos((0,0,zA)))
@@ -100,72 +265,118 @@ class Physics:
         self.charCollisions.setCcdSweptSphereRadius(r)
 
         # Create the big sphere around the caracter which can be used for special events
-        self.charEventCollisions = BulletGhostNode(self.getConfig("char_collision_name"))
+        self.charEventCollisions = BulletGhostNode(self.cfg.char_collision_name)
         self.eventCollider = self.main_node.attachNewNode(self.charEventCollisions)
         self.charEventCollisions.addShape(
-            BulletSphereShape(self.getConfig("player_height")/2.0),
-            TransformState.makePos((0, 0, self.getConfig("player_height")/2.0)))
+            BulletSphereShape(self.cfg.player_height/2.0),
+            TransformState.makePos((0, 0, self.cfg.player_height/2.0)))
         self.charEventCollisions.setIntoCollideMask(self.event_mask)
         self.physic_world.attachGhost(self.charEventCollisions)
 
-        self.accept("charBody-in", self.checkInBodyContact)
-        self.accept("charBody-out", self.checkOutBodyContact)
-        self.accept("{}-in".format(self.getConfig("char_collision_name")), self.checkCharCollisions)
-        self.accept("{}-out".format(self.getConfig("char_collision_name")), self.charOutCollisions)
+        self.accept(self.plugin_getUniqueName("charBody-in"), self.checkInBodyContact)
+        self.accept(self.plugin_getUniqueName("charBody-out"), self.checkOutBodyContact)
+        self.accept(self.plugin_getUniqueName("{}-in".format(self.cfg.char_collision_name)), self.checkCharCollisions)
+        self.accept(self.plugin_getUniqueName("{}-out".format(self.cfg.char_collision_name)), self.charOutCollisions)
 
         '''
         shapeHolder = NodePath("Bullet Shape Holder")
-        shapeHolder.setZ(self.getConfig("player_height")/2.0)
+        shapeHolder.setZ(self.cfg.player_height/2.0)
         shapeHolder.reparentTo(render)
         self.charFutureCollisions = shapeHolder.attachNewNode(BulletRigidBodyNode("charFutureBody"))
-        self.charFutureCollisions.node().addShape(BulletSphereShape(self.getConfig("player_height")/4.0))
+        self.charFutureCollisions.node().addShape(BulletSphereShape(self.cfg.player_height/4.0))
         self.charFutureCollisions.node().setIntoCollideMask(self.body_mask)
         '''
 
-        if self.getConfig("use_simple_shadow"):
+        if self.cfg.use_simple_shadow:
             self.shadow_ray_id = "shadow_ray_check"
             if self.shadow_ray_id not in self.raylist:
-                point_a = Point3(0, 0, self.getConfig("player_height")/1.8)
+                point_a = Point3(0, 0, self.cfg.player_height/1.8)
                 point_b = self.main_node.getPos()
                 point_b.setZ(point_b.getZ() - 10000)
                 self.registerRayCheck(self.shadow_ray_id, point_a, point_b, self.main_node)
 
         self.reparentTo(self.main_node)
 
-        self.physic_world.setTickCallback(self.tickCallback, False)
+        # the world only takes one tick callback for all characters
+        self.tick_dispatcher = TickDispatcher.getDispatcher(self.physic_world)
+        self.tick_dispatcher.addMember(self)
 
     def tickCallback(self, a):
+        if self.simulation_suspended:
+            # the character is moved by stepSimulation instead
+            return
         speed = self.speed
-        if speed is not None:
-            speed.setX(speed.getX()/(a.timestep/10))
-            speed.setY(speed.getY()/(a.timestep/10))
-            self.charCollisions.setLinearVelocity(speed)
+        if speed is not None and self.dt > 0:
+            # the horizontal speed is the distance to move in this frame
+            # while the vertical velocity has been set by updatePlayerPos
+            # and gains the gravity of every substep. This is called for
+            # every substep, so self.speed must not be changed in here.
+            self.charCollisions.setLinearVelocity(Vec3(
+                speed.getX() / self.dt,
+                speed.getY() / self.dt,
+                self.charCollisions.getLinearVelocity().getZ()))
+
+    def setupRays(self):
+        """Register the rays of the physics, calling this again will move
+        them to the positions given by the current config"""
+        point_a = Point3(0, 0, self.cfg.player_height/1.8)
+        point_b = Point3(0, 0, -self.cfg.stepheight_down)
+        if self.foot_ray_id in self.raylist:
+            self.updateRayPositions(self.foot_ray_id, point_a, point_b)
+        else:
+            self.registerRayCheck(self.foot_ray_id, point_a, point_b, self.main_node, True)
 
-    def registerRayCheck(self, ray_id, pos_a, pos_b, parent, ignore_ray_cycle=False):
+    def registerRayCheck(self, ray_id, pos_a, pos_b, parent, ignore_ray_cycle=False, max_age_frames=None, max_age_ms=None, priority=0, on_demand=False):
         """This function will create a ray segment at the given position
         and attaches it to the given parent node. This has to be done
-        for any ray check you want to do in the application."""
-        r = self.Ray(pos_a, pos_b, parent)
+        for any ray check you want to do in the application.
+        All rays but the on demand ones are tested by the shared ray
+        traversal every frame, so the max age and priority values don't
+        have any effect here."""
+        r = self.Ray(pos_a, pos_b, parent, max_age_frames, max_age_ms, priority)
         # store the ray for later usage
         self.raylist[ray_id] = r
         if ignore_ray_cycle:
             self.ignore_ray_cycle.append(ray_id)
-        if ray_id not in self.ignore_ray_cycle:
+        if ray_id not in self.ignore_ray_cycle and not on_demand:
             self.ray_ids.append(ray_id)
 
     def stopPhysics(self):
         """Stops the characters physics elements. Should be called at
         character cleanup"""
-        #TODO: Cleanup
         self.char_collision_dict = {}
+        self.ray_traversal.removeMember(self)
+        self.tick_dispatcher.removeMember(self)
         self.raylist = None
-        self.charCollisions.removeNode()
+        self.ray_results = {}
+        self.bodyContactTracker.clear()
+        self.eventContactTracker.clear()
+        self.physic_world.removeGhost(self.charEventCollisions)
+        self.physic_world.removeRigidBody(self.charCollisions)
+        self.main_node.removeNode()
+
+    def buildCollisionIndex(self, levelRoot, cellSize=None):
+        """Bullets contact tests already use the broadphase of the
+        physics world to only check nearby bodies, so there is no
+        additional index to build."""
+        pass
 
     def updatePhysics(self):
-        """This method must be called every frame to update collision contacts."""
+        """This method must be called every frame to update collision
+        contacts. Further calls within the same frame will be ignored."""
+
+        frame = globalClock.getFrameCount()
+        if frame == self.physics_frame: return
+        self.physics_frame = frame
 
-        self.main_node.setP(0)
-        self.main_node.setR(0)
+        # setting the transform hands it to the body, see doStep, so
+        # this is only done if the character really got tilted
+        if self.main_node.getP() != 0 or self.main_node.getR() != 0:
+            self.main_node.setP(0)
+            self.main_node.setR(0)
+
+        # test the rays of all characters sharing the ray traversal
+        self.ray_traversal.traverse(frame)
 
         # since bullet doesn't have a way to do it automatically, we have to
         # check collisions and store them on our own to check when we hit
@@ -173,53 +384,155 @@ class Physics:
 
         # Check for Body contact
         result = self.physic_world.contactTest(self.charCollisions, True)
+        self.bodyContactTracker.sendEvents(
+            ((contact.getNode0(), contact.getNode1()), contact)
+            for contact in result.getContacts())
+
+        # Check for event sphere contact. The ghost node already knows
+        # which nodes overlap with it, so there is no need for an extra
+        # contact test here.
+        if self.cfg.event_collision_enabled:
+            self.eventContactTracker.sendEvents(
+                ((self.charEventCollisions, node), node)
+                for node in self.charEventCollisions.getOverlappingNodes()
+                if node != self.charCollisions)
+
+    def updateDirtyRays(self):
+        """Moved or dirty bullet rays are tested again whenever they are
+        requested, so there is nothing to update here."""
+        pass
 
-        lostContacts = self.bodyCollisionList
-
-        # check the new contacts
-        for contact in result.getContacts():
-            # check if we already had contact to this
-            if contact in self.bodyCollisionList:
-                # existing contact
-                lostContacts.reomve(contact)
-            else:
-                # new contact
-                self.bodyCollisionList.append(contact)
-                base.messenger.send("charBody-in", [contact])
-
-        # remove lost contacts from our list
-        for contact in lostContacts:
-            self.bodyCollisionList.remove(contact)
-            base.messenger.send("charBody-out", [contact])
-
-        '''
-        # Check for event sphere contact
-        result = self.physic_world.contactTest(self.eventCollider.node(), True)
-
-        lostContacts = self.eventCollisionList
+    def markRayDirty(self, ray_id):
+        """Drop the stored result of the ray with the given ID so it will
+        be tested again the next time it is requested"""
+        self.ray_results.pop(ray_id, None)
+
+    def getRayStats(self):
+        """Returns a dictionary containing the counters of ray tests that
+        hit something, missed and have been served from the per frame
+        result store"""
+        return self.ray_stats
+
+    def resetRayStats(self):
+        """Set all ray test counters back to 0"""
+        for key in self.ray_stats:
+            self.ray_stats[key] = 0
+
+    def getPhysicsFrame(self):
+        """Returns the frame number in which the contacts have been
+        updated the last time"""
+        return self.physics_frame
+
+    def setRaysEnabled(self, ray_ids, enabled):
+        """Enable or disable the rays with the given IDs. Disabled rays
+        won't be tested and report no collision until they get enabled
+        again."""
+        if enabled:
+            self.disabled_rays.difference_update(ray_ids)
+        else:
+            self.disabled_rays.update(ray_ids)
+        for ray_id in ray_ids:
+            self.ray_results.pop(ray_id, None)
+
+    def suspendRays(self):
+        """Skip the rays of this character in the shared ray traversal,
+        rays requested anyway will still be tested on request."""
+        self.rays_suspended = True
+
+    def resumeRays(self):
+        self.rays_suspended = False
+
+    def suspendSimulation(self):
+        """Take the character out of the physics simulation, it will not
+        fall or get pushed anymore until resumeSimulation is called"""
+        if self.simulation_suspended: return
+        self.simulation_suspended = True
+        self.simulation_velocity = Vec3(0, 0, 0)
+        self.charCollisions.setLinearVelocity(Vec3(0, 0, 0))
+        self.charCollisions.setKinematic(True)
+
+    def resumeSimulation(self):
+        """Put the character back into the physics simulation"""
+        if not self.simulation_suspended: return
+        self.simulation_suspended = False
+        self.charCollisions.setKinematic(False)
+        self.charCollisions.setLinearVelocity(self.simulation_velocity)
+        self.charCollisions.setActive(True)
+
+    def stepSimulation(self, dt):
+        """Move this character alone by its velocity and the gravity of
+        the world for dt seconds. This is meant for characters taken
+        out of the simulation with suspendSimulation, which are stepped
+        manually instead, e.g. to simulate multiple ticks within one
+        frame. As the bullet world can only be stepped as a whole, the
+        body is pushed out of everything it has been moved into by a
+        contact test of its own."""
+        speed = self.speed
+        self.speed = None
+        if self.fly_mode:
+            # flying characters have been moved by updatePlayerPos
+            return
+        if speed is not None and self.dt > 0:
+            # the same velocity the tick callback would set
+            velocity = Vec3(
+                speed.getX() / self.dt,
+                speed.getY() / self.dt,
+                speed.getZ())
+        else:
+            velocity = self.getVelocity()
+        # forces like the one of a jump would be applied by the world
+        force = self.charCollisions.getTotalForce() / self.charCollisions.getMass()
+        self.charCollisions.clearForces()
+        velocity += (self.physic_world.getGravity() + force) * dt
+        turn = self.charCollisions.getAngularVelocity().getZ() * dt
+        # a kinematic body only takes over the transform of its node with
+        # the next step of the world, a dynamic one right away. So the
+        # body is made dynamic while it gets moved and tested here.
+        self.charCollisions.setKinematic(False)
+        self.main_node.setH(self.main_node.getH() + math.degrees(turn))
+        self.main_node.setPos(self.main_node.getPos() + velocity * dt)
 
-        # check the new contacts
+        result = self.physic_world.contactTest(self.charCollisions, True)
         for contact in result.getContacts():
-            # check if we already had contact to this
-            if contact in self.eventCollisionList:
-                # existing contact
-                lostContacts.reomve(contact)
-            else:
-                # new contact
-                self.eventCollisionList.append(contact)
-                base.messenger.send("{}-in".format(self.getConfig("char_collision_name")), [contact])
-
-        # remove lost contacts from our list
-        for contact in lostContacts:
-            self.eventCollisionList.remove(contact)
-            base.messenger.send("{}-out".format(self.getConfig("char_collision_name")), [contact])
-        '''
+            point = contact.getManifoldPoint()
+            depth = point.getDistance()
+            if depth >= 0: continue
+            # the normal points from the other body towards the first one
+            normal = point.getNormalWorldOnB()
+            if contact.getNode0() != self.charCollisions:
+                normal = -normal
+            self.main_node.setPos(self.main_node.getPos() - normal * depth)
+            # don't keep moving into what we have been pushed out of
+            into = velocity.dot(normal)
+            if into < 0:
+                velocity -= normal * into
+        self.charCollisions.setKinematic(True)
+        self.simulation_velocity = velocity
+
+    def invalidatePhysics(self):
+        """Make the next call to updatePhysics test the contacts and the
+        next requests test the rays again, even if they have already
+        been tested in this frame"""
+        self.physics_frame = -1
+        self.ray_results = {}
+
+    def getRayAge(self, ray_id):
+        """Bullet rays are tested whenever they are requested, so their
+        results are always up to date."""
+        return 0
+
+    def getRayAgeMs(self, ray_id):
+        """Bullet rays are tested whenever they are requested, so their
+        results are always up to date."""
+        return 0.0
 
     def updateRayPositions(self, ray_id, point_a, point_b):
         """This method can be used to update the start and end position
-        of the ray with the given ID"""
+        of the ray with the given ID. A result stored for the ray in this
+        frame will be dropped."""
         self.raylist[ray_id].point_a = point_a
         self.raylist[ray_id].point_b = point_b
+        self.ray_results.pop(ray_id, None)
 
     def updatePlayerPos(self, speed, heading):
         """This function should be called to set the players new
@@ -229,13 +542,13 @@ class Physics:
         the camera and can be None.
         This function will process the stepping and dependend on that
         requests fall and landing states"""
-        dt = globalClock.getDt()
+        dt = self.dt
         if heading is not None:
             curH = self.main_node.getH()
 
             tempNp = NodePath("temp")
             tempNp.setHpr(self.main_node.getHpr())
-            tempNp.setH(camera, heading)
+            tempNp.setH(self.camera_handler.getViewNode(), heading)
             rotation_angle = self.main_node.getHpr(tempNp)
             tempNp.removeNode()
             tempNp = None
@@ -245,22 +558,26 @@ class Physics:
         else:
             self.charCollisions.setAngularVelocity(0)
 
-        speed = self.main_node.getRelativeVector(render, speed)
-        speed.setX(-speed.getX())
-        zVel = self.charCollisions.getLinearVelocity().getZ()
-        speed.setZ(speed.getZ() + zVel)
+        speed = render.getRelativeVector(self.main_node, speed)
+        if self.fly_mode:
+            # kinematic bodies aren't moved by their velocity
+            self.speed = None
+            self.main_node.setPos(self.main_node.getPos() + speed)
+        else:
+            zVel = self.getVelocity().getZ()
+            speed.setZ(speed.getZ() + zVel)
 
-        self.speed = speed
-        #self.charCollisions.setLinearVelocity(speed)
+            self.speed = speed
+            self.__applySpeed()
 
         self.updateCharSimpleShadow()
 
-        if self.state not in self.ignore_step_states:
+        if not self.state_flags[self.state] & self.STATE_FLAG_IGNORE_STEP:
             if self.doStep():
-                self.landing_force = self.main_node.node().getLinearVelocity()
-                if self.state not in self.on_ground_states:
+                self.landing_force = self.getVelocity()
+                if not self.state_flags[self.state] & self.STATE_FLAG_ON_GROUND:
                     self.charCollisions.setAngularVelocity((0, 0, 0))
-                    self.charCollisions.setLinearVelocity((0, 0, 0))
+                    self.__setBodyVelocity(Vec3(0, 0, 0))
                     self.plugin_requestNewState(self.STATE_LAND)
             elif self.state != self.STATE_JUMP and self.state != self.STATE_FALL:
                 self.plugin_requestNewState(self.STATE_FALL)
@@ -271,7 +588,7 @@ class Physics:
         which is useful for example if the player gets moved by a
         platform he stands on or wind or whatever external force may
         move the player around."""
-        preFlyMode = self.charCollisions.getKinematic()
+        preFlyMode = self.fly_mode
         self.toggleFlyMode(False)
         newPos = self.main_node.getPos() + speed
         self.main_node.setPos(newPos)
@@ -280,7 +597,7 @@ class Physics:
 
     def updatePlayerPosFix(self, position, relativeTo=None):
         """This method will place the character at the given position."""
-        preFlyMode = self.charCollisions.getKinematic()
+        preFlyMode = self.fly_mode
         self.toggleFlyMode(False)
         if relativeTo is not None:
             self.main_node.setPos(relativeTo, position)
@@ -296,10 +613,15 @@ class Physics:
         platform he stands on or wind or whatever external force may
         move the player around.
         Note: this function will use the not physic related position
-        update function and should only be used on flying modes if
-        physics are disabled"""
-        # check if we are in fly mode, otherwise we won't let this happen
-        if self.charCollisions.getKinematic() == False: return
+        update function in fly mode only. Otherwise the movement is left
+        to the world."""
+        if not self.fly_mode:
+            # the world moves the body, so the platform movement is
+            # added to the distance it moves in this frame
+            if self.speed is not None:
+                self.speed += Vec3(speed.getX(), speed.getY(), 0)
+                self.__applySpeed()
+            return
         newPos = self.main_node.getPos() + speed
         self.main_node.setPos(newPos)
         self.updateCharSimpleShadow()
@@ -367,7 +689,7 @@ class Physics:
         the characters main collision solids. It will check stepping as
         well as check if the character should fall or just landed
         somewhere."""
-        if self.state in self.ignore_step_states:
+        if self.state_flags[self.state] & self.STATE_FLAG_IGNORE_STEP:
             pass
         elif self.doStep():
             if self.state == self.STATE_JUMP or self.state == self.STATE_FALL:
@@ -376,11 +698,11 @@ class Physics:
         elif self.state != self.STATE_JUMP and self.state != self.STATE_FALL:
             self.plugin_requestNewState(self.STATE_FALL)
         self.enterNewState()
-        base.messenger.send("plugin-character-in-collision", [collision])
+        base.messenger.send(self.plugin_getUniqueName("plugin-character-in-collision"), [collision])
 
     def charOutCollisions(self, collision):
         return
-        base.messenger.send("plugin-character-out-collision", [collision])
+        base.messenger.send(self.plugin_getUniqueName("plugin-character-out-collision"), [collision])
 
     def checkInBodyContact(self, collision):
         return
@@ -399,34 +721,23 @@ class Physics:
 
     def checkFloatingPlatform(self, entry):
         if entry is not None:
-            if entry.getName().startswith(self.getConfig("platform_collision_prefix")):
+            platform = self.platform_registry.getPlatformRoot(entry)
+            if platform is not None:
                 # we landed on a moving platform
-                p = render.find("**/%s"%entry.getName())
-                self.setActivePlatform(self.__findPlatformRoot(p))
+                self.setActivePlatform(platform)
                 self.pre_set_platform = True
 
     def cleanFloatingPlatform(self):
         if not self.pre_set_platform:
             self.setActivePlatform(None)
 
-    def __findPlatformRoot(self, platform):
-        return
-        """This method will find the root node of a floating platform
-        which then may be used to update the characters position on that
-        specific platform. This function will be called recursively."""
-        if platform.hasParent():
-            if platform.node().getType() == ModelRoot:
-                return platform
-            return self.__findPlatformRoot(platform.getParent())
-        return platform
-
     def doStep(self):
         """This method will process the characters downward stepping to
         prevent it from floating. It will also check if the character
         landed on a movable platform and set it as active platform.
         This function will return True whenever the character has been
         stepped on the ground and falls if there was no step"""
-        if self.state not in self.ignore_step_states:
+        if not self.state_flags[self.state] & self.STATE_FLAG_IGNORE_STEP:
             # do the step height check
             char_step_collision = self.getFirstCollisionEntryInLine(self.foot_ray_id)
 
@@ -438,7 +749,7 @@ class Physics:
             shiftZ = 0
 
             #TODO: Bullet specific changes need to be made from here
-            if self.getConfig("do_step_up_check"):
+            if self.cfg.do_step_up_check:
                 #
                 # In this section we are going to check if the character should
                 # move up on stairs. For this we need to gather all collision
@@ -452,11 +763,11 @@ class Physics:
                     newPos = mpoint.getPositionWorldOnB()
                     #self.placer_b.setPos(newPos)
                     stepHeight = mpoint.getLocalPointB().getZ()
-                    if stepHeight >= self.getConfig("stepheight_min_up") and stepHeight <= self.getConfig("stepheight_max_up"):
+                    if stepHeight >= self.cfg.stepheight_min_up and stepHeight <= self.cfg.stepheight_max_up:
                         # move up a tiny bit, so we won't stuck in the ground
                         newPos.setZ(newPos.getZ() + 0.2)
                         # also move forward by the given amount so we won't fall off of the step right away
-                        #newPos.setY(newPos.getY() - self.getConfig("step_up_forward_distance"))
+                        #newPos.setY(newPos.getY() - self.cfg.step_up_forward_distance)
                         self.main_node.setPos(newPos)
                         return True
 
@@ -470,7 +781,7 @@ class Physics:
                     # sometimes the calculated distance is in the wrong direction
                     if dist < 0: continue
                     shiftZ = dist
-                    if dist < self.getConfig("player_height")/100.0:
+                    if dist < self.cfg.player_height/100.0:
                         char_step_collision = char_step_collision if char_step_collision is not None else collision
                         groundNode = groundNode if groundNode is not None else collision.getNode1()
                         break
@@ -481,7 +792,7 @@ class Physics:
                             # collision sphere of the player
                             dist = self.characterBodySphereRadius
 
-                        dt = globalClock.getDt()
+                        dt = self.dt
                         moveVec = pos
                         moveVec.setZ(0)
                         moveVec *= -1
@@ -500,14 +811,13 @@ class Physics:
             self.clearFirstCollisionEntryOfRay(self.foot_ray_id)
             self.cleanFloatingPlatform()
             self.pre_set_platform = False
-            if groundNode is not None:
-                if groundNode.getName().startswith(self.getConfig("platform_collision_prefix")):
-                    # we landed on a moving platform
-                    p = render.find("**/%s"%groundNode.getName())
-                    self.setActivePlatform(self.__findPlatformRoot(p))
+            platform = self.platform_registry.getPlatformRoot(groundNode)
+            if platform is not None:
+                # we landed on a moving platform
+                self.setActivePlatform(platform)
 
             # prevent slipping
-            if self.state in self.prevent_slip_states and char_step_collision is not None:
+            if self.state_flags[self.state] & self.STATE_FLAG_PREVENT_SLIP and char_step_collision is not None:
                 # get the angle of the part of the ground we currently
                 # stand on
                 floor_normal = self.getSurfaceNormal(char_step_collision, render)
@@ -516,7 +826,7 @@ class Physics:
                 zx = abs(zx-90)
                 zy = abs(zy-90)
                 # if the angle is within a specific range
-                if zy <= self.getConfig("slip_free_angle") and zx <= self.getConfig("slip_free_angle"):
+                if zy <= self.cfg.slip_free_angle and zx <= self.cfg.slip_free_angle:
                     # prevent slipping
                     if zy > 0 or zx > 0:
                         self.toggleFlyMode(True)
@@ -527,49 +837,95 @@ class Physics:
                 if self.hasSurfacePoint(char_step_collision):
                     # place the character on the ground
                     pos = self.getSurfacePoint(char_step_collision, render)
-                    self.main_node.setFluidZ(pos.getZ() - shiftZ)
+                    z = pos.getZ() - shiftZ
+                    # setting the position hands the node transform back to
+                    # the body. The node shows the body interpolated one
+                    # substep behind, so this would cost a substep of
+                    # movement and is only done if it is really needed.
+                    if abs(self.main_node.getZ() - z) > self.cfg.player_height / 100.0:
+                        self.main_node.setFluidZ(z)
                     return True
             return False
-        elif self.charCollisions and self.state not in self.flying_states:
+        elif self.charCollisions and not self.state_flags[self.state] & self.STATE_FLAG_FLYING:
             self.toggleFlyMode(False)
         self.setActivePlatform(None)
         return False
 
     def toggleFlyMode(self, flyActive):
         """Dis- and Enable the physic effects on the character to give
-        him the possibility to fly."""
-        self.charCollisions.setKinematic(flyActive)
+        him the possibility to fly. Suspended characters always stay
+        kinematic, so the world doesn't move them."""
+        self.fly_mode = flyActive
+        self.charCollisions.setKinematic(flyActive or self.simulation_suspended)
 
     def hasSurfacePoint(self, entry):
         return entry.hasHit()
 
     def getSurfacePoint(self, entry, np):
-        return entry.getHitPos()
+        return np.getRelativePoint(render, entry.getHitPos())
 
     def hasSurfaceNormal(self, entry):
         return entry.hasHit()
 
     def getSurfaceNormal(self, entry, np):
-        return entry.getHitNormal()
+        return np.getRelativeVector(render, entry.getHitNormal())
+
+    def getIntoNodePath(self, entry):
+        return NodePath(entry.getNode())
 
     def getFallForce(self):
-        return self.charCollisions.getLinearVelocity().getZ()
+        return self.getVelocity().getZ()
 
     def getFirstCollisionEntryInLine(self, ray_id):
         """A simple raycast check which will return the collision entry
         of the first collision point as seen from the previously
-        registred ray with the given ID"""
+        registred ray with the given ID.
+        The ray will only be tested once per frame, further requests
+        will get the stored result until the ray has been moved."""
+        if ray_id in self.disabled_rays: return None
+        self.__checkRayResultsFrame()
+        if ray_id in self.ray_results:
+            self.ray_stats["cached"] += 1
+            return self.ray_results[ray_id]
+        return self.__testRay(ray_id)
+
+    def testRays(self, ray_ids):
+        """Test the given rays which have no result stored for this frame
+        yet. This is used by the shared ray traversal."""
+        self.__checkRayResultsFrame()
+        for ray_id in ray_ids:
+            if ray_id in self.disabled_rays or ray_id in self.ray_results:
+                continue
+            self.__testRay(ray_id)
+
+    def __checkRayResultsFrame(self):
+        """Drop the stored ray results if they are from a previous frame"""
+        frame = globalClock.getFrameCount()
+        if frame != self.ray_results_frame:
+            self.ray_results = {}
+            self.ray_results_frame = frame
+
+    def __testRay(self, ray_id):
+        """Test the ray with the given ID and store its result"""
+        ray = self.raylist[ray_id]
+        # the points are given relative to the parent of the ray while
+        # the world tests them in world space
         result = self.physic_world.rayTestClosest(
-            self.raylist[ray_id].point_a,
-            self.raylist[ray_id].point_b,
+            render.getRelativePoint(ray.parent, ray.point_a),
+            render.getRelativePoint(ray.parent, ray.point_b),
             self.ray_mask)
         if result.hasHit():
-            return result
-        return None
+            self.ray_stats["hit"] += 1
+        else:
+            self.ray_stats["miss"] += 1
+            result = None
+        self.ray_results[ray_id] = result
+        return result
 
     def clearFirstCollisionEntryOfRay(self, ray_id):
-        """Not necessary for Bullet physics collision system"""
-        pass
+        """Drop the result stored for the ray with the given ID, so it
+        will be tested again with the next request"""
+        self.ray_results.pop(ray_id, None)
 
     def getFirstCollisionIntoNodeInLine(self, ray_id):
         """A simple raycast check which will return the into node of the
@@ -615,25 +971,28 @@ class Physics:
         character. It will synch it's position with the player as well
         as calculate it's size when the player is further away from the
         shadow/ground"""
-        if not self.getConfig("use_simple_shadow"): return
-        self.raylist[self.shadow_ray_id].point_a = self.main_node.getPos()
+        if not self.cfg.use_simple_shadow: return
+        self.updateRayPositions(
+            self.shadow_ray_id,
+            self.main_node.getPos(),
+            self.raylist[self.shadow_ray_id].point_b)
         pos = self.getFirstCollisionInLine(self.shadow_ray_id)
         if pos is not None:
-            self.shadow.setPos(pos.getX(), pos.getY(), pos.getZ() + self.getConfig("shadow_z_offset"))
+            self.shadow.setPos(pos.getX(), pos.getY(), pos.getZ() + self.cfg.shadow_z_offset)
             z_a = pos.getZ()
             z_b = self.main_node.getZ()
             dist = z_b - z_a
             # check if we should scale the shadow below the character
             if dist <= 0:
-                self.shadow.setScale(self.getConfig("max_shadow_scale"))
+                self.shadow.setScale(self.cfg.max_shadow_scale)
             else:
                 # calculate the shadows scale from its current distance
                 # to the player
-                scale = self.getConfig("shadow_min_scale_dist") - dist / self.getConfig("shadow_scale_factor")
-                if scale < self.getConfig("min_shadow_scale"):
-                    scale = self.getConfig("min_shadow_scale")
-                elif scale > self.getConfig("max_shadow_scale"):
-                    scale = self.getConfig("max_shadow_scale")
+                scale = self.cfg.shadow_min_scale_dist - dist / self.cfg.shadow_scale_factor
+                if scale < self.cfg.min_shadow_scale:
+                    scale = self.cfg.min_shadow_scale
+                elif scale > self.cfg.max_shadow_scale:
+                    scale = self.cfg.max_shadow_scale
                 self.shadow.setScale(scale)
 
     def doJump(self, forwardSpeed, jump_direction=Vec3(0,0,0), extraSpeedVec=Vec3()):
@@ -653,12 +1012,12 @@ class Physics:
         #
         # Jump vector calculation
         #
-        dt = globalClock.getDt()
+        dt = self.dt
         jumpVec = Vec3(
             jump_direction.getX()*dt,
-            -((forwardSpeed*self.getConfig("jump_forward_force_mult"))+jump_direction.getY())*dt,
-            (self.getConfig("phys_jump_strength")+jump_direction.getZ()))#*dt)
-        jumpVec *= self.getConfig("jump_strength")
+            -((forwardSpeed*self.cfg.jump_forward_force_mult)+jump_direction.getY())*dt,
+            (self.cfg.phys_jump_strength+jump_direction.getZ()))#*dt)
+        jumpVec *= self.cfg.jump_strength
 
         #
         # Extra speed calculation
@@ -670,55 +1029,82 @@ class Physics:
         #
         # Push the character
         #
-        # now add the actual force to the characters physic node
-        #TODO: Which one is correct?
-        #self.charCollisions.applyCentralImpulse(jumpVec)
-        self.charCollisions.applyCentralForce(jumpVec)
+        # now add the actual impulse to the characters body, like the
+        # local impulse of the internal physics
+        jumpVec = render.getRelativeVector(self.main_node, jumpVec)
+        self.__setBodyVelocity(self.getVelocity() + jumpVec / self.charCollisions.getMass())
 
         #
         # Velocity checks
         #
         #TODO: Check for the right function
-        vel = self.charCollisions.getLinearVelocity()
+        vel = self.getVelocity()
         #TODO: This portion can be shared
         velX = vel.getX()
         velY = vel.getY()
         velZ = vel.getZ()
 
         # Make sure we don't jump/move faster than we are alowed to
-        if abs(velX) > self.getConfig("max_jump_force_internal_X") \
-        or abs(velY) > self.getConfig("max_jump_force_internal_Y"):
+        if abs(velX) > self.cfg.max_jump_force_internal_X \
+        or abs(velY) > self.cfg.max_jump_force_internal_Y:
             # we need to make sure X and Y are at the same distance
             # as before otherwise jump direction will be shifted
             if abs(velX) > abs(velY):
                 pass
                 #TODO: Calculate diff between x and y and subtract/add to respective other
             if velX < 0:
-                velX = -self.getConfig("max_jump_force_internal_X")
+                velX = -self.cfg.max_jump_force_internal_X
             else:
-                velX = self.getConfig("max_jump_force_internal_X")
-        if abs(velY) > self.getConfig("max_jump_force_internal_Y"):
+                velX = self.cfg.max_jump_force_internal_X
+        if abs(velY) > self.cfg.max_jump_force_internal_Y:
             if velY < 0:
-                velY = -self.getConfig("max_jump_force_internal_Y")
+                velY = -self.cfg.max_jump_force_internal_Y
             else:
-                velY = self.getConfig("max_jump_force_internal_Y")
-        if abs(velZ) > self.getConfig("max_jump_force_internal_Z"):
+                velY = self.cfg.max_jump_force_internal_Y
+        if abs(velZ) > self.cfg.max_jump_force_internal_Z:
             if velZ < 0:
-                velZ = -self.getConfig("max_jump_force_internal_Z")
+                velZ = -self.cfg.max_jump_force_internal_Z
             else:
-                velZ = self.getConfig("max_jump_force_internal_Z")
+                velZ = self.cfg.max_jump_force_internal_Z
         #TODO: This portion can be shared END
 
+        self.__setBodyVelocity(Vec3(velX, velY, velZ))
 
     def land(self):
         """Reset velocities of the characters physic node"""
-        #self.actorNode.getPhysicsObject().setVelocity(0,0,0)
-        pass
+        self.__setBodyVelocity(Vec3(0, 0, 0))
+
+    def getVelocity(self):
+        """Returns the linear velocity of the characters body"""
+        if self.simulation_suspended:
+            return Vec3(self.simulation_velocity)
+        return self.charCollisions.getLinearVelocity()
+
+    def setVelocity(self, velocity):
+        """Set the linear velocity of the characters body, the speed of
+        the last position update will not be applied anymore"""
+        self.speed = None
+        self.__setBodyVelocity(velocity)
+
+    def __applySpeed(self):
+        """Set the velocity of the body to move it by the horizontal
+        speed within this frame. The tick callback sets it again for
+        every substep."""
+        speed = self.speed
+        if self.dt > 0:
+            self.__setBodyVelocity(Vec3(
+                speed.getX() / self.dt,
+                speed.getY() / self.dt,
+                speed.getZ()))
+
+    def __setBodyVelocity(self, velocity):
+        if self.simulation_suspended:
+            self.simulation_velocity = Vec3(velocity)
+        else:
+            self.charCollisions.setLinearVelocity(velocity)
 
     def setActivePlatform(self, platform):
-        return
         self.active_platform = platform
 
     def getActivePlatform(self):
-        return None
         return self.active_platform
@@ -4,6 +4,7 @@
 #
 # PYTHON IMPORTS
 #
+import heapq
 import math
 
 #
@@ -21,12 +22,16 @@ from panda3d.core import (
     Vec3,
     NodePath,
     BitMask32,
-    ModelRoot,
     )
 from panda3d.physics import (
     PhysicsCollisionHandler,
     ActorNode)
 
+#
+# CHARACTER SPECIFIC IMPORTS
+#
+from .CollisionGrid import CollisionGrid, CHARACTER_TAG
+
 __author__ = "Fireclaw the Fox"
 __license__ = """
 Simplified BSD (BSD 2-Clause) License.
@@ -34,12 +39,55 @@ See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 """
 
 
+#
+# SHARED RAY TRAVERSAL
+#
+class RayTraversal:
+    """This class traverses the scheduled rays of multiple characters in
+    one pass per frame. Every character adds its rays to the traverser
+    of this class and registers itself as member. Pass one instance to
+    all characters which should share the traversal, otherwise each
+    character will get its own."""
+    def __init__(self):
+        self.traverser = CollisionTraverser("shared collision traverser for ray tests")
+        self.members = []
+        # the frame in which the rays have been traversed the last time
+        self.frame = -1
+
+    def addMember(self, physics):
+        if physics not in self.members:
+            self.members.append(physics)
+
+    def removeMember(self, physics):
+        if physics in self.members:
+            self.members.remove(physics)
+        for ray in physics.raylist.values():
+            self.traverser.removeCollider(ray.ray_np)
+
+    def traverse(self, frame):
+        """Traverse the scheduled rays of all members, this will only be
+        done once for the given frame."""
+        if frame == self.frame: return
+        self.frame = frame
+        now = globalClock.getFrameTime()
+        scheduled = []
+        for physics in self.members:
+            if physics.rays_suspended: continue
+            ray_ids = physics.getScheduledRays(frame, now)
+            physics.prepareRayTraversal(ray_ids)
+            scheduled.append((physics, ray_ids))
+        self.traverser.traverse(render)
+        for physics, ray_ids in scheduled:
+            physics.finishRayTraversal(ray_ids)
+            physics.physics_frame = frame
+
+
 #
 # PHYSICS FUNCTIONS
 #
 class Physics:
     class Ray:
-        def __init__(self, np, segment,  queue=None, last_entry=None):
+        def __init__(self, np, segment,  queue=None, last_entry=None, max_age_frames=None, max_age_ms=None, priority=0):
             self.ray_np = np
             self.solid = segment
             self.last_entry = last_entry
@@ -47,23 +95,46 @@ class Physics:
                 self.queue = CollisionHandlerQueue()
             else:
                 self.queue = queue
-
-    def __init__(self):
-
-        if self.getConfig("show_collisions"):
+            # scheduling information. The max age values determine how
+            # stale the result of this ray is allowed to get before it
+            # has to be refreshed, either in frames or milliseconds.
+            # The priority is used to decide between rays that are
+            # equally close to their deadline.
+            self.max_age_frames = max_age_frames
+            self.max_age_ms = max_age_ms
+            self.priority = priority
+            # the frame and time at which this ray has been traversed
+            # the last time
+            self.last_update_frame = -1
+            self.last_update_time = 0.0
+
+    def __init__(self, rayTraversal=None, collisionGrid=None):
+
+        if self.cfg.show_collisions:
             base.cTrav.showCollisions(render)
+        if rayTraversal is None:
+            rayTraversal = RayTraversal()
+        self.ray_traversal = rayTraversal
+        self.ray_traversal.addMember(self)
+        # this traverser is only used to update single rays in between
+        # the full traversals of the shared ray traversal
         self.rayCTrav = CollisionTraverser("collision traverser for ray tests")
-        if self.getConfig("show_collisions"):
+        if self.cfg.show_collisions:
             self.rayCTrav.showCollisions(render)
         self.futureCTrav = CollisionTraverser("collision traverser for future position tests")
-        if self.getConfig("show_collisions"):
+        if self.cfg.show_collisions:
             self.futureCTrav.showCollisions(render)
         self.stepCTrav = CollisionTraverser("collision traverser step up detection")
-        if self.getConfig("show_collisions"):
+        # pushes the body of the character alone out of walls and the
+        # ground when it is stepped with stepSimulation
+        self.simulationCTrav = CollisionTraverser("collision traverser for single character steps")
+        if self.cfg.show_collisions:
             self.stepCTrav.showCollisions(render)
         self.physics_pusher = PhysicsCollisionHandler()
-        self.physics_pusher.addInPattern('%fn-in')
-        self.physics_pusher.addOutPattern('%fn-out')
+        # the pusher only handles this characters body, so its events
+        # will be prefixed with the controller ID
+        self.physics_pusher.addInPattern(self.plugin_getUniqueName('%fn-in'))
+        self.physics_pusher.addOutPattern(self.plugin_getUniqueName('%fn-out'))
 
         self.char_collision_dict = {}
 
@@ -72,6 +143,9 @@ class Physics:
         self.collisionevent_handler.addOutPattern('%fn-out-%in')
         self.collisionevent_handler.addInPattern('%fn-in')
         self.collisionevent_handler.addOutPattern('%fn-out')
+        # events only this character listens to
+        self.collisionevent_handler.addInPattern(self.plugin_getUniqueName('%fn-in'))
+        self.collisionevent_handler.addOutPattern(self.plugin_getUniqueName('%fn-out'))
 
         self.char_collision_queue_handler = CollisionHandlerQueue()
 
@@ -87,18 +161,37 @@ class Physics:
 
         self.landing_force = None
 
+        # spatial index of the static level collisions, used to only
+        # check the geometry around the character for step ups and free
+        # space once it has been built, see buildCollisionIndex. It may
+        # be shared between multiple characters.
+        if collisionGrid is None:
+            collisionGrid = CollisionGrid(self.cfg.collision_grid_cell_size)
+        self.collision_grid = collisionGrid
+
         self.actorNode = ActorNode("playerPhysicsController")
         self.main_node = render.attachNewNode(self.actorNode)
+        # keeps the collisions of this character out of collision grids
+        self.main_node.setTag(CHARACTER_TAG, self.controller_id)
 
         self.setActivePlatform(None)
 
         self.raylist = {}
         self.ray_ids = []
         self.ignore_ray_cycle = []
-        point_a = Point3(0, 0, self.getConfig("player_height")/1.8)
-        point_b = Point3(0, 0, -self.getConfig("stepheight_down"))
+        # rays which have been moved since their last traversal
+        self.dirty_rays = set()
+        # rays which won't be traversed and have no result, see
+        # setRaysEnabled
+        self.disabled_rays = set()
+        # if set, the rays of this character will be skipped by the
+        # shared ray traversal, see suspendRays
+        self.rays_suspended = False
+        self.simulation_suspended = False
+        # the frame in which the physics have been updated the last time
+        self.physics_frame = -1
         self.foot_ray_id = "foot_ray_check"
-        self.registerRayCheck(self.foot_ray_id, point_a, point_b, self.main_node, True)
+        self.setupRays()
 
         '''
         # Enable for debugging positions
@@ -121,48 +214,49 @@ class Physics:
         """Start and set up the remaining physics parts of the character
         Should be called at the character setup and base start method"""
         base.physicsMgr.attachPhysicalNode(self.actorNode)
-        self.actorNode.getPhysicsObject().setMass(self.getConfig("player_mass"))
+        self.actorNode.getPhysicsObject().setMass(self.cfg.player_mass)
         self.reparentTo(self.main_node)
 
         # main character cylinder/spheres
         self.charCollisions = self.main_node.attachNewNode(CollisionNode("charBody"))
 
         # some calculations for position and size of the characters body collision spheres
-        self.characterBodySphereRadius = self.getConfig("player_height") / 4.0
+        self.characterBodySphereRadius = self.cfg.player_height / 4.0
         r = self.characterBodySphereRadius
         # bottom sphere
         zA = r
         # top sphere
-        zB = self.getConfig("player_height") - r
+        zB = self.cfg.player_height - r
         # actual setup of the characters body collision spheres
         self.charCollisions.node().addSolid(CollisionSphere(0, 0, zA, r))
         self.charCollisions.node().addSolid(CollisionSphere(0, 0, zB, r))
 
         self.charCollisions.node().setIntoCollideMask(self.body_mask)
         self.charCollisions.node().setFromCollideMask(self.body_mask)
-        if self.getConfig("show_collisions"):
+        if self.cfg.show_collisions:
             # debug visualization
             self.charCollisions.show()
         self.physics_pusher.addCollider(self.charCollisions, self.main_node)
         base.cTrav.addCollider(self.charCollisions, self.physics_pusher)
+        self.simulationCTrav.addCollider(self.charCollisions, self.physics_pusher)
         self.stepCTrav.addCollider(self.charCollisions, self.char_collision_queue_handler)
 
         # Create the big sphere around the caracter which can be used for special events
-        self.eventCollider = self.main_node.attachNewNode(CollisionNode(self.getConfig("char_collision_name")))
-        self.eventCollider.node().addSolid(CollisionSphere(0, 0, self.getConfig("player_height")/2.0, self.getConfig("player_height")/2.0))
+        self.eventCollider = self.main_node.attachNewNode(CollisionNode(self.cfg.char_collision_name))
+        self.eventCollider.node().addSolid(CollisionSphere(0, 0, self.cfg.player_height/2.0, self.cfg.player_height/2.0))
         self.eventCollider.node().setIntoCollideMask(self.event_mask)
         self.eventCollider.node().setFromCollideMask(self.event_mask)
-        if self.getConfig("show_collisions"):
+        if self.cfg.show_collisions:
             self.eventCollider.show()
-        if self.getConfig("event_collision_enabled"):
+        if self.cfg.event_collision_enabled:
             base.cTrav.addCollider(self.eventCollider, self.collisionevent_handler)
 
-        self.accept("charBody-in", self.checkInBodyContact)
-        self.accept("charBody-out", self.checkOutBodyContact)
-        self.accept("{}-in".format(self.getConfig("char_collision_name")), self.checkCharCollisions)
-        self.accept("{}-out".format(self.getConfig("char_collision_name")), self.charOutCollisions)
+        self.accept(self.plugin_getUniqueName("charBody-in"), self.checkInBodyContact)
+        self.accept(self.plugin_getUniqueName("charBody-out"), self.checkOutBodyContact)
+        self.accept(self.plugin_getUniqueName("{}-in".format(self.cfg.char_collision_name)), self.checkCharCollisions)
+        self.accept(self.plugin_getUniqueName("{}-out".format(self.cfg.char_collision_name)), self.charOutCollisions)
 
-        if self.getConfig("use_simple_shadow"):
+        if self.cfg.use_simple_shadow:
             # shadow ray
             ray = CollisionRay(
                 0, 0, 0.5,
@@ -175,81 +269,303 @@ class Physics:
             base.cTrav.addCollider(self.shadowRay, self.shadowRayQueue)
 
         self.charFutureCollisions = render.attachNewNode(CollisionNode("charFutureBody"))
-        self.charFutureCollisions.node().addSolid(CollisionSphere(0, 0, self.getConfig("player_height")/2.0, self.getConfig("player_height")/4.0))
+        self.charFutureCollisions.node().addSolid(CollisionSphere(0, 0, self.cfg.player_height/2.0, self.cfg.player_height/4.0))
         self.charFutureCollisions.node().setIntoCollideMask(BitMask32.allOff())
         self.charFutureCollisions.node().setFromCollideMask(self.body_mask)
-        if self.getConfig("show_collisions"):
+        if self.cfg.show_collisions:
             self.charFutureCollisions.show()
         self.charFutureCollisionsQueue = CollisionHandlerQueue()
         self.futureCTrav.addCollider(self.charFutureCollisions, self.charFutureCollisionsQueue)
 
-    def registerRayCheck(self, ray_id, pos_a, pos_b, parent, ignore_ray_cycle=False):
+    def setupRays(self):
+        """Register the rays of the physics, calling this again will move
+        them to the positions given by the current config"""
+        point_a = Point3(0, 0, self.cfg.player_height/1.8)
+        point_b = Point3(0, 0, -self.cfg.stepheight_down)
+        if self.foot_ray_id in self.raylist:
+            self.updateRayPositions(self.foot_ray_id, point_a, point_b)
+        else:
+            self.registerRayCheck(self.foot_ray_id, point_a, point_b, self.main_node, True)
+
+    def registerRayCheck(self, ray_id, pos_a, pos_b, parent, ignore_ray_cycle=False, max_age_frames=None, max_age_ms=None, priority=0, on_demand=False):
         """This function will create a ray segment at the given position
         and attaches it to the given parent node. This has to be done
-        for any ray check you want to do in the application."""
+        for any ray check you want to do in the application.
+
+        Rays that ignore the ray cycle will be updated with every full
+        update. Rays updated on demand are only traversed after they
+        have been moved or marked dirty, like the camera ray which gets
+        moved and updated by the camera itself every frame. All other
+        rays will be updated by the ray scheduler. max_age_frames or
+        max_age_ms define how old the result of the ray may get before
+        it has to be refreshed and priority decides which ray gets
+        updated first if multiple rays are equally close to their
+        deadline. If no max age is given, the ray may get as old as
+        there are scheduled rays."""
         # a new ray check ray
         raytest_segment = CollisionSegment(pos_a, pos_b)
         raytest_np = parent.attachNewNode(CollisionNode(ray_id))
         raytest_np.node().addSolid(raytest_segment)
         raytest_np.node().setIntoCollideMask(BitMask32.allOff())
         raytest_np.node().setFromCollideMask(self.ray_mask)
-        if self.getConfig("show_collisions"):
+        if self.cfg.show_collisions:
             raytest_np.show()
-        r = self.Ray(raytest_np, raytest_segment)
+        r = self.Ray(
+            raytest_np,
+            raytest_segment,
+            max_age_frames=max_age_frames,
+            max_age_ms=max_age_ms,
+            priority=priority)
         self.rayCTrav.addCollider(r.ray_np, r.queue)
+        self.ray_traversal.traverser.addCollider(r.ray_np, r.queue)
         # store the ray for later usage
         self.raylist[ray_id] = r
         if ignore_ray_cycle:
             self.ignore_ray_cycle.append(ray_id)
-        if ray_id not in self.ignore_ray_cycle:
+        if ray_id not in self.ignore_ray_cycle and not on_demand:
+            # only rays which can be deferred share the ray budget
             self.ray_ids.append(ray_id)
 
     def stopPhysics(self):
         """Stops the characters physics elements. Should be called at
         character cleanup"""
         self.char_collision_dict = {}
+        self.ray_traversal.removeMember(self)
         for ray_id, ray in self.raylist.items():
             ray.ray_np.removeNode()
         self.raylist = None
         self.ray_ids = None
+        self.dirty_rays = set()
         self.physics_pusher.clearColliders()
         self.rayCTrav.clearColliders()
         del self.rayCTrav
+        self.collision_grid.removeLocalRoot(self.plugin_getUniqueName("step-check"))
+        self.collision_grid.removeLocalRoot(self.plugin_getUniqueName("future-check"))
+
+    def buildCollisionIndex(self, levelRoot, cellSize=None):
+        """Build a spatial index over all static collision nodes below
+        the given level root. Once built, the step up and future space
+        checks will only traverse the collisions close to the character
+        instead of the whole scene graph. Registered moving platforms
+        and characters are excluded from the index, the platforms will
+        always be checked.
+        If the grid is shared, this only has to be called for one of
+        the characters sharing it, and again whenever the level changes."""
+        self.collision_grid.build(levelRoot, self.platform_registry.getPlatformRoots(), cellSize)
+
+    def __getTraverseRoot(self, name, pos):
+        """Returns the node which should be traversed for checks around
+        the given position. This is the local subtree of the collision
+        index if one has been built or render otherwise."""
+        if not self.collision_grid.built:
+            return render
+        return self.collision_grid.getLocalRoot(
+            self.plugin_getUniqueName(name), pos,
+            self.cfg.collision_grid_query_radius,
+            self.platform_registry.getPlatformRoots())
 
     def updatePhysics(self):
         """This method must be called every frame to update the ray
         traversal. So it should be called before any checks to
-        ray segments will be made."""
+        ray segments will be made.
+        The scheduled rays will only be traversed once per frame,
+        further calls within the same frame will only update the rays
+        that have been moved since, see updateDirtyRays."""
+
+        frame = globalClock.getFrameCount()
+        if frame == self.physics_frame:
+            # we already did the full update for this frame, either by
+            # ourself or by another member of the shared ray traversal
+            self.updateDirtyRays()
+            return
+
+        # this will traverse the rays of all characters sharing the
+        # traversal and set their physics frame
+        self.ray_traversal.traverse(frame)
+        if self.physics_frame != frame:
+            # the shared traversal already ran this frame before this
+            # character joined it or skipped it as its rays are suspended
+            self.physics_frame = frame
+            if not self.rays_suspended:
+                self.__traverseRays(self.getScheduledRays(frame, globalClock.getFrameTime()))
+
+    def getScheduledRays(self, frame, now):
+        """Returns the IDs of all rays which should be traversed in the
+        full update of the given frame"""
+        # only update the rays which are closest to their deadline
+        ray_ids = self.scheduleRays(frame, now)
+        ray_ids.update(self.ignore_ray_cycle)
+        ray_ids.update(self.dirty_rays)
+        ray_ids.difference_update(self.disabled_rays)
+        return ray_ids
+
+    def updateDirtyRays(self):
+        """Traverse only the rays which have been moved or marked dirty
+        since they have been traversed the last time. This will not
+        touch the results of any other ray."""
+        if not self.dirty_rays: return
+        self.__traverseRays(self.dirty_rays - self.disabled_rays)
+
+    def markRayDirty(self, ray_id):
+        """Mark the ray with the given ID to be traversed with the next
+        call to updatePhysics or updateDirtyRays"""
+        self.dirty_rays.add(ray_id)
+
+    def getPhysicsFrame(self):
+        """Returns the frame number in which the rays have been fully
+        updated the last time"""
+        return self.physics_frame
+
+    def setRaysEnabled(self, ray_ids, enabled):
+        """Enable or disable the rays with the given IDs. Disabled rays
+        won't be traversed and report no collision until they get
+        enabled again."""
+        if enabled:
+            self.disabled_rays.difference_update(ray_ids)
+            self.dirty_rays.update(ray_ids)
+        else:
+            self.disabled_rays.update(ray_ids)
+            for ray_id in ray_ids:
+                self.raylist[ray_id].last_entry = None
+
+    def suspendRays(self):
+        """Exclude all rays of this character from the shared ray
+        traversal until resumeRays is called. The rays keep their last
+        results."""
+        if self.rays_suspended: return
+        self.rays_suspended = True
+        for ray in self.raylist.values():
+            ray.ray_np.node().setFromCollideMask(BitMask32.allOff())
+
+    def resumeRays(self):
+        """Let the shared ray traversal update the rays of this
+        character again"""
+        self.rays_suspended = False
+
+    def suspendSimulation(self):
+        """Take the character out of the physics simulation, it will not
+        fall or get pushed anymore until resumeSimulation is called"""
+        if self.simulation_suspended: return
+        self.simulation_suspended = True
+        self.actorNode.getPhysicsObject().setVelocity(Vec3(0, 0, 0))
+        base.physicsMgr.removePhysicalNode(self.actorNode)
+
+    def resumeSimulation(self):
+        """Put the character back into the physics simulation"""
+        if not self.simulation_suspended: return
+        self.simulation_suspended = False
+        base.physicsMgr.attachPhysicalNode(self.actorNode)
 
-        #cycle through all rays, only update one per frame
-        self.ray_ids = self.ray_ids[1:] + self.ray_ids[:1]
+    def stepSimulation(self, dt):
+        """Integrate the physics of this character alone for dt seconds.
+        This is meant for characters taken out of the simulation with
+        suspendSimulation, which are stepped manually instead, e.g. to
+        simulate multiple ticks within one frame."""
+        base.physicsMgr.doPhysics(dt, self.actorNode.getPhysical(0))
+        self.simulationCTrav.traverse(render)
+
+    def invalidatePhysics(self):
+        """Make the next call to updatePhysics traverse all rays of this
+        character again, even if they have already been traversed in
+        this frame"""
+        self.dirty_rays.update(self.raylist)
+
+    def __traverseRays(self, ray_ids):
+        """Traverse the rays with the given IDs and store their results.
+        All other rays will be disabled for this traversal and keep
+        their previous results."""
+        self.prepareRayTraversal(ray_ids)
+        self.rayCTrav.traverse(render)
+        self.finishRayTraversal(ray_ids)
+
+    def prepareRayTraversal(self, ray_ids):
+        """Enable the rays with the given IDs and disable all others"""
         for ray_id, ray in self.raylist.items():
-            if ray_id == self.ray_ids[0]:
+            if ray_id in ray_ids:
                 ray.ray_np.node().setFromCollideMask(self.ray_mask)
-            elif ray_id not in self.ignore_ray_cycle:
+            else:
                 ray.ray_np.node().setFromCollideMask(BitMask32.allOff())
 
-        self.rayCTrav.traverse(render)
-        for ray_id, ray in self.raylist.items():
-            if ray_id in self.ray_ids:
-                if ray_id != self.ray_ids[0]: continue
+    def finishRayTraversal(self, ray_ids):
+        """Store the results of the rays with the given IDs after they
+        have been traversed"""
+        frame = globalClock.getFrameCount()
+        now = globalClock.getFrameTime()
+        for ray_id in ray_ids:
+            ray = self.raylist[ray_id]
             if ray.queue.getNumEntries() > 0:
                 #try:
                 #TODO: IF THIS ERROR EVER HAPPEN AGAIN, REPORT TO rdb
                 ray.queue.sortEntries()
                 entry = None
                 entry = ray.queue.getEntry(0)
-                self.raylist[ray_id].last_entry = entry
+                ray.last_entry = entry
                 #except:
                 #    pass
             else:
-                self.raylist[ray_id].last_entry = None
+                ray.last_entry = None
+            ray.last_update_frame = frame
+            ray.last_update_time = now
+        self.dirty_rays.difference_update(ray_ids)
+
+    def scheduleRays(self, frame, now):
+        """Returns the IDs of the rays which should be updated in the
+        given frame. The rays are picked by how close they are to their
+        maximum age and, if equally close, by their priority. At most
+        ray_budget_per_frame rays will be returned."""
+        budget = self.cfg.ray_budget_per_frame
+        ray_ids = self.ray_ids
+        if self.disabled_rays:
+            ray_ids = [ray_id for ray_id in ray_ids if ray_id not in self.disabled_rays]
+        if budget <= 0 or not ray_ids:
+            return set()
+
+        # rays without a dedicated max age may get as old as they would
+        # get with a simple round robin through all scheduled rays
+        default_max_age = len(ray_ids) / float(budget)
+
+        def urgency(ray_id):
+            ray = self.raylist[ray_id]
+            if ray.last_update_frame < 0:
+                # never been updated, always do this first
+                return (float("inf"), ray.priority)
+            if ray.max_age_ms is not None:
+                age = (now - ray.last_update_time) * 1000.0
+                max_age = ray.max_age_ms
+            else:
+                age = frame - ray.last_update_frame
+                max_age = ray.max_age_frames
+                if max_age is None:
+                    max_age = default_max_age
+            return (age / max(max_age, 1e-6), ray.priority)
+
+        return set(heapq.nlargest(budget, ray_ids, key=urgency))
+
+    def getRayAge(self, ray_id):
+        """Returns the amount of frames that passed since the ray with
+        the given ID has been updated the last time. Returns None if the
+        ray hasn't been updated yet."""
+        ray = self.raylist[ray_id]
+        if ray.last_update_frame < 0:
+            return None
+        return globalClock.getFrameCount() - ray.last_update_frame
+
+    def getRayAgeMs(self, ray_id):
+        """Returns the time in milliseconds that passed since the ray
+        with the given ID has been updated the last time. Returns None if
+        the ray hasn't been updated yet."""
+        ray = self.raylist[ray_id]
+        if ray.last_update_frame < 0:
+            return None
+        return (globalClock.getFrameTime() - ray.last_update_time) * 1000.0
 
     def updateRayPositions(self, ray_id, point_a, point_b):
         """This method can be used to update the start and end position
-        of the ray with the given ID"""
+        of the ray with the given ID. The ray will be marked dirty and
+        hence be traversed with the next physics update."""
         self.raylist[ray_id].solid.setPointA(point_a)
         self.raylist[ray_id].solid.setPointB(point_b)
+        self.dirty_rays.add(ray_id)
 
     def updatePlayerPos(self, speed, heading):
         """This function should be called to set the players new
@@ -261,20 +577,26 @@ class Physics:
         requests fall and landing states"""
         if heading is not None:
             curH = self.main_node.getH()
-            self.main_node.setH(camera, heading)
+            self.main_node.setH(self.camera_handler.getViewNode(), heading)
             newH = self.main_node.getH()
-            self.main_node.setH(curH)
-            rotatetoH = self.main_node.quatInterval(0.1, Point3(newH, 0, 0))
-            rotatetoH.start()
+            if self.simulation_suspended:
+                # the simulation is stepped manually, possibly many ticks
+                # within one frame, so an interval running with the clock
+                # would not follow the ticks. Turn right away instead.
+                self.main_node.setH(newH)
+            else:
+                self.main_node.setH(curH)
+                rotatetoH = self.main_node.quatInterval(0.1, Point3(newH, 0, 0))
+                rotatetoH.start()
             if not self.customP:
                 self.main_node.setP(0)
             self.main_node.setR(0)
             self.customP = False
         self.main_node.setFluidPos(self.main_node, speed)
-        if self.state not in self.ignore_step_states:
+        if not self.state_flags[self.state] & self.STATE_FLAG_IGNORE_STEP:
             if self.doStep():
                 self.landing_force = self.actorNode.getPhysicsObject().getVelocity()
-                if self.state not in self.on_ground_states:
+                if not self.state_flags[self.state] & self.STATE_FLAG_ON_GROUND:
                     self.actorNode.getPhysicsObject().setVelocity(0, 0, 0)
                     self.plugin_requestNewState(self.STATE_LAND)
             elif self.state != self.STATE_JUMP and self.state != self.STATE_FALL:
@@ -373,20 +695,27 @@ class Physics:
         the characters main collision solids. It will check stepping as
         well as check if the character should fall or just landed
         somewhere."""
-        if self.state in self.ignore_step_states:
+        if self.simulation_suspended:
+            # the event arrives after the manual steps, whose movement
+            # updates already did the step check for each tick
             pass
-        elif self.doStep():
-            if self.state == self.STATE_JUMP or self.state == self.STATE_FALL:
-                self.landing_force = self.actorNode.getPhysicsObject().getVelocity()
-                self.actorNode.getPhysicsObject().setVelocity(0, 0, 0)
-                self.plugin_requestNewState(self.STATE_LAND)
-        elif self.state != self.STATE_JUMP and self.state != self.STATE_FALL:
-            self.plugin_requestNewState(self.STATE_FALL)
+        elif not self.state_flags[self.state] & self.STATE_FLAG_IGNORE_STEP:
+            # the step check of the last movement update used up the
+            # result of the foot ray, so it has to be traversed again
+            self.markRayDirty(self.foot_ray_id)
+            self.updateDirtyRays()
+            if self.doStep():
+                if self.state == self.STATE_JUMP or self.state == self.STATE_FALL:
+                    self.landing_force = self.actorNode.getPhysicsObject().getVelocity()
+                    self.actorNode.getPhysicsObject().setVelocity(0, 0, 0)
+                    self.plugin_requestNewState(self.STATE_LAND)
+            elif self.state != self.STATE_JUMP and self.state != self.STATE_FALL:
+                self.plugin_requestNewState(self.STATE_FALL)
         self.enterNewState()
-        base.messenger.send("plugin-character-in-collision", [collision])
+        base.messenger.send(self.plugin_getUniqueName("plugin-character-in-collision"), [collision])
 
     def charOutCollisions(self, collision):
-        base.messenger.send("plugin-character-out-collision", [collision])
+        base.messenger.send(self.plugin_getUniqueName("plugin-character-out-collision"), [collision])
 
     def checkInBodyContact(self, collision):
         self.char_collision_dict[collision.getIntoNode().getName()] = collision
@@ -403,33 +732,23 @@ class Physics:
 
     def checkFloatingPlatform(self, entry):
         if entry is not None:
-            if entry.getName().startswith(self.getConfig("platform_collision_prefix")):
+            platform = self.platform_registry.getPlatformRoot(entry)
+            if platform is not None:
                 # we landed on a moving platform
-                p = render.find("**/%s"%entry.getName())
-                self.setActivePlatform(self.__findPlatformRoot(p))
+                self.setActivePlatform(platform)
                 self.pre_set_platform = True
 
     def cleanFloatingPlatform(self):
         if not self.pre_set_platform:
             self.setActivePlatform(None)
 
-    def __findPlatformRoot(self, platform):
-        """This method will find the root node of a floating platform
-        which then may be used to update the characters position on that
-        specific platform. This function will be called recursively."""
-        if platform.hasParent():
-            if platform.node().getType() == ModelRoot:
-                return platform
-            return self.__findPlatformRoot(platform.getParent())
-        return platform
-
     def doStep(self):
         """This method will process the characters downward stepping to
         prevent it from floating. It will also check if the character
         landed on a movable platform and set it as active platform.
         This function will return True whenever the character has been
         stepped on the ground and falls if there was no step"""
-        if self.state not in self.ignore_step_states:
+        if not self.state_flags[self.state] & self.STATE_FLAG_IGNORE_STEP:
             # do the step height check
             char_step_collision = self.getFirstCollisionEntryInLine(self.foot_ray_id)
 
@@ -440,23 +759,23 @@ class Physics:
 
             shiftZ = 0
 
-            if self.getConfig("do_step_up_check"):
+            if self.cfg.do_step_up_check:
                 #
                 # In this section we are going to check if the character should
                 # move up on stairs. For this we need to gather all collision
                 # points that have occured with the characters body collisions
                 #
-                self.stepCTrav.traverse(render)
+                self.stepCTrav.traverse(self.__getTraverseRoot("step-check", self.main_node.getPos(render)))
                 entries = self.char_collision_queue_handler.getEntries()
                 for collision in entries:
                     if collision.hasSurfacePoint():
                         newPos = collision.getSurfacePoint(self)
                         # chec if the found collision is within the range of a step
-                        if newPos.getZ() >= self.getConfig("stepheight_min_up") and newPos.getZ() <= self.getConfig("stepheight_max_up"):
+                        if newPos.getZ() >= self.cfg.stepheight_min_up and newPos.getZ() <= self.cfg.stepheight_max_up:
                             # move up a tiny bit, so we won't stuck in the ground
                             newPos.setZ(newPos.getZ() + 0.2)
                             # also move forward by the given amount so we won't fall off of the step right away
-                            newPos.setY(newPos.getY() - self.getConfig("step_up_forward_distance"))
+                            newPos.setY(newPos.getY() - self.cfg.step_up_forward_distance)
                             self.main_node.setFluidPos(self.main_node, newPos)
                             return True
 
@@ -474,7 +793,7 @@ class Physics:
                         # sometimes the calculated distance is in the wrong direction
                         if dist < 0: continue
                         shiftZ = dist
-                        if dist < self.getConfig("player_height")/100.0:
+                        if dist < self.cfg.player_height/100.0:
                             char_step_collision = char_step_collision if char_step_collision is not None else collision
                             groundNode = groundNode if groundNode is not None else collision.getIntoNode()
                             break
@@ -485,7 +804,7 @@ class Physics:
                                 # collision sphere of the player
                                 dist = self.characterBodySphereRadius
 
-                            dt = globalClock.getDt()
+                            dt = self.dt
                             moveVec = pos
                             moveVec.setZ(0)
                             moveVec *= -1
@@ -497,14 +816,13 @@ class Physics:
             self.clearFirstCollisionEntryOfRay(self.foot_ray_id)
             self.cleanFloatingPlatform()
             self.pre_set_platform = False
-            if groundNode is not None:
-                if groundNode.getName().startswith(self.getConfig("platform_collision_prefix")):
-                    # we landed on a moving platform
-                    p = render.find("**/%s"%groundNode.getName())
-                    self.setActivePlatform(self.__findPlatformRoot(p))
+            platform = self.platform_registry.getPlatformRoot(groundNode)
+            if platform is not None:
+                # we landed on a moving platform
+                self.setActivePlatform(platform)
 
             # prevent slipping
-            if self.state in self.prevent_slip_states and char_step_collision is not None:
+            if self.state_flags[self.state] & self.STATE_FLAG_PREVENT_SLIP and char_step_collision is not None:
                 # get the angle of the part of the ground we currently
                 # stand on
                 floor_normal = char_step_collision.getSurfaceNormal(render)
@@ -513,7 +831,7 @@ class Physics:
                 zx = abs(zx-90)
                 zy = abs(zy-90)
                 # if the angle is within a specific range
-                if zy <= self.getConfig("slip_free_angle") and zx <= self.getConfig("slip_free_angle"):
+                if zy <= self.cfg.slip_free_angle and zx <= self.cfg.slip_free_angle:
                     # prevent slipping
                     if zy > 0 or zx > 0:
                         self.toggleFlyMode(True)
@@ -527,7 +845,7 @@ class Physics:
                     self.main_node.setFluidZ(pos.getZ() - shiftZ)
                     return True
             return False
-        elif self.anRemoved and self.state not in self.flying_states:
+        elif self.anRemoved and not self.state_flags[self.state] & self.STATE_FLAG_FLYING:
             self.toggleFlyMode(False)
         self.setActivePlatform(None)
         return False
@@ -557,6 +875,9 @@ class Physics:
     def getSurfaceNormal(self, entry, np):
         return entry.getSurfaceNormal(np)
 
+    def getIntoNodePath(self, entry):
+        return entry.getIntoNodePath()
+
     def getFallForce(self):
         return self.actorNode.getPhysicsObject().getVelocity().getZ()
 
@@ -599,7 +920,7 @@ class Physics:
         otherwise it will return False"""
         if new_position is None: return False
         self.charFutureCollisions.setPos(new_position)
-        self.futureCTrav.traverse(render)
+        self.futureCTrav.traverse(self.__getTraverseRoot("future-check", self.charFutureCollisions.getPos(render)))
         if self.charFutureCollisionsQueue.getNumEntries() > 0:
             return False
         else:
@@ -619,28 +940,28 @@ class Physics:
         character. It will synch it's position with the player as well
         as calculate it's size when the player is further away from the
         shadow/ground"""
-        if not self.getConfig("use_simple_shadow"): return
+        if not self.cfg.use_simple_shadow: return
         self.shadowRayQueue.sortEntries()
         pos = None
         if self.shadowRayQueue.getNumEntries() > 0:
             pos = self.shadowRayQueue.getEntry(0).getSurfacePoint(render)
             #normal = self.shadowRayQueue.getEntry(0).getSurfaceNormal(render)
         if pos is not None:
-            self.shadow.setPos(pos.getX(), pos.getY(), pos.getZ() + self.getConfig("shadow_z_offset"))
+            self.shadow.setPos(pos.getX(), pos.getY(), pos.getZ() + self.cfg.shadow_z_offset)
             z_a = pos.getZ()
             z_b = self.main_node.getZ()
             dist = z_b - z_a
             # check if we should scale the shadow below the character
             if dist <= 0:
-                self.shadow.setScale(self.getConfig("max_shadow_scale"))
+                self.shadow.setScale(self.cfg.max_shadow_scale)
             else:
                 # calculate the shadows scale from its current distance
                 # to the player
-                scale = self.getConfig("shadow_min_scale_dist") - dist / self.getConfig("shadow_scale_factor")
-                if scale < self.getConfig("min_shadow_scale"):
-                    scale = self.getConfig("min_shadow_scale")
-                elif scale > self.getConfig("max_shadow_scale"):
-                    scale = self.getConfig("max_shadow_scale")
+                scale = self.cfg.shadow_min_scale_dist - dist / self.cfg.shadow_scale_factor
+                if scale < self.cfg.min_shadow_scale:
+                    scale = self.cfg.min_shadow_scale
+                elif scale > self.cfg.max_shadow_scale:
+                    scale = self.cfg.max_shadow_scale
                 self.shadow.setScale(scale)
 
     def doJump(self, forwardSpeed, jump_direction=Vec3(0,0,0), extraSpeedVec=Vec3()):
@@ -660,12 +981,12 @@ class Physics:
         #
         # Jump vector calculation
         #
-        dt = globalClock.getDt()
+        dt = self.dt
         jumpVec = Vec3(
             jump_direction.getX()*dt,
-            -((forwardSpeed*self.getConfig("jump_forward_force_mult"))+jump_direction.getY())*dt,
-            (self.getConfig("phys_jump_strength")+jump_direction.getZ()))#*dt)
-        jumpVec *= self.getConfig("jump_strength")
+            -((forwardSpeed*self.cfg.jump_forward_force_mult)+jump_direction.getY())*dt,
+            (self.cfg.phys_jump_strength+jump_direction.getZ()))#*dt)
+        jumpVec *= self.cfg.jump_strength
 
         #
         # Extra speed calculation
@@ -690,27 +1011,27 @@ class Physics:
         velZ = vel.getZ()
 
         # Make sure we don't jump/move faster than we are alowed to
-        if abs(velX) > self.getConfig("max_jump_force_internal_X") \
-        or abs(velY) > self.getConfig("max_jump_force_internal_Y"):
+        if abs(velX) > self.cfg.max_jump_force_internal_X \
+        or abs(velY) > self.cfg.max_jump_force_internal_Y:
             # we need to make sure X and Y are at the same distance
             # as before otherwise jump direction will be shifted
             if abs(velX) > abs(velY):
                 pass
                 #TODO: Calculate diff between x and y and subtract/add to respective other
             if velX < 0:
-                velX = -self.getConfig("max_jump_force_internal_X")
+                velX = -self.cfg.max_jump_force_internal_X
             else:
-                velX = self.getConfig("max_jump_force_internal_X")
-        if abs(velY) > self.getConfig("max_jump_force_internal_Y"):
+                velX = self.cfg.max_jump_force_internal_X
+        if abs(velY) > self.cfg.max_jump_force_internal_Y:
             if velY < 0:
-                velY = -self.getConfig("max_jump_force_internal_Y")
+                velY = -self.cfg.max_jump_force_internal_Y
             else:
-                velY = self.getConfig("max_jump_force_internal_Y")
-        if abs(velZ) > self.getConfig("max_jump_force_internal_Z"):
+                velY = self.cfg.max_jump_force_internal_Y
+        if abs(velZ) > self.cfg.max_jump_force_internal_Z:
             if velZ < 0:
-                velZ = -self.getConfig("max_jump_force_internal_Z")
+                velZ = -self.cfg.max_jump_force_internal_Z
             else:
-                velZ = self.getConfig("max_jump_force_internal_Z")
+                velZ = self.cfg.max_jump_force_internal_Z
         #TODO: This portion can be shared END
 
         self.actorNode.getPhysicsObject().setVelocity(velX, velY, velZ)
@@ -719,6 +1040,14 @@ class Physics:
         """Reset velocities of the characters physic node"""
         self.actorNode.getPhysicsObject().setVelocity(0,0,0)
 
+    def getVelocity(self):
+        """Returns the velocity of the characters physic node"""
+        return self.actorNode.getPhysicsObject().getVelocity()
+
+    def setVelocity(self, velocity):
+        """Set the velocity of the characters physic node"""
+        self.actorNode.getPhysicsObject().setVelocity(velocity)
+
     def setActivePlatform(self, platform):
         self.active_platform = platform
 
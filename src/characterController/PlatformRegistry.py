@@ -0,0 +1,179 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from panda3d.core import Vec3, ModelRoot
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+#
+# MOVING PLATFORM HANDLING
+#
+class PlatformRegistry:
+    """This class keeps track of all moving platforms a character can
+    stand on. Platforms register once, either by calling
+    registerPlatform with the platforms root node or by being tagged
+    and found with registerTaggedPlatforms. Afterwards the collision
+    nodes of a platform map to its root without searching the scene
+    graph.
+
+    The registry also calculates the velocity and rotation of each
+    platform once per frame, so every character and camera standing on
+    the same platform will get the same values."""
+
+    class Platform:
+        def __init__(self, root, platformId):
+            self.root = root
+            # a number identifying this platform, e.g. in saved states
+            self.platform_id = platformId
+            # the frame in which this platform has been sampled last
+            self.frame = -1
+            self.last_pos = None
+            self.last_h = None
+            # position and heading change since the previous frame
+            self.velocity = Vec3(0, 0, 0)
+            self.rotation = 0.0
+
+        def sample(self, frame):
+            """Update the velocity and rotation of this platform for the
+            given frame. If the platform hasn't been sampled in the
+            previous frame, its velocity will be reset, as the change
+            can't be related to one frame anymore."""
+            if frame == self.frame: return
+            pos = self.root.getPos(render)
+            h = self.root.getH(render)
+            if frame - self.frame == 1:
+                self.velocity = pos - self.last_pos
+                self.rotation = h - self.last_h
+            else:
+                self.velocity = Vec3(0, 0, 0)
+                self.rotation = 0.0
+            self.last_pos = pos
+            self.last_h = h
+            self.frame = frame
+
+    def __init__(self, platformPrefix=None):
+        # if given, collision nodes with this name prefix that haven't
+        # been registered will be searched for in the scene graph once
+        # and then get registered with their found root node
+        self.platform_prefix = platformPrefix
+        # maps the root nodes of platforms to their platform data
+        self.platforms = {}
+        # maps the platform ids to the platform root nodes
+        self.platform_ids = {}
+        self.next_platform_id = 0
+        # maps collision nodes to the platform root
+        self.collision_nodes = {}
+        # maps the names of nodes with the platform prefix to the
+        # platform root, names of other nodes may as well be used by
+        # static parts of the level
+        self.collision_names = {}
+
+    def registerPlatform(self, root):
+        """Register the given node path as root of a moving platform.
+        All nodes below that root, including the collision nodes and
+        bullet bodies, will be mapped to it."""
+        if root.node() in self.platforms: return
+        self.platforms[root.node()] = self.Platform(root, self.next_platform_id)
+        self.platform_ids[self.next_platform_id] = root
+        self.next_platform_id += 1
+        self.__mapNode(root.node(), root)
+        for np in root.findAllMatches("**"):
+            self.__mapNode(np.node(), root)
+
+    def registerTaggedPlatforms(self, searchRoot, tag="platform"):
+        """Register all nodes below searchRoot which have the given tag
+        set as moving platforms"""
+        for np in searchRoot.findAllMatches("**/=" + tag):
+            self.registerPlatform(np)
+
+    def unregisterPlatform(self, root):
+        """Remove the platform with the given root from the registry"""
+        platform = self.platforms.pop(root.node(), None)
+        if platform is None: return
+        del self.platform_ids[platform.platform_id]
+        for node, platformRoot in list(self.collision_nodes.items()):
+            if platformRoot == root:
+                del self.collision_nodes[node]
+        for name, platformRoot in list(self.collision_names.items()):
+            if platformRoot == root:
+                del self.collision_names[name]
+
+    def getPlatformRoots(self):
+        """Returns the root node paths of all registered platforms"""
+        return [platform.root for platform in self.platforms.values()]
+
+    def getPlatformId(self, root):
+        """Returns the id of the platform with the given root or -1 if
+        it isn't registered"""
+        if root is None: return -1
+        platform = self.platforms.get(root.node())
+        if platform is None: return -1
+        return platform.platform_id
+
+    def getPlatformById(self, platformId):
+        """Returns the root of the platform with the given id or None"""
+        return self.platform_ids.get(platformId)
+
+    def __mapNode(self, node, root):
+        self.collision_nodes[node] = root
+        if self.platform_prefix is not None \
+        and node.getName().startswith(self.platform_prefix):
+            self.collision_names[node.getName()] = root
+
+    def getPlatformRoot(self, node):
+        """Returns the root of the platform the given node belongs to or
+        None if it isn't part of a moving platform."""
+        if node is None: return None
+        root = self.collision_nodes.get(node)
+        if root is not None: return root
+
+        if self.platform_prefix is None \
+        or not node.getName().startswith(self.platform_prefix):
+            return None
+        root = self.collision_names.get(node.getName())
+        if root is not None: return root
+        # fallback for platforms that haven't been registered, only
+        # search for them once and register them afterwards
+        np = render.find("**/{}".format(node.getName()))
+        if np.isEmpty(): return None
+        root = self.findPlatformRoot(np)
+        self.registerPlatform(root)
+        self.__mapNode(node, root)
+        return root
+
+    def findPlatformRoot(self, platform):
+        """This method will find the root node of a floating platform by
+        walking up the given nodes parents until a model root is found."""
+        while platform.hasParent():
+            if platform.node().getType() == ModelRoot:
+                return platform
+            platform = platform.getParent()
+        return platform
+
+    def getPlatformVelocity(self, root):
+        """Returns the distance the platform with the given root moved
+        since the last frame"""
+        platform = self.__getSampledPlatform(root)
+        return Vec3(platform.velocity)
+
+    def getPlatformRotation(self, root):
+        """Returns the amount of degrees the platform with the given root
+        rotated around its Z-axis since the last frame"""
+        platform = self.__getSampledPlatform(root)
+        return platform.rotation
+
+    def __getSampledPlatform(self, root):
+        platform = self.platforms.get(root.node())
+        if platform is None:
+            self.registerPlatform(root)
+            platform = self.platforms[root.node()]
+        platform.sample(globalClock.getFrameCount())
+        return platform
@@ -4,15 +4,16 @@
 #
 # PYTHON IMPORTS
 #
+import collections
+import itertools
 import logging
-import uuid
 
 #
 # PANDA3D ENGINE IMPORTS
 #
 from direct.actor.Actor import Actor
 from direct.fsm.FSM import FSM, RequestDenied
-from panda3d.core import WindowProperties, Vec3
+from panda3d.core import WindowProperties, Vec3, Point3
 from direct.gui.OnscreenImage import OnscreenImage
 
 #
@@ -25,18 +26,20 @@ if USEBULLET:
 elif USEINTERNAL:
     from .PhysicsInternal import Physics
 from .Animator import Animator
+from .PlatformRegistry import PlatformRegistry
+from .ControlPluginPipeline import ControlPluginPipeline
+from .PStatsInstrumentation import PStatsInstrumentation
+from .PluginLoader import PluginLoader
+from .InputSnapshot import InputSnapshot
+from .InputRecording import InputRecorder
+from .StateSnapshot import StateSnapshot
 
 #
 # PLUGIN IMPORTS
 #
 from .cameraPlugins.CameraThirdPerson import CameraThirdPerson
 from .cameraPlugins.CameraFirstPerson import CameraFirstPerson
-from .inputPlugins import plugKeyboard
-from .inputPlugins import plugGamepad
-from .controlPlugins import plug01WallRun
-from .controlPlugins import plug02LedgeGrab
-from .controlPlugins import plug03WallCollisionAvoidance
-from .controlPlugins import plug04Climb
+from .cameraPlugins.CameraHeadless import CameraHeadless
 
 __author__ = "Fireclaw the Fox"
 __license__ = """
@@ -44,7 +47,7 @@ Simplified BSD (BSD 2-Clause) License.
 See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 """
 
-class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
+class PlayerController(FSM, Config, Physics, Actor, Mover, Animator, StateSnapshot):
     """This is the main class for the extended character controller.
     From here you can control, start/stop and pause the character.
 
@@ -91,8 +94,46 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
     STATE_LAND = "Land"
     STATE_FALL = "Fall"
 
-    def __init__(self, physic_world, configFile):
+    # Flags of the state groups, see compileStates
+    STATE_FLAG_ON_GROUND = 1 << 0
+    STATE_FLAG_IGNORE_INPUT = 1 << 1
+    STATE_FLAG_FLYING = 1 << 2
+    STATE_FLAG_PREVENT_ROTATION = 1 << 3
+    STATE_FLAG_PREVENT_JUMP = 1 << 4
+    STATE_FLAG_PREVENT_SLIP = 1 << 5
+    STATE_FLAG_IGNORE_STEP = 1 << 6
+    STATE_FLAG_IGNORE_POS_UPDATE = 1 << 7
+    STATE_FLAG_WALK = 1 << 8
+    STATE_FLAG_RUN = 1 << 9
+    STATE_FLAG_SPRINT = 1 << 10
+    STATE_FLAG_JUMP_AND_FALL = 1 << 11
+    # the state group lists and the flag their states will get
+    STATE_GROUP_FLAGS = (
+        ("on_ground_states", STATE_FLAG_ON_GROUND),
+        ("ignore_input_states", STATE_FLAG_IGNORE_INPUT),
+        ("flying_states", STATE_FLAG_FLYING),
+        ("prevent_rotation_states", STATE_FLAG_PREVENT_ROTATION),
+        ("prevent_jump_states", STATE_FLAG_PREVENT_JUMP),
+        ("prevent_slip_states", STATE_FLAG_PREVENT_SLIP),
+        ("ignore_step_states", STATE_FLAG_IGNORE_STEP),
+        ("ignore_pos_update_states", STATE_FLAG_IGNORE_POS_UPDATE),
+        ("walk_states", STATE_FLAG_WALK),
+        ("run_states", STATE_FLAG_RUN),
+        ("sprint_states", STATE_FLAG_SPRINT),
+        ("jump_and_fall_states", STATE_FLAG_JUMP_AND_FALL))
+    # transition mask of states which can transit to any state
+    ANY_STATE = -1
+
+    # used to give every controller its own default ID
+    __instance_counter = itertools.count()
+
+    def __init__(self, physic_world, configFile, platformRegistry=None, inputPlugins=None, controllerId=None, rayTraversal=None, collisionGrid=None):
         logging.info("INIT PLAYER...")
+        # the ID is used to keep task, ray and event names of multiple
+        # controllers apart, see plugin_getUniqueName
+        if controllerId is None:
+            controllerId = "character{}".format(next(PlayerController.__instance_counter))
+        self.controller_id = controllerId
         # NOTE: this variable may be overwritten by the physics module
         #       by a node that is controlled by physics and will move
         #       the main node around
@@ -101,10 +142,23 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         self.movementVec = Vec3()
         logging.info("INIT CONFIG...")
         Config.__init__(self, configFile)
+        if self.getConfig("headless"):
+            # there is nothing to render the shadow to
+            self.setConfig("use_simple_shadow", False)
         # additional initial configuration settings set by the outher application
         self.physic_world = physic_world
+        # the registry of moving platforms may be shared between multiple
+        # characters so platform speeds only get calculated once a frame
+        if platformRegistry is None:
+            platformRegistry = PlatformRegistry(self.getConfig("platform_collision_prefix"))
+        self.platform_registry = platformRegistry
+        # the rays registered by the control plugins
+        self.plugin_ray_ids = []
         logging.info("INIT PHYSICS...")
-        Physics.__init__(self)
+        # the ray traversal may be shared between multiple characters to
+        # test the rays of all of them in one pass, same goes for the
+        # collision grid indexing the level
+        Physics.__init__(self, rayTraversal, collisionGrid)
         logging.info("INIT MOVER...")
         Mover.__init__(self)
         logging.info("INIT CONTROL PLUGINS...")
@@ -114,6 +168,7 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
             self.control_plugs_list[i].__init__(self)
         logging.info("INIT ANIMATOR...")
         Animator.__init__(self)
+        StateSnapshot.__init__(self)
         logging.info("INIT PLAYER DONE")
 
         #
@@ -123,6 +178,9 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         self.defaultTransitions = {
             "*":[]
         }
+        # the transitions and state groups will be compiled into bit
+        # masks once all core states are registered
+        self.states_compiled = False
 
 
         # setup state groups
@@ -306,6 +364,10 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
             self.STATE_FALL,[
                 self.STATE_LAND,
                 self.STATE_JUMP])
+        # all states registered so far are handled by the mover itself,
+        # states added later on are special states of the plugins
+        self.core_states = frozenset(self.defaultTransitions) - {"*"}
+        self.compileStates()
 
         #
         # ACTOR SETUP
@@ -321,6 +383,8 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         #
         # Init camera mode and respective animations
         #
+        # the PStats timing of the update phases, see startPStats
+        self.pstats = PStatsInstrumentation(self)
         logging.info("INIT CAMERA HANDLER...")
         if self.getConfig("first_pserson_mode"):
             logging.info("INIT FIRST PERSON CAMERA...")
@@ -347,25 +411,29 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         #
         # CONTROLS SETUP
         #
-        self.isDown = base.mouseWatcherNode.isButtonDown
+        if self.getConfig("headless"):
+            self.isDown = lambda button: False
+        else:
+            self.isDown = base.mouseWatcherNode.isButtonDown
 
         #
         # Load Plugins
         #
-        #TODO: write generic python file loader
-        self.inputPlugins = [
-            plugKeyboard.Plugin(self, uuid.uuid4()),
-            plugGamepad.Plugin(self, uuid.uuid4())
-        ]
+        # the plugins to load are listed in the config, see PluginLoader
+        self.plugin_loader = PluginLoader(self)
+        if inputPlugins is not None:
+            self.inputPlugins = inputPlugins
+        else:
+            # headless characters get their input set from outside
+            self.inputPlugins = self.plugin_loader.loadInputPlugins(self.getConfig("headless"))
+        # the input of all input plugins, collected once per frame
+        self.input_snapshot = InputSnapshot()
         # this dict will hold all plugins. The key will be used for
         # setting the priority and the value will be a list of plugins
         # in that specific priority
-        self.controlPlugins = {
-            5:[plug04Climb.Plugin(self, uuid.uuid4())],
-            10:[plug02LedgeGrab.Plugin(self, uuid.uuid4())],
-            20:[plug01WallRun.Plugin(self, uuid.uuid4())],
-            50:[plug03WallCollisionAvoidance.Plugin(self, uuid.uuid4())]
-        }
+        self.control_plugin_pipeline = ControlPluginPipeline(
+            self.plugin_loader.loadControlPlugins())
+        self.controlPlugins = self.control_plugin_pipeline.plugins
         logging.info("INIT PLAYER DONE")
 
     # OVERRIDE THE defaultFilter FROM FSM
@@ -407,25 +475,11 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
             # of the map is the current state name; for that key, the
             # value is a list of allowed transitions from the
             # indicated state.
-            if request in self.defaultTransitions.get(self.state, []):
-                # This transition is listed in the defaultTransitions map;
-                # accept it.
-                return (request,) + args
-
-            elif '*' in self.defaultTransitions.get(self.state, []):
-                # Whenever we have a '*' as our to transition, we allow
-                # to transit to any other state
-                return (request,) + args
-
-            elif request in self.defaultTransitions.get('*', []):
-                # If the requested state is in the default transitions
-                # from any state list, we also alow to transit to the
-                # new state
-                return (request,) + args
-
-            elif '*' in self.defaultTransitions.get('*', []):
-                # This is like we had set the defaultTransitions to None.
-                # Any state can transit to any other state
+            if self.canTransitionTo(request):
+                # This transition is listed in the defaultTransitions map
+                # of the current state or the any state '*' list or one
+                # of them contains the '*' itself, which allows to transit
+                # to any other state. See compileStates.
                 return (request,) + args
 
             # If self.defaultTransitions is not None, it is an error
@@ -456,6 +510,7 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
     def catchCursor(self):
         """This method will center the mouse cursor on the window and
         ensures it doesn't move away from there"""
+        if self.getConfig("headless"): return
         # center the mouse in the middle of the window
         base.win.movePointer(0, self.getConfig("win_width_half"), self.getConfig("win_height_half"))
         # Set mouse mode to relative which should work best for our purpose
@@ -472,6 +527,7 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         """This function will activate the normal mouse mode and should
         be called after a catchCursor call to release the mouse from
         the window"""
+        if self.getConfig("headless"): return
         # free the cursor
         wp = WindowProperties()
         wp.setMouseMode(WindowProperties.M_absolute)
@@ -495,14 +551,9 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         if mode == "firstperson":
             self.setConfig("first_pserson_mode", True)
             logging.info("INIT FIRST PERSON CAMERA...")
-            self.cam_near_clip = self.getConfig("cam_near_clip_default_firstperson")
-            self.cam_fov = self.getConfig("cam_fov_default_firstperson")
-            self.mouse_speed_x = self.getConfig("mouse_speed_x_default_firsrperson")
-            self.mouse_speed_y = self.getConfig("mouse_speed_y_default_firsrperson")
-            self.keyboard_cam_speed_x = self.getConfig("keyboard_cam_speed_x_default_firsrperson")
-            self.keyboard_cam_speed_y = self.getConfig("keyboard_cam_speed_y_default_firsrperson")
-            self.camera_handler = CameraFirstPerson(
-                self,
+            self.loadCameraConfig()
+            self.camera_handler = self.__createCameraHandler(
+                CameraFirstPerson,
                 self.cam_near_clip,
                 self.getConfig("cam_far_clip"),
                 self.cam_fov)
@@ -523,14 +574,9 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         elif mode == "thirdperson":
             self.setConfig("first_pserson_mode", False)
             logging.info("INIT THIRD PERSON CAMERA...")
-            self.cam_near_clip = self.getConfig("cam_near_clip_default_thirdperson")
-            self.cam_fov = self.getConfig("cam_fov_default_thirdperson")
-            self.mouse_speed_x = self.getConfig("mouse_speed_x_default_thirdperson")
-            self.mouse_speed_y = self.getConfig("mouse_speed_y_default_thirdperson")
-            self.keyboard_cam_speed_x = self.getConfig("keyboard_cam_speed_x_default_thirdperson")
-            self.keyboard_cam_speed_y = self.getConfig("keyboard_cam_speed_y_default_thirdperson")
-            self.camera_handler = CameraThirdPerson(
-                self,
+            self.loadCameraConfig()
+            self.camera_handler = self.__createCameraHandler(
+                CameraThirdPerson,
                 self.cam_near_clip,
                 self.getConfig("cam_far_clip"),
                 self.cam_fov)
@@ -549,6 +595,7 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
                 self.ROLL: self.getConfig("anim_roll"),})
         else:
             logging.error("Unknown camera mode!")
+        self.pstats.instrumentCamera()
         # "preload" all animations of the character
         self.bindAllAnims()
         if not initMode:
@@ -557,6 +604,48 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
             self.camera_handler.startCamera()
             self.camera_handler.centerCamera()
 
+    def loadCameraConfig(self):
+        """Set the camera values of the current camera mode from the
+        config"""
+        if self.cfg.first_pserson_mode:
+            self.cam_near_clip = self.cfg.cam_near_clip_default_firstperson
+            self.cam_fov = self.cfg.cam_fov_default_firstperson
+            self.mouse_speed_x = self.cfg.mouse_speed_x_default_firsrperson
+            self.mouse_speed_y = self.cfg.mouse_speed_y_default_firsrperson
+            self.keyboard_cam_speed_x = self.cfg.keyboard_cam_speed_x_default_firsrperson
+            self.keyboard_cam_speed_y = self.cfg.keyboard_cam_speed_y_default_firsrperson
+        else:
+            self.cam_near_clip = self.cfg.cam_near_clip_default_thirdperson
+            self.cam_fov = self.cfg.cam_fov_default_thirdperson
+            self.mouse_speed_x = self.cfg.mouse_speed_x_default_thirdperson
+            self.mouse_speed_y = self.cfg.mouse_speed_y_default_thirdperson
+            self.keyboard_cam_speed_x = self.cfg.keyboard_cam_speed_x_default_thirdperson
+            self.keyboard_cam_speed_y = self.cfg.keyboard_cam_speed_y_default_thirdperson
+
+    def configReloaded(self, changedKeys):
+        """Recalculate everything that has been derived from the config
+        when it got set up, after the config file has been reloaded.
+        Values that are read from cfg every frame, like the shadow scale
+        limits, don't need any update."""
+        self.loadCameraConfig()
+        if not self.cfg.headless:
+            base.camLens.setNearFar(self.cam_near_clip, self.cfg.cam_far_clip)
+            base.camLens.setFov(self.cam_fov)
+        # move all rays to their new positions
+        self.setupRays()
+        for plugin in self.control_plugin_pipeline.getPlugins():
+            if hasattr(plugin, "setupRays"):
+                plugin.setupRays()
+        if self.cfg.use_simple_shadow:
+            self.shadow.setScale(self.cfg.max_shadow_scale)
+
+    def __createCameraHandler(self, cameraClass, near, far, fov):
+        """Create the camera handler of the given class or the no-op
+        headless camera if we run without a window"""
+        if self.getConfig("headless"):
+            cameraClass = CameraHeadless
+        return cameraClass(self, near, far, fov)
+
     def startPlayer(self):
         """This function must be called after a player has been set up
         to make it do anything and actually show up in the game"""
@@ -572,6 +661,10 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         self.camera_handler.centerCamera()
         logging.debug("...player started")
         self.catchCursor()
+        if self.cfg.config_hot_reload:
+            self.startConfigWatcher()
+        if self.cfg.pstats_instrumentation:
+            self.startPStats()
 
     def stopPlayer(self):
         """This function should be called as soon as the character isn't
@@ -581,18 +674,61 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         logging.debug("stop player...")
         logging.debug("...stop control...")
         self.stopControl()
+        # this puts the character back into the simulation, so it has to
+        # be done before the physics are stopped
+        self.stopInputRecording()
+        logging.debug("...stop physics...")
+        self.stopPhysics()
+        self.stopConfigWatcher()
+        self.stopPStats()
+        self.plugin_loader.cleanup()
+        for plugin in self.inputPlugins:
+            if hasattr(plugin, "cleanup"):
+                plugin.cleanup()
         logging.debug("...stop camera...")
         self.camera_handler.stopCamera()
         logging.debug("...stop base...")
         self.freeCursor()
         # remove the simple shadow
-        self.shadow.removeNode()
+        if self.getConfig("use_simple_shadow"):
+            self.shadow.removeNode()
         Animator.cleanup(self)
         # remove the actor
         Actor.cleanup(self)
         self.removeNode()
         logging.debug("...player stop")
 
+    def startInputRecording(self, filename, keyframeInterval=None):
+        """Write the input of every movement update to the given file, so
+        it can be played back with the replay input plugin. The state of
+        the character is stored every keyframeInterval frames, which
+        defaults to the input_recording_keyframe_interval config value.
+        While recorded, the character is taken out of the physics
+        simulation and stepped manually, just like the replay does."""
+        self.stopInputRecording()
+        if keyframeInterval is None:
+            keyframeInterval = self.getConfig("input_recording_keyframe_interval")
+        self.input_recorder = InputRecorder(self, filename, keyframeInterval)
+        self.suspendSimulation()
+
+    def stopInputRecording(self):
+        """Stop the recording and close its file"""
+        if self.input_recorder is None: return
+        self.input_recorder.close()
+        self.input_recorder = None
+        self.resumeSimulation()
+
+    def startPStats(self):
+        """Time the update phases, control plugins and physics backend
+        calls of this character with PStatCollectors. To see them, the
+        application has to connect to a PStats server, e.g. by setting
+        want-pstats."""
+        self.pstats.enable()
+
+    def stopPStats(self):
+        """Remove the PStats timing again"""
+        self.pstats.disable()
+
     def pausePlayer(self):
         """This function will stop the player from beeing controlable by
         the user but will not hide or remove the player from the game"""
@@ -643,10 +779,116 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         if isPreventJump:
             self.prevent_jump_states.append(state)
 
+        if self.states_compiled:
+            self.compileStates()
+
     def plugin_addStateTransition(self, state, transitions):
         """This function will add the given transition states to the
         passed transition"""
         self.defaultTransitions[state] += transitions
+        if self.states_compiled:
+            self.compileStates()
+
+    #
+    # COMPILED STATES
+    #
+    def compileStates(self):
+        """Compile the registered states into integer ids and bit masks.
+
+        state_bits maps each state to its bit, state_transitions maps each
+        state to the mask of the states it can transit to, with the '*'
+        entries already resolved and ANY_STATE for states which can transit
+        to every state. state_listed_transitions only holds the explicitly
+        listed transitions. state_flags maps each state to the flags of
+        the state groups it is in.
+
+        This is done by plugin_registerState and plugin_addStateTransition,
+        if the state group lists or defaultTransitions are changed in any
+        other way, this has to be called again."""
+        def flatten(states):
+            for state in states:
+                if isinstance(state, list):
+                    # states registered twice hold the later given list
+                    yield from flatten(state)
+                else:
+                    yield state
+
+        transitions = {
+            state: list(flatten(toStates))
+            for state, toStates in self.defaultTransitions.items()}
+        ids = {}
+        for state, toStates in transitions.items():
+            for name in [state] + toStates:
+                if name != "*" and name not in ids:
+                    ids[name] = len(ids)
+        bits = {state: 1 << stateId for state, stateId in ids.items()}
+
+        def toMask(states):
+            mask = 0
+            for state in states:
+                if state != "*":
+                    mask |= bits[state]
+            return mask
+
+        anyStates = transitions.pop("*", [])
+        anyMask = self.ANY_STATE if "*" in anyStates else toMask(anyStates)
+        self.state_ids = ids
+        # the state names by their id
+        self.state_names = list(ids)
+        self.state_bits = bits
+        self.state_listed_transitions = {}
+        self.state_transitions = {}
+        for state, toStates in transitions.items():
+            mask = toMask(toStates)
+            self.state_listed_transitions[state] = mask
+            if "*" in toStates:
+                mask = self.ANY_STATE
+            self.state_transitions[state] = mask | anyMask
+        # used for states that have not been registered
+        self.state_transitions_default = anyMask
+
+        # unknown states, like None while transiting, are in no group
+        self.state_flags = collections.defaultdict(int)
+        for state in ids:
+            self.state_flags[state] = 0
+        for groupName, flag in self.STATE_GROUP_FLAGS:
+            for state in getattr(self, groupName):
+                self.state_flags[state] |= flag
+        self.states_compiled = True
+
+    def canTransitionTo(self, request):
+        """Returns True if the FSM can transit from the current state to
+        the requested state"""
+        mask = self.state_transitions.get(self.state, self.state_transitions_default)
+        return mask == self.ANY_STATE or mask & self.state_bits.get(request, 0) != 0
+
+    def isTransitionListed(self, request):
+        """Returns True if the requested state is explicitly listed in the
+        transitions of the current state, ignoring all '*' entries"""
+        return self.state_listed_transitions.get(self.state, 0) & self.state_bits.get(request, 0) != 0
+
+    def hasStateFlag(self, flag, state=None):
+        """Returns True if the given state or the current state is in the
+        state group of the given STATE_FLAG_*"""
+        if state is None:
+            state = self.state
+        return self.state_flags[state] & flag != 0
+
+    def plugin_addControlPlugin(self, plugin, priority):
+        """Add a control plugin with the given priority, plugins with a
+        lower priority will be called first"""
+        self.control_plugin_pipeline.addPlugin(plugin, priority)
+        self.pstats.instrumentPlugin(plugin)
+        self.invalidateStateLayout()
+
+    def plugin_removeControlPlugin(self, plugin):
+        """Remove the given control plugin"""
+        self.control_plugin_pipeline.removePlugin(plugin)
+        self.invalidateStateLayout()
+
+    def plugin_setControlPluginActive(self, plugin, active):
+        """Activate or deactivate the given control plugin"""
+        self.control_plugin_pipeline.setPluginActive(plugin, active)
 
     def plugin_setCurrentAnimationPlayRate(self,rate):
         self.setCurrentAnimsPlayRate(rate)
@@ -674,12 +916,15 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         """This function is for usage in plugins and interal to set the
         players position to the given point"""
         self.main_node.setPos(pos)
+        # don't interpolate from the previous position to the new one
+        self.resetInterpolation()
         if self.getConfig("use_simple_shadow"):
             self.shadow.setPos(pos)
-        # We need to update the physics here as otherwise the foot
+        # We need to update the foot ray here as otherwise the foot
         # collider might still have a collision entry set at the last
         # point and hence will "step" back to that position.
-        self.updatePhysics()
+        self.markRayDirty(self.foot_ray_id)
+        self.updateDirtyRays()
 
     def plugin_getPos(self, relTo=None):
         if relTo is not None:
@@ -701,20 +946,16 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
 
     def calcMoveDirection(self):
         """check for the characters movement direction"""
-        maxVec = Vec3()
-        for plugin in self.inputPlugins:
-            if plugin.active:
-                plugVec = plugin.getMovementVec()
-                if abs(plugVec.getX()) > abs(maxVec.getX()):
-                    maxVec.setX(plugVec.getX())
-
-                if abs(plugVec.getY()) > abs(maxVec.getY()):
-                    maxVec.setY(plugVec.getY())
-
-                if abs(plugVec.getZ()) > abs(maxVec.getZ()):
-                    maxVec.setZ(plugVec.getZ())
+        self.plugin_setMoveDirection(Vec3(self.input_snapshot.move_direction))
 
-        self.plugin_setMoveDirection(maxVec)
+    def plugin_getInputSnapshot(self, update=False):
+        """Returns the InputSnapshot holding the input of all active input
+        plugins for the current frame. It will be collected if it hasn't
+        been collected in this frame yet or if update is set."""
+        frame = globalClock.getFrameCount()
+        if update or self.input_snapshot.frame != frame:
+            self.input_snapshot.collect(self.inputPlugins, frame)
+        return self.input_snapshot
 
     def plugin_getHpr(self):
         """This function is for usage in plugins and interal to get the
@@ -725,6 +966,7 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         """This function is for usage in plugins and interal to set the
         players rotation to the given angles"""
         self.main_node.setHpr(hpr)
+        self.resetInterpolation()
 
     def plugin_requestFly(self):
         """This function is for usage in plugins and interal to request
@@ -737,13 +979,46 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         be a negative floating point value"""
         return self.getFallForce()
 
-    def plugin_registerCharacterRayCheck(self, ray_id, pos_a, pos_b, ignore_ray_cycles=False):
+    def plugin_registerCharacterRayCheck(self, ray_id, pos_a, pos_b, ignore_ray_cycles=False, max_age_frames=None, max_age_ms=None, priority=0):
         """"Create a ray segment for the used physics system at the
         given position and attaches it to the players main node. This
         should to be used for any ray check you want to use in the
-        application.
+        application. Registering an existing ray again will only move it
+        to the given positions.
+        max_age_frames or max_age_ms set how stale the result of the ray
+        may get before it will be refreshed and priority will prefer
+        this ray over others which are equally close to their deadline.
         """
-        self.registerRayCheck(ray_id, pos_a, pos_b, self.main_node, ignore_ray_cycles)
+        if ray_id in self.raylist:
+            # already registered, e.g. when the plugins rays get set up
+            # again after the config changed
+            self.updateRayPositions(ray_id, Point3(pos_a), Point3(pos_b))
+            return
+        self.registerRayCheck(
+            ray_id, pos_a, pos_b, self.main_node, ignore_ray_cycles,
+            max_age_frames, max_age_ms, priority)
+        self.plugin_ray_ids.append(ray_id)
+
+    def setPluginRaysEnabled(self, enabled):
+        """Enable or disable all rays registered by the control plugins.
+        Disabled rays report no collisions, so the plugins won't start
+        any of their actions."""
+        self.setRaysEnabled(self.plugin_ray_ids, enabled)
+
+    def plugin_getRayAge(self, ray_id):
+        """Returns the amount of frames since the result of the ray with
+        the given ID has been updated the last time"""
+        return self.getRayAge(ray_id)
+
+    def plugin_getRayAgeMs(self, ray_id):
+        """Returns the time in milliseconds since the result of the ray
+        with the given ID has been updated the last time"""
+        return self.getRayAgeMs(ray_id)
+
+    def plugin_getUniqueName(self, name):
+        """Returns the given task, ray or event name prefixed with the ID
+        of this controller, so multiple controllers won't interfere"""
+        return "{}-{}".format(self.controller_id, name)
 
     def plugin_isFirstPersonMode(self):
         return self.getConfig("first_pserson_mode")
@@ -760,3 +1035,12 @@ class PlayerController(FSM, Config, Physics, Actor, Mover, Animator):
         also be used to set the characters orientation at later times."""
         self.plugin_setHpr(startHpr)
 
+    def registerPlatform(self, platformRoot):
+        """Register the given node path as a moving platform the
+        character can stand on and get moved around with."""
+        self.platform_registry.registerPlatform(platformRoot)
+
+    def unregisterPlatform(self, platformRoot):
+        """Remove a previously registered moving platform"""
+        self.platform_registry.unregisterPlatform(platformRoot)
+
@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PYTHON IMPORTS
+#
+import uuid
+import logging
+import importlib
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+#
+# PLUGIN LOADING
+#
+class PluginLoader:
+    """Loads the input and control plugins listed in the config. Each
+    entry of the input_plugins, headless_input_plugins and control_plugins
+    lists describes one plugin:
+
+    module     - the module of the plugin, relative names like
+                 ".controlPlugins.plug04Climb" are relative to the
+                 characterController package
+    class      - the class in that module, defaults to "Plugin"
+    priority   - control plugins only, lower priorities are called first
+    enabled    - set to false to not load the plugin at all
+    enabled_by - name of a boolean config value, the plugin will only be
+                 loaded while it is set
+
+    Plugins are only imported when they get loaded. Control plugins with
+    an enabled_by value which is off will be loaded as soon as that value
+    gets switched on with setConfig."""
+
+    # used if the config doesn't list any plugins
+    DEFAULT_INPUT_PLUGINS = [
+        {"module": ".inputPlugins.plugKeyboard"},
+        {"module": ".inputPlugins.plugGamepad"}]
+    DEFAULT_HEADLESS_INPUT_PLUGINS = [
+        {"module": ".inputPlugins.plugInjected"}]
+    DEFAULT_CONTROL_PLUGINS = [
+        {"module": ".controlPlugins.plug04Climb", "priority": 5, "enabled_by": "climb_enabled"},
+        {"module": ".controlPlugins.plug02LedgeGrab", "priority": 10, "enabled_by": "ledge_grab_enabled"},
+        {"module": ".controlPlugins.plug01WallRun", "priority": 20, "enabled_by": "wall_run_enabled"},
+        {"module": ".controlPlugins.plug03WallCollisionAvoidance", "priority": 50, "enabled_by": "wall_avoidance_enable"}]
+
+    def __init__(self, core):
+        self.core = core
+        # the config observers waiting to load a control plugin
+        self.pending = {}
+
+    def getEntries(self, key, default):
+        entries = self.core.config.get(key)
+        if entries is None:
+            return default
+        return entries
+
+    def isEnabled(self, entry):
+        """Returns True if the plugin of the given entry should be loaded"""
+        if not entry.get("enabled", True):
+            return False
+        flag = entry.get("enabled_by")
+        return flag is None or bool(self.core.getConfig(flag))
+
+    def loadPlugin(self, entry):
+        """Import the plugin of the given entry and return a new instance
+        of it"""
+        logging.debug("LOAD PLUGIN {}...".format(entry["module"]))
+        module = importlib.import_module(entry["module"], __package__)
+        pluginClass = getattr(module, entry.get("class", "Plugin"))
+        return pluginClass(self.core, uuid.uuid4())
+
+    def loadInputPlugins(self, headless=False):
+        """Returns a list of all enabled input plugins"""
+        if headless:
+            entries = self.getEntries("headless_input_plugins", self.DEFAULT_HEADLESS_INPUT_PLUGINS)
+        else:
+            entries = self.getEntries("input_plugins", self.DEFAULT_INPUT_PLUGINS)
+        return [self.loadPlugin(entry) for entry in entries if self.isEnabled(entry)]
+
+    def loadControlPlugins(self):
+        """Returns a dict with the priorities as keys and lists of all
+        enabled control plugins of that priority as values. Plugins which
+        are only disabled by their enabled_by value will be loaded later
+        on if that value gets switched on."""
+        plugins = {}
+        for entry in self.getEntries("control_plugins", self.DEFAULT_CONTROL_PLUGINS):
+            if self.isEnabled(entry):
+                plugins.setdefault(entry.get("priority", 0), []).append(self.loadPlugin(entry))
+            elif entry.get("enabled", True):
+                self.deferControlPlugin(entry)
+        return plugins
+
+    def deferControlPlugin(self, entry):
+        """Load the control plugin of the given entry once its enabled_by
+        config value gets switched on"""
+        flag = entry["enabled_by"]
+        def observer(key, value):
+            if not value: return
+            self.core.removeConfigObserver(flag, observer)
+            del self.pending[entry["module"]]
+            self.core.plugin_addControlPlugin(self.loadPlugin(entry), entry.get("priority", 0))
+        self.pending[entry["module"]] = (flag, observer)
+        self.core.addConfigObserver(flag, observer)
+
+    def cleanup(self):
+        """Stop waiting for any deferred plugins"""
+        for flag, observer in self.pending.values():
+            self.core.removeConfigObserver(flag, observer)
+        self.pending = {}
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PYTHON IMPORTS
+#
+import collections
+import time
+
+#
+# CHARACTER CONTROLLER IMPORTS
+#
+from .InputRecording import getFrame
+from .inputPlugins.plugReplay import Plugin as ReplayPlugin
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+#
+# CLIENT SIDE PREDICTION
+#
+class ClientPrediction:
+    """Predicts the movement of a networked character from its local
+    input and corrects it with the authoritative states of the server.
+
+    Every call to update runs one movement update with the current input
+    and keeps the input and the resulting state in a ring buffer. The
+    input is handed to the send callback, which should pass it on to the
+    server together with the tick number. When the server answers with
+    its state for a tick, that state is compared with the predicted one.
+    If they differ, the character is set back to the server state and all
+    inputs the server hasn't answered yet are simulated again.
+
+    While started, the prediction drives the movement updates and the
+    physics of the character itself, so it must not be updated by a
+    CharacterManager at the same time."""
+
+    def __init__(self, core, send=None, bufferSize=None):
+        self.core = core
+        # called with the tick number and the input frame tuple of every
+        # predicted tick, see InputRecording.packFrame to send it
+        self.send = send
+        if bufferSize is None:
+            bufferSize = core.getConfig("prediction_buffer_size")
+        self.position_tolerance = core.getConfig("prediction_position_tolerance")
+        self.buffer_size = bufferSize
+        # the tick number, input and resulting state of each slot
+        self.ticks = [-1] * bufferSize
+        self.inputs = [None] * bufferSize
+        self.states = [bytearray(core.getStateSize()) for i in range(bufferSize)]
+        # the number of the next tick to predict
+        self.tick = 0
+        # the latest tick confirmed by the server
+        self.acked_tick = -1
+        self.replay = ReplayPlugin(core, "prediction")
+        self.active = False
+        self.resetMetrics()
+
+    def start(self):
+        """Take over the movement updates and physics of the character"""
+        if self.active: return
+        self.active = True
+        self.core.stopControl()
+        self.core.suspendSimulation()
+
+    def stop(self):
+        """Hand the character back to its own movement task"""
+        if not self.active: return
+        self.active = False
+        self.core.resumeSimulation()
+        self.core.startControl()
+
+    def resetMetrics(self):
+        self.metrics = {
+            "ticks": 0,
+            "states_received": 0,
+            "states_dropped": 0,
+            "reconciliations": 0,
+            "resimulated_ticks": 0,
+            "resimulation_time": 0.0,
+            "max_resimulation_time": 0.0,
+            "max_position_error": 0.0}
+
+    def getMetrics(self):
+        """Returns the counters of the prediction and how often and how
+        expensive reconciliations have been, the times are in seconds"""
+        metrics = dict(self.metrics)
+        received = max(1, metrics["states_received"])
+        reconciliations = max(1, metrics["reconciliations"])
+        metrics["reconciliation_rate"] = metrics["reconciliations"] / received
+        metrics["average_resimulation_time"] = metrics["resimulation_time"] / reconciliations
+        metrics["unacknowledged_ticks"] = self.tick - self.acked_tick - 1
+        return metrics
+
+    def update(self, dt):
+        """Predict the next tick with the current input of the character"""
+        tick = self.tick
+        slot = tick % self.buffer_size
+        self.core.stepMovement(dt)
+        frame = getFrame(dt, self.core.input_snapshot)
+        self.ticks[slot] = tick
+        self.inputs[slot] = frame
+        self.core.saveState(self.states[slot])
+        self.tick += 1
+        self.metrics["ticks"] += 1
+        if self.send is not None:
+            self.send(tick, frame)
+
+    def receiveState(self, tick, state):
+        """Handle the authoritative state of the server for the given
+        tick. Returns True if the character had to be corrected."""
+        self.metrics["states_received"] += 1
+        slot = tick % self.buffer_size
+        if tick <= self.acked_tick or self.ticks[slot] != tick:
+            # an outdated state or the tick is not in the buffer anymore
+            self.metrics["states_dropped"] += 1
+            return False
+        self.acked_tick = tick
+
+        layout = self.core.getStateLayout()
+        predicted = layout.unpack_from(self.states[slot])
+        authoritative = layout.unpack_from(state)
+        error = sum((predicted[i] - authoritative[i]) ** 2 for i in range(3)) ** 0.5
+        self.metrics["max_position_error"] = max(self.metrics["max_position_error"], error)
+        # the FSM state id follows the position, rotation and velocity
+        if error <= self.position_tolerance and predicted[9] == authoritative[9]:
+            return False
+
+        self.reconcile(tick, state)
+        return True
+
+    def reconcile(self, tick, state):
+        """Set the character back to the given state of the given tick and
+        simulate all later ticks again"""
+        start = time.perf_counter()
+        self.core.restoreState(state)
+        self.states[tick % self.buffer_size][:] = state
+        for resimulated in range(tick + 1, self.tick):
+            slot = resimulated % self.buffer_size
+            self.replay.simulateFrame(self.inputs[slot])
+            self.core.saveState(self.states[slot])
+        duration = time.perf_counter() - start
+
+        self.metrics["reconciliations"] += 1
+        self.metrics["resimulated_ticks"] += self.tick - tick - 1
+        self.metrics["resimulation_time"] += duration
+        self.metrics["max_resimulation_time"] = max(self.metrics["max_resimulation_time"], duration)
+
+
+#
+# LOOPBACK SERVER
+#
+class LoopbackServer:
+    """A stand in for the server, e.g. for tests of the prediction. It
+    runs the authoritative simulation on the predicted character itself,
+    by switching between the client and the server state with
+    saveState and restoreState. The states are answered after the given
+    number of ticks of latency.
+
+    If given, the correction callable is called with the character and
+    the tick after each authoritative tick, so it can change the server
+    state to let the prediction fail, like a push only the server knows
+    about would do."""
+
+    def __init__(self, prediction, latency=0, correction=None):
+        self.prediction = prediction
+        self.core = prediction.core
+        self.latency = latency
+        self.correction = correction
+        self.state = self.core.saveState()
+        self.replay = ReplayPlugin(self.core, "loopback")
+        # the answers as (due tick, tick, state) in the order they are sent
+        self.outbox = collections.deque()
+        prediction.send = self.receiveInput
+
+    def receiveInput(self, tick, frame):
+        """Simulate the given input on the server state"""
+        client = self.core.saveState()
+        self.core.restoreState(self.state)
+        self.replay.simulateFrame(frame)
+        if self.correction is not None:
+            self.correction(self.core, tick)
+        self.state = self.core.saveState()
+        self.core.restoreState(client)
+        self.outbox.append((tick + self.latency, tick, self.state))
+        self.deliver(tick)
+
+    def deliver(self, currentTick):
+        """Send all answers which are due at the given tick"""
+        while self.outbox and self.outbox[0][0] <= currentTick:
+            due, tick, state = self.outbox.popleft()
+            self.prediction.receiveState(tick, state)
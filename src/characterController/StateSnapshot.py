@@ -0,0 +1,186 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PYTHON IMPORTS
+#
+import struct
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from panda3d.core import Point3, Vec3
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+# state id used for states which are set to None
+NO_STATE = 0xFFFF
+
+
+#
+# STATE SAVING
+#
+class StateSnapshot:
+    """This class saves and restores the complete simulation state of a
+    character into a bytes object with a fixed layout, for example to
+    roll back a networked character or to retry from a checkpoint.
+
+    The layout holds the values of the mover and physics given in
+    CORE_FORMAT, followed by the values of each control plugin which
+    defines a state_format. Such plugins have to implement getState,
+    returning a tuple matching their state_format, and setState, taking
+    that tuple again. The layout only depends on the registered states
+    and the control plugins, so states can be stored as long as neither
+    of those change.
+
+    Animations and the camera are not part of the state, they will
+    follow the restored state with the next update. Only the time of
+    the current animation sequence is stored, as the transition waiting
+    for it to finish is part of the simulation."""
+
+    CORE_FORMAT = "".join((
+        "3f",  # position
+        "3f",  # heading, pitch and roll
+        "3f",  # physics velocity
+        "3H",  # state, previous state and pre jump state ids
+        "4d",  # current, current max and pre jump accleration, stamina
+        "?",   # stamina was empty
+        "2d",  # fall time, jump press time
+        "3?",  # was jumping, is first jump, is airborn
+        "3f",  # jump direction
+        "d",   # jump strength
+        "3f",  # last platform speed
+        "i",   # active platform id
+        "?",   # pre set platform
+        "3f",  # landing force
+        "d",   # timestep accumulator
+        "d"))  # current sequence time, negative if none is running
+
+    def __init__(self):
+        self.state_layout = None
+        self.state_plugins = None
+
+    def getStateLayout(self):
+        """Returns the struct used to save the state of this character"""
+        if self.state_layout is None:
+            # the plugins with a state and the number of their values
+            self.state_plugins = []
+            formats = [self.CORE_FORMAT]
+            for plugin in self.control_plugin_pipeline.getPlugins():
+                if not hasattr(plugin, "state_format"): continue
+                pluginLayout = struct.Struct("<" + plugin.state_format)
+                valueCount = len(pluginLayout.unpack(bytes(pluginLayout.size)))
+                self.state_plugins.append((plugin, valueCount))
+                formats.append(plugin.state_format)
+            self.state_layout = struct.Struct("<" + "".join(formats))
+        return self.state_layout
+
+    def getStateSize(self):
+        """Returns the size of a saved state in bytes"""
+        return self.getStateLayout().size
+
+    def invalidateStateLayout(self):
+        """Has to be called whenever control plugins are added or removed,
+        states saved before can't be restored afterwards"""
+        self.state_layout = None
+        self.state_plugins = None
+
+    def __getStateId(self, state):
+        # the FSM is in no state while it is in a transition
+        return self.state_ids.get(state, NO_STATE)
+
+    def __getState(self, stateId):
+        if stateId == NO_STATE: return None
+        return self.state_names[stateId]
+
+    def saveState(self, buffer=None):
+        """Returns the current state of the character as bytes. If a
+        writable buffer like a bytearray of getStateSize bytes is given,
+        the state will be written into that one instead."""
+        layout = self.getStateLayout()
+        pos = self.plugin_getPos()
+        hpr = self.plugin_getHpr()
+        velocity = self.getVelocity()
+        landing_force = self.landing_force if self.landing_force is not None else Vec3()
+        seq = self.current_seq
+        seqTime = -1.0
+        if seq is not None and seq.getState() != seq.SFinal:
+            seqTime = seq.getT()
+        values = [
+            pos.x, pos.y, pos.z,
+            hpr.x, hpr.y, hpr.z,
+            velocity.x, velocity.y, velocity.z,
+            self.__getStateId(self.state),
+            self.__getStateId(self.prev_state),
+            self.__getStateId(self.pre_jump_state),
+            self.current_accleration,
+            self.current_max_accleration,
+            self.pre_jump_accleration,
+            self.stamina,
+            self.stamina_was_empty,
+            self.fall_time,
+            self.cur_jump_press_time,
+            self.was_jumping,
+            self.is_first_jump,
+            self.is_airborn,
+            self.jump_direction.x, self.jump_direction.y, self.jump_direction.z,
+            self.cfg.jump_strength,
+            self.last_platform_speed.x, self.last_platform_speed.y, self.last_platform_speed.z,
+            self.platform_registry.getPlatformId(self.getActivePlatform()),
+            self.pre_set_platform,
+            landing_force.x, landing_force.y, landing_force.z,
+            self.timestep_accumulator,
+            seqTime]
+        for plugin, valueCount in self.state_plugins:
+            values.extend(plugin.getState())
+        if buffer is None:
+            return layout.pack(*values)
+        layout.pack_into(buffer, 0, *values)
+        return buffer
+
+    def restoreState(self, data):
+        """Put the character back into the state saved with saveState"""
+        values = self.getStateLayout().unpack_from(data)
+
+        # entering the land state depends on the pre jump state
+        self.pre_jump_state = self.__getState(values[11])
+        state = self.__getState(values[9])
+        if state is not None and self.state != state:
+            self.forceTransition(state)
+        self.prev_state = self.__getState(values[10])
+
+        self.plugin_setPos(Point3(*values[0:3]))
+        self.plugin_setHpr(Vec3(*values[3:6]))
+        self.setVelocity(Vec3(*values[6:9]))
+
+        (self.current_accleration,
+         self.current_max_accleration,
+         self.pre_jump_accleration,
+         self.stamina,
+         self.stamina_was_empty,
+         self.fall_time,
+         self.cur_jump_press_time,
+         self.was_jumping,
+         self.is_first_jump,
+         self.is_airborn) = values[12:22]
+        self.jump_direction = Vec3(*values[22:25])
+        if self.cfg.jump_strength != values[25]:
+            self.setConfig("jump_strength", values[25])
+        self.last_platform_speed = Vec3(*values[26:29])
+        self.setActivePlatform(self.platform_registry.getPlatformById(values[29]))
+        self.pre_set_platform = values[30]
+        self.landing_force = Vec3(*values[31:34])
+        self.timestep_accumulator = values[34]
+        seq = self.current_seq
+        if values[35] >= 0 and seq is not None and seq.getState() != seq.SFinal:
+            # continue the transition of the state where it was
+            seq.setT(values[35])
+
+        index = 36
+        for plugin, valueCount in self.state_plugins:
+            plugin.setState(values[index:index+valueCount])
+            index += valueCount
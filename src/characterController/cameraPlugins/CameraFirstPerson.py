@@ -42,7 +42,7 @@ class CameraFirstPerson:
         # the main camera classes
         self.cam_floater = self.core.main_node
         self.cam_floater = self.core.main_node.attachNewNode(PandaNode("playerCamFloater"))
-        pos = Vec3(tuple(self.core.getConfig("cam_floater_pos")))
+        pos = Vec3(self.core.cfg.cam_floater_pos)
         self.cam_floater.setPos(pos)
 
         # this is the part of the armature which we will control using
@@ -50,21 +50,21 @@ class CameraFirstPerson:
         self.TorsorControl = self.core.controlJoint(None,"modelRoot","neck")
         self.torsor_init_rotation = self.TorsorControl.getHpr()
         self.reset_cursor_once = True
-        taskMgr.add(self.updateCamera, "task_camActualisation", priority=-4)
+        taskMgr.add(self.updateCamera, self.core.plugin_getUniqueName("task_camActualisation"), priority=-4)
 
     def stopCamera(self):
         camera.reparentTo(render)
-        taskMgr.remove("task_camActualisation")
+        taskMgr.remove(self.core.plugin_getUniqueName("task_camActualisation"))
         self.cam_floater.removeNode()
 
     def pauseCamera(self):
-        base.win.movePointer(0, self.core.getConfig("win_width_half"), self.core.getConfig("win_height_half"))
+        base.win.movePointer(0, self.core.cfg.win_width_half, self.core.cfg.win_height_half)
         # make sure the camera is controlable from outside again
         camera.reparentTo(render)
         # initially keep it at the eyes position
         camera.setPos(self.eyes.getPos(render))
         camera.setHpr(self.eyes.getHpr(render))
-        taskMgr.remove("task_camActualisation")
+        taskMgr.remove(self.core.plugin_getUniqueName("task_camActualisation"))
 
     def resumeCamera(self):
         # make sure the camera is correctly placed before it is
@@ -75,12 +75,16 @@ class CameraFirstPerson:
         # we want to reset the cursor so we don't respect pre made mouse
         # movements which may occure due to off-center mouse placements
         self.reset_cursor_once = True
-        taskMgr.add(self.updateCamera, "task_camActualisation", priority=-4)
+        taskMgr.add(self.updateCamera, self.core.plugin_getUniqueName("task_camActualisation"), priority=-4)
 
     def centerCamera(self):
         """This method will move the camera centered behind the player model"""
         self.TorsorControl.setHpr(self.torsor_init_rotation)
-        base.win.movePointer(0, self.core.getConfig("win_width_half"), self.core.getConfig("win_height_half"))
+        base.win.movePointer(0, self.core.cfg.win_width_half, self.core.cfg.win_height_half)
+
+    def getViewNode(self):
+        """Returns the node the characters movement input is relative to"""
+        return camera
 
     def requestReposition(self, new_cam_pos):
         pass
@@ -93,22 +97,15 @@ class CameraFirstPerson:
         if task.frame % 3:
             yield task.cont
 
-        cam_rotation = Vec3()
         dt = globalClock.getDt()
 
-        cam_left = False
-        cam_right = False
-        cam_up = False
-        cam_down = False
-        cam_center = False
-        for self.core.plugin in self.core.inputPlugins:
-            if self.core.plugin.active:
-                cam_left = cam_left or self.core.plugin.getCamButton("camera-left")
-                cam_right = cam_right or self.core.plugin.getCamButton("camera-right")
-                cam_up = cam_up or self.core.plugin.getCamButton("camera-up")
-                cam_down = cam_down or self.core.plugin.getCamButton("camera-down")
-                cam_center = cam_center or self.core.plugin.getCenterCamState()
-                cam_rotation = self.core.plugin.getRotationVec()
+        snapshot = self.core.plugin_getInputSnapshot()
+        cam_left = snapshot.cam_left
+        cam_right = snapshot.cam_right
+        cam_up = snapshot.cam_up
+        cam_down = snapshot.cam_down
+        cam_center = snapshot.center_cam
+        cam_rotation = Vec3(snapshot.rotation)
         if cam_rotation != Vec3():
             # we ignore button presses for camera movement if we have an analog style movement
             # this fixes a problem if the cam movement for buttons and rotation are set to the
@@ -141,7 +138,7 @@ class CameraFirstPerson:
 
         # check if we want to reset the cursor before we head on
         if self.reset_cursor_once:
-            base.win.movePointer(0, self.core.getConfig("win_width_half"), self.core.getConfig("win_height_half"))
+            base.win.movePointer(0, self.core.cfg.win_width_half, self.core.cfg.win_height_half)
             self.reset_cursor_once = False
 
         # get the mouse cursor position
@@ -153,7 +150,7 @@ class CameraFirstPerson:
         # specific range.
         # NOTE: maybe we should calculate the difference that the value should change like if value of h is -366 it should move to 354 instead of 360.
         def check_h(h):
-            if self.core.state not in self.core.prevent_rotation_states:
+            if not self.core.state_flags[self.core.state] & self.core.STATE_FLAG_PREVENT_ROTATION:
                 if h < -360:
                     h = 360
                 elif h > 360:
@@ -174,23 +171,23 @@ class CameraFirstPerson:
 
         # now place it in the middle of the window so we can see how far
         # the mouse has been moved
-        if base.win.movePointer(0, self.core.getConfig("win_width_half"), self.core.getConfig("win_height_half")) or cam_rotation != Vec3() or movement_key_pressed:
+        if base.win.movePointer(0, self.core.cfg.win_width_half, self.core.cfg.win_height_half) or cam_rotation != Vec3() or movement_key_pressed:
 
             #        VERTICAL
             # calculate the vertical movement speed
             movement_y = cam_rotation.getY() * self.core.keyboard_cam_speed_y * dt
 
             keyboard_speed = self.core.keyboard_cam_speed_y * dt
-            if self.core.getConfig("keyboard_invert_vertical"):
+            if self.core.cfg.keyboard_invert_vertical:
                 keyboard_speed = -keyboard_speed
             if cam_up:
                 movement_y -= keyboard_speed
             elif cam_down:
                 movement_y += keyboard_speed
 
-            if self.core.getConfig("enable_mouse"):
-                mouse_speed = (mouseY - self.core.getConfig("win_height_half")) * self.core.mouse_speed_y
-                if self.core.getConfig("mouse_invert_vertical"):
+            if self.core.cfg.enable_mouse:
+                mouse_speed = (mouseY - self.core.cfg.win_height_half) * self.core.mouse_speed_y
+                if self.core.cfg.mouse_invert_vertical:
                     mouse_speed = -mouse_speed
                 movement_y += mouse_speed
             p = self.TorsorControl.getP() + movement_y
@@ -206,7 +203,7 @@ class CameraFirstPerson:
 
             # keyboard/gamepad keys movement calculation
             keyboard_speed = self.core.keyboard_cam_speed_x * dt
-            if self.core.getConfig("keyboard_invert_horizontal"):
+            if self.core.cfg.keyboard_invert_horizontal:
                 keyboard_speed = -keyboard_speed
             if cam_left:
                 movement_x += keyboard_speed
@@ -214,13 +211,13 @@ class CameraFirstPerson:
                 movement_x -= keyboard_speed
 
             # mouse movement calculation
-            if self.core.getConfig("enable_mouse"):
-                mouse_speed = (mouseX - self.core.getConfig("win_width_half")) * self.core.mouse_speed_x
-                if not self.core.getConfig("mouse_invert_horizontal"):
+            if self.core.cfg.enable_mouse:
+                mouse_speed = (mouseX - self.core.cfg.win_width_half) * self.core.mouse_speed_x
+                if not self.core.cfg.mouse_invert_horizontal:
                     mouse_speed = -mouse_speed
                 movement_x += mouse_speed
 
-            if self.core.state not in self.core.prevent_rotation_states:
+            if not self.core.state_flags[self.core.state] & self.core.STATE_FLAG_PREVENT_ROTATION:
                 h = check_h(self.core.main_node.getH() + movement_x)
                 newHpr = self.core.main_node.getHpr()
                 newHpr.setX(h)
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+#
+# PANDA3D ENGINE IMPORTS
+#
+from panda3d.core import PandaNode
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+
+#
+# CAMERA FUNCTIONS
+#
+class CameraHeadless:
+    """A camera replacement for running the character without a window,
+    for example on a dedicated server. It doesn't touch the global
+    camera or lens and has no update task.
+
+    The movement input of the character is still given relative to a
+    view, which is represented by a node facing along the worlds
+    negative y-axis unless it is turned with setViewHeading."""
+    def __init__(self, core, near=0.5, far=5000, fov=90):
+        self.core = core
+        self.view_node = render.attachNewNode(PandaNode("headlessView"))
+
+    def startCamera(self):
+        if self.view_node.isEmpty():
+            # the view has been removed by a previous stopCamera
+            self.view_node = render.attachNewNode(PandaNode("headlessView"))
+
+    def stopCamera(self):
+        self.view_node.removeNode()
+
+    def pauseCamera(self):
+        pass
+
+    def resumeCamera(self):
+        pass
+
+    def centerCamera(self):
+        pass
+
+    def requestReposition(self, new_cam_pos):
+        pass
+
+    def camShakeNod(self, distance):
+        pass
+
+    def getViewNode(self):
+        """Returns the node the characters movement input is relative to"""
+        return self.view_node
+
+    def setViewHeading(self, h):
+        """Turn the view the movement input is relative to"""
+        self.view_node.setH(h)
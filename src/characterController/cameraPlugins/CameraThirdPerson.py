@@ -26,28 +26,27 @@ class CameraThirdPerson:
         base.camLens.setNearFar(near, far)
         base.camLens.setFov(fov)
 
-        self.last_platform_position_cam = None
-        self.last_platform_rotation_cam = None
-
         self.external_cam_pos_request = None
 
         self.ival_move_cam = None
 
         self.ival_camshake = None
 
-        self.cam_ray = "camera_check_ray"
-        self.core.registerRayCheck(self.cam_ray, (0,0,0), (0,0,1), render)
+        self.cam_ray = self.core.plugin_getUniqueName("camera_check_ray")
+        # the ray gets moved and traversed by updateCamera every frame, so
+        # it must not use up the ray budget of the scheduled rays
+        self.core.registerRayCheck(self.cam_ray, (0,0,0), (0,0,1), render, on_demand=True)
 
     def startCamera(self):
         """Starts the camera module."""
         # to enhance readability
         self.cam_floater = self.core.main_node.attachNewNode(PandaNode("playerCamFloater"))
-        pos = Vec3(tuple(self.core.getConfig("cam_floater_pos")))
+        pos = Vec3(self.core.cfg.cam_floater_pos)
         self.cam_floater.setPos(pos)
-        taskMgr.add(self.updateCamera, "task_camActualisation", priority=-4)
+        taskMgr.add(self.updateCamera, self.core.plugin_getUniqueName("task_camActualisation"), priority=-4)
 
     def stopCamera(self):
-        taskMgr.remove("task_camActualisation")
+        taskMgr.remove(self.core.plugin_getUniqueName("task_camActualisation"))
         if self.ival_move_cam is not None and self.ival_move_cam.isPlaying():
             self.ival_move_cam.finish()
             self.ival_move_cam = None
@@ -57,15 +56,15 @@ class CameraThirdPerson:
         self.cam_floater.removeNode()
 
     def pauseCamera(self):
-        taskMgr.remove("task_camActualisation")
+        taskMgr.remove(self.core.plugin_getUniqueName("task_camActualisation"))
 
     def resumeCamera(self):
-        taskMgr.add(self.updateCamera, "task_camActualisation", priority=-4)
+        taskMgr.add(self.updateCamera, self.core.plugin_getUniqueName("task_camActualisation"), priority=-4)
 
     def centerCamera(self):
         """This method will move the camera centered behind the player model"""
         # Camera Movement Updates
-        camdist = self.core.getConfig("cam_distance")#camvec.length()
+        camdist = self.core.cfg.cam_distance#camvec.length()
         # get the cameras current offset to the player model on the z-axis
         offsetZ = self.cam_floater.getZ()
         camera_old_pos = camera.getPos()
@@ -73,14 +72,18 @@ class CameraThirdPerson:
         camera_new_pos = camera.getPos()
         camera.setPos(camera_old_pos)
 
-        duration = self.core.getConfig("cam_reposition_duration")
+        duration = self.core.cfg.cam_reposition_duration
 
         self.ival_move_cam = camera.posInterval(duration, camera_new_pos)
         self.ival_move_cam.start()
 
-        base.win.movePointer(0, self.core.getConfig("win_width_half"), self.core.getConfig("win_height_half"))
+        base.win.movePointer(0, self.core.cfg.win_width_half, self.core.cfg.win_height_half)
         camera.lookAt(self.cam_floater)
 
+    def getViewNode(self):
+        """Returns the node the characters movement input is relative to"""
+        return camera
+
     def requestReposition(self, new_cam_pos):
         self.external_cam_pos_request = new_cam_pos
 
@@ -104,14 +107,13 @@ class CameraThirdPerson:
             camera.setPos(self.external_cam_pos_request)
             self.external_cam_pos_request = None
 
-        for self.core.plugin in self.core.inputPlugins:
-            if self.core.plugin.active:
-                cam_left = self.core.plugin.getCamButton("camera-left")
-                cam_right = self.core.plugin.getCamButton("camera-right")
-                cam_up = self.core.plugin.getCamButton("camera-up")
-                cam_down = self.core.plugin.getCamButton("camera-down")
-                cam_center = self.core.plugin.getCenterCamState()
-                cam_rotation = self.core.plugin.getRotationVec()
+        snapshot = self.core.plugin_getInputSnapshot()
+        cam_left = snapshot.cam_left
+        cam_right = snapshot.cam_right
+        cam_up = snapshot.cam_up
+        cam_down = snapshot.cam_down
+        cam_center = snapshot.center_cam
+        cam_rotation = Vec3(snapshot.rotation)
 
         # Camera Movement Updates
         camvec = self.cam_floater.getPos(render) - camera.getPos(render)
@@ -121,7 +123,7 @@ class CameraThirdPerson:
 
         # check if the camera should be centered
         if cam_center:
-            if self.core.getConfig("cam_show_center_letterbox"):
+            if self.core.cfg.cam_show_center_letterbox:
                 # show a letter box when centering the camera
                 if base.transitions.letterboxIval:
                     if not base.transitions.letterboxIval.isPlaying():
@@ -139,13 +141,13 @@ class CameraThirdPerson:
         dt = globalClock.getDt()
 
         # Move camera left/right with the mouse
-        if base.mouseWatcherNode.hasMouse() and self.core.getConfig("enable_mouse"):
+        if base.mouseWatcherNode.hasMouse() and self.core.cfg.enable_mouse:
             mw = base.mouseWatcherNode
-            if base.win.movePointer(0, self.core.getConfig("win_width_half"), self.core.getConfig("win_height_half")):
+            if base.win.movePointer(0, self.core.cfg.win_width_half, self.core.cfg.win_height_half):
                 # Vertical positioning
                 mouse_y = mw.getMouseY()
                 z = mouse_y * self.core.mouse_speed_y * camdist * dt
-                if self.core.getConfig("mouse_invert_vertical"):
+                if self.core.cfg.mouse_invert_vertical:
                     camera.setZ(camera, z)
                 else:
                     camera.setZ(camera, -z)
@@ -153,7 +155,7 @@ class CameraThirdPerson:
                 # Horizontal positioning
                 mouse_x = mw.getMouseX()
                 x = mouse_x * self.core.mouse_speed_x * camdist * dt
-                if self.core.getConfig("mouse_invert_horizontal"):
+                if self.core.cfg.mouse_invert_horizontal:
                     camera.setX(camera, x)
                 else:
                     camera.setX(camera, -x)
@@ -161,75 +163,70 @@ class CameraThirdPerson:
         if cam_left:
             #                   LEFT
             x = cam_left * self.core.keyboard_cam_speed_x * dt
-            if self.core.getConfig("keyboard_invert_horizontal"):
+            if self.core.cfg.keyboard_invert_horizontal:
                 x = -x
             camera.setX(camera, -x)
         elif cam_right:
             #                   RIGHT
             x = cam_right * self.core.keyboard_cam_speed_x * dt
-            if self.core.getConfig("keyboard_invert_horizontal"):
+            if self.core.cfg.keyboard_invert_horizontal:
                 x = -x
             camera.setX(camera, x)
         if cam_up:
             #                    UP
             z = cam_up * self.core.keyboard_cam_speed_y * dt
-            if self.core.getConfig("keyboard_invert_vertical"):
+            if self.core.cfg.keyboard_invert_vertical:
                 z = -z
             camera.setZ(camera, z)
         elif cam_down:
             #                   DOWN
             z = cam_down * self.core.keyboard_cam_speed_y * dt
-            if self.core.getConfig("keyboard_invert_vertical"):
+            if self.core.cfg.keyboard_invert_vertical:
                 z = -z
             camera.setZ(camera, -z)
 
         # Move camera with moving platforms
-        if self.core.getActivePlatform() is not None and self.core.state not in self.core.jump_and_fall_states:
-            platformPositionAbsolute = self.core.getActivePlatform().getPos()
+        if self.core.getActivePlatform() is not None and not self.core.state_flags[self.core.state] & self.core.STATE_FLAG_JUMP_AND_FALL:
             # Character on moving platform
-            if self.last_platform_position_cam is None:
-                self.last_platform_position_cam = platformPositionAbsolute
-            platform_speed = platformPositionAbsolute - self.last_platform_position_cam
-            self.last_platform_position_cam = platformPositionAbsolute
+            platform_speed = self.core.platform_registry.getPlatformVelocity(self.core.getActivePlatform())
             # now update the player position according to the platform
             camera.setPos(camera.getPos()+platform_speed)
-        else:
-            self.last_platform_position_cam = None
-            self.last_platform_rotation_cam = None
 
         # Get the cameras current offset to the player model on the z-axis
         offset_z = camera.getZ(render) - self.cam_floater.getZ(render)
         # check if the camera is within the min and max z-axis offset
-        if offset_z < self.core.getConfig("min_cam_height_distance"):
+        if offset_z < self.core.cfg.min_cam_height_distance:
             # the cam is to low, so move it up
-            camera.setZ(self.cam_floater.getZ(render) + self.core.getConfig("min_cam_height_distance"))
-            offset_z = self.core.getConfig("min_cam_height_distance")
-        elif offset_z > self.core.getConfig("max_cam_height_distance"):
+            camera.setZ(self.cam_floater.getZ(render) + self.core.cfg.min_cam_height_distance)
+            offset_z = self.core.cfg.min_cam_height_distance
+        elif offset_z > self.core.cfg.max_cam_height_distance:
             # the cam is to high, so move it down
-            camera.setZ(self.cam_floater.getZ(render) + self.core.getConfig("max_cam_height_distance"))
-            offset_z = self.core.getConfig("max_cam_height_distance")
+            camera.setZ(self.cam_floater.getZ(render) + self.core.cfg.max_cam_height_distance)
+            offset_z = self.core.cfg.max_cam_height_distance
 
         # lazy camera positioning
         # if we are not moving up or down, set the cam to an average position
-        if offset_z > self.core.getConfig("cam_height_avg_up"):
+        if offset_z > self.core.cfg.cam_height_avg_up:
             # the cam is higher then the average cam height above the player
             # so move it slowly down
-            camera.setZ(camera.getZ(render) - self.core.getConfig("cam_z_justification_speed") * globalClock.getDt())
-        elif offset_z < self.core.getConfig("cam_height_avg_down"):
+            camera.setZ(camera.getZ(render) - self.core.cfg.cam_z_justification_speed * globalClock.getDt())
+        elif offset_z < self.core.cfg.cam_height_avg_down:
             # the cam is lower then the average cam height above the player
             # so move it slowly up
-            camera.setZ(camera.getZ() + self.core.getConfig("cam_z_justification_speed") * globalClock.getDt())
+            camera.setZ(camera.getZ() + self.core.cfg.cam_z_justification_speed * globalClock.getDt())
 
         # If the camera is to far from player start following
-        if camdist > self.core.getConfig("max_cam_distance"):
-            camera.setPos(camera.getPos()+camvec*(camdist-self.core.getConfig("max_cam_distance")))
-            camdist = self.core.getConfig("max_cam_distance")
+        if camdist > self.core.cfg.max_cam_distance:
+            camera.setPos(camera.getPos()+camvec*(camdist-self.core.cfg.max_cam_distance))
+            camdist = self.core.cfg.max_cam_distance
 
         # camera collision detection
         # always set the cameras position to the first hitpoint on a collision solid
         had_ray_collision = False
         self.core.updateRayPositions(self.cam_ray, self.cam_floater.getPos(render), camera.getPos(render))
-        self.core.updatePhysics()
+        # only traverse the camera ray, all other rays have already been
+        # updated for this frame
+        self.core.updateDirtyRays()
         entry = self.core.getFirstCollisionEntryInLine(self.cam_ray)
         if entry is not None:
             pos = None
@@ -247,32 +244,32 @@ class CameraThirdPerson:
                 had_ray_collision = True
                 if self.ival_move_cam is None or self.ival_move_cam.isStopped():
                     offset_z = pos.getZ() - self.cam_floater.getZ(render)
-                    if offset_z < self.core.getConfig("min_cam_height_distance"):
+                    if offset_z < self.core.cfg.min_cam_height_distance:
                         # the position is to low, so move it up
-                        pos.setZ(self.cam_floater.getZ(render) + self.core.getConfig("min_cam_height_distance"))
-                    elif offset_z > self.core.getConfig("max_cam_height_distance"):
+                        pos.setZ(self.cam_floater.getZ(render) + self.core.cfg.min_cam_height_distance)
+                    elif offset_z > self.core.cfg.max_cam_height_distance:
                         # the position is to high, so move it down
-                        pos.setZ(self.cam_floater.getZ(render) + self.core.getConfig("max_cam_height_distance"))
+                        pos.setZ(self.cam_floater.getZ(render) + self.core.cfg.max_cam_height_distance)
 
                     dist = pos - self.cam_floater.getPos(render)
 
-                    duration = dist.length() * self.core.getConfig("cam_reposition_duration")
+                    duration = dist.length() * self.core.cfg.cam_reposition_duration
 
                     self.ival_move_cam = camera.posInterval(duration, pos)
                     self.ival_move_cam.start()
             self.core.clearFirstCollisionEntryOfRay(self.cam_ray)
 
         # If player is to close move the camera backwards
-        if camdist < self.core.getConfig("min_cam_distance"):
+        if camdist < self.core.cfg.min_cam_distance:
             if not had_ray_collision:
                 # move the camera backwards
-                camera.setPos(camera.getPos()-camvec*(self.core.getConfig("min_cam_distance")-camdist))
-                camdist = self.core.getConfig("min_cam_distance")
+                camera.setPos(camera.getPos()-camvec*(self.core.cfg.min_cam_distance-camdist))
+                camdist = self.core.cfg.min_cam_distance
             else:
                 # we can't move the camera back into the wall, so move it up
                 #TODO: Maybe change max_cam_height_distance with something like
                 #      self.core.min_cam_dist - camdist
-                camera.setZ(self.cam_floater.getZ() + self.core.getConfig("max_cam_height_distance"))
+                camera.setZ(self.cam_floater.getZ() + self.core.cfg.max_cam_height_distance)
 
         camera.lookAt(self.cam_floater)
         return task.cont
@@ -290,7 +287,7 @@ class CameraThirdPerson:
         posA.setZ(posA.getZ() - distance)
         ivalA = self.cam_floater.posInterval(0.25, posA)
         ivalB = self.cam_floater.posInterval(0.15, posB)
-        ivalC = self.cam_floater.posInterval(0.05, Vec3(tuple(self.core.getConfig("cam_floater_pos"))))
+        ivalC = self.cam_floater.posInterval(0.05, Vec3(self.core.cfg.cam_floater_pos))
         self.ival_camshake = Sequence(
             ivalA,
             ivalB,
@@ -20,6 +20,11 @@ See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 """
 
 class Plugin:
+    # the movement update phases this plugin will be called in
+    phases = ("action", "moveRestriction")
+    # the values returned by getState, see StateSnapshot
+    state_format = "B3?"
+
     STATE_WALL_RUN = "WallRun"
     STATE_RUN_TO_WALL_RUN = "RunToWallRun"
     STATE_SPRINT_TO_WALL_RUN = "SprintToWallRun"
@@ -32,6 +37,9 @@ class Plugin:
         self.pluginID = pid
         self.core = core
         self.do_wall_run = False
+        self.wall_run_direction = None
+        self.move_left = False
+        self.move_right = False
 
         #
         # SETUP STATES
@@ -114,43 +122,48 @@ class Plugin:
         #
         # SETUP COLLISION DETECTION
         #
+        self.setupRays()
+
+        #
+        # ACTIVATE PLUGIN
+        #
+        self.active = True
+
+    def setupRays(self):
+        """Register the rays of this plugin, calling this again will move
+        them to the positions given by the current config"""
         # Wall check rays to the front, left and right side of the player
-        point_a = (0,0,self.core.getConfig("player_height")/2.0)
-        point_b = (0, -self.core.getConfig("wall_run_forward_check_dist"), self.core.getConfig("player_height")/2.0)
+        point_a = (0,0,self.core.cfg.player_height/2.0)
+        point_b = (0, -self.core.cfg.wall_run_forward_check_dist, self.core.cfg.player_height/2.0)
         self.forward_ray = "wall_run_forward_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.forward_ray, point_a, point_b)
 
         # Left side collision
-        point_b = (self.core.getConfig("wall_run_sideward_check_dist"), 0, self.core.getConfig("player_height")/2.0)
+        point_b = (self.core.cfg.wall_run_sideward_check_dist, 0, self.core.cfg.player_height/2.0)
         self.left_ray = "wall_run_left_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.left_ray, point_a, point_b, True)
 
         # Right side collision
-        point_b = (-self.core.getConfig("wall_run_sideward_check_dist"), 0, self.core.getConfig("player_height")/2.0)
+        point_b = (-self.core.cfg.wall_run_sideward_check_dist, 0, self.core.cfg.player_height/2.0)
         self.right_ray = "wall_run_right_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.right_ray, point_a, point_b, True)
 
-        #
-        # ACTIVATE PLUGIN
-        #
-        self.active = True
-
     def updateAnimations(self, firstPersonMode):
         if firstPersonMode:
             self.core.loadAnims({
-                self.WALLRUN_LEFT: self.core.getConfig("anim_wallrun_left_fp"),
-                self.WALLRUN_RIGHT: self.core.getConfig("anim_wallrun_right_fp"),
-                self.WALLRUN_UP: self.core.getConfig("anim_wallrun_up_fp"),})
+                self.WALLRUN_LEFT: self.core.cfg.anim_wallrun_left_fp,
+                self.WALLRUN_RIGHT: self.core.cfg.anim_wallrun_right_fp,
+                self.WALLRUN_UP: self.core.cfg.anim_wallrun_up_fp,})
         else:
             self.core.loadAnims({
-                self.WALLRUN_LEFT: self.core.getConfig("anim_wallrun_left"),
-                self.WALLRUN_RIGHT: self.core.getConfig("anim_wallrun_right"),
-                self.WALLRUN_UP: self.core.getConfig("anim_wallrun_up"),})
+                self.WALLRUN_LEFT: self.core.cfg.anim_wallrun_left,
+                self.WALLRUN_RIGHT: self.core.cfg.anim_wallrun_right,
+                self.WALLRUN_UP: self.core.cfg.anim_wallrun_up,})
         # "preload" all animations of the character
         self.core.bindAllAnims()
 
     def action(self, intel_action):
-        if not self.core.getConfig("wall_run_enabled"): return
+        if not self.core.cfg.wall_run_enabled: return
         #
         # WALL COLLISION CHECKS WALL RUN
         #
@@ -168,8 +181,8 @@ class Plugin:
         # calculate the fall time as wall runs should not be chaingeable
         # imediately but only after a given time after a jump/fall
         checked_fall_time = True
-        if self.core.state in self.core.jump_and_fall_states:
-            checked_fall_time = self.core.fall_time > self.core.getConfig("wall_run_min_fall_time")
+        if self.core.state_flags[self.core.state] & self.core.STATE_FLAG_JUMP_AND_FALL:
+            checked_fall_time = self.core.fall_time > self.core.cfg.wall_run_min_fall_time
             checked_fall_time = checked_fall_time or self.core.pre_jump_state not in self.wall_run_states
 
         #
@@ -208,7 +221,7 @@ class Plugin:
                 if self.core.hasSurfaceNormal(char_front_collision_entry):
                     wall_normal = self.core.getSurfaceNormal(char_front_collision_entry, render)
                     self.setWallRunDirection(self.WALLRUN_UP)
-                    self.core.jump_direction = Vec3(tuple(self.core.getConfig("wall_run_up_jump_direction")))
+                    self.core.jump_direction = Vec3(self.core.cfg.wall_run_up_jump_direction)
 
             #
             # LEFT WALL RUN
@@ -221,13 +234,13 @@ class Plugin:
                     wall_normal.setX(-wall_normal.getX())
                     self.setWallRunDirection(self.WALLRUN_LEFT)
                     if self.move_right:
-                        self.core.jump_direction = Vec3(tuple(self.core.getConfig("wall_run_left_jump_direction")))
+                        self.core.jump_direction = Vec3(self.core.cfg.wall_run_left_jump_direction)
                     else:
-                        self.core.jump_direction = Vec3(tuple(self.core.getConfig("wall_run_forward_jump_direction")))
+                        self.core.jump_direction = Vec3(self.core.cfg.wall_run_forward_jump_direction)
 
                     # make sure we're always as close to the wall as possible
                     # get the walls possition
-                    pos = char_left_collision_entry.getSurfacePoint(render)
+                    pos = self.core.getSurfacePoint(char_left_collision_entry, render)
                     posA = NodePath("WALL-COL-TEMP")
                     posA.setPos(pos)
                     # get the characters position
@@ -241,7 +254,7 @@ class Plugin:
                     # calculate the new pos respecting the players radius,
                     # a small puffer of 0.5 units and the distance of
                     # the wall to the player
-                    newPos = (-(-diff.length() + self.core.getConfig("player_radius") + 0.5), 0, 0)
+                    newPos = (-(-diff.length() + self.core.cfg.player_radius + 0.5), 0, 0)
                     # Finally set the player to exactly that position
                     # as seen from himself
                     self.core.updatePlayerPosFix(newPos, self.core.main_node)
@@ -255,11 +268,11 @@ class Plugin:
                     wall_normal = self.core.getSurfaceNormal(char_right_collision_entry, render)
                     self.setWallRunDirection(self.WALLRUN_RIGHT)
                     if self.move_left:
-                        self.core.jump_direction = Vec3(tuple(self.core.getConfig("wall_run_right_jump_direction")))
+                        self.core.jump_direction = Vec3(self.core.cfg.wall_run_right_jump_direction)
                     else:
-                        self.core.jump_direction = Vec3(tuple(self.core.getConfig("wall_run_forward_jump_direction")))
+                        self.core.jump_direction = Vec3(self.core.cfg.wall_run_forward_jump_direction)
                     # make sure we're always as close to the wall as possible
-                    pos = char_right_collision_entry.getSurfacePoint(render)
+                    pos = self.core.getSurfacePoint(char_right_collision_entry, render)
                     posA = NodePath("WALL-COL-TEMP")
                     posA.setPos(pos)
                     posB = NodePath("CHAR-TEMP")
@@ -267,7 +280,7 @@ class Plugin:
                     diff = posA.getPos() - posB.getPos()
                     posA.removeNode()
                     posB.removeNode()
-                    newPos = (-diff.length() + self.core.getConfig("player_radius") + 0.5, 0, 0)
+                    newPos = (-diff.length() + self.core.cfg.player_radius + 0.5, 0, 0)
                     self.core.updatePlayerPosFix(newPos, self.core.main_node)
 
             #
@@ -279,7 +292,7 @@ class Plugin:
                 zy = math.atan2(wall_normal.getZ(), wall_normal.getY())*180/math.pi
                 zx = abs(zx-90)
                 zy = abs(zy-90)
-                if zy >= self.core.getConfig("min_wall_angle_for_wall_run") and zx >= self.core.getConfig("min_wall_angle_for_wall_run"):
+                if zy >= self.core.cfg.min_wall_angle_for_wall_run and zx >= self.core.cfg.min_wall_angle_for_wall_run:
                     if self.wall_run_direction == self.WALLRUN_UP:
                         # face towards the wall
                         h = math.atan2(-wall_normal.getX(), wall_normal.getY())*180/math.pi
@@ -297,7 +310,7 @@ class Plugin:
                         # the player which will simply move with it.
                         tempNP = NodePath("tempCamNP")
                         tempNP.reparentTo(self.core.main_node)
-                        tempNP.setPos(camera.getPos(self.core.main_node))
+                        tempNP.setPos(self.core.camera_handler.getViewNode().getPos(self.core.main_node))
                         # actually rotate the player towards the wall now
                         self.core.updatePlayerHpr((h, 0, 0))
                         # now use the temp nodepaths' position as the new
@@ -335,7 +348,7 @@ class Plugin:
                     #
                     self.core.plugin_requestNewState(self.STATE_WALL_RUN)
                     self.core.pre_jump_state = self.STATE_WALL_RUN
-                self.core.setConfig("jump_strength", self.core.getConfig("wall_run_off_jump_strength"))
+                self.core.setConfig("jump_strength", self.core.cfg.wall_run_off_jump_strength)
             else:
                 # We don't need to transition to any other animation
                 self.core.plugin_requestNewState(None)
@@ -362,19 +375,32 @@ class Plugin:
         if self.do_wall_run and not self.core.was_jumping:
             # if we are runing on a wall add some speed to the Z axis
             # movement of the player
-            wr_speed = self.core.getConfig("wall_run_speed") * self.core.current_accleration
-            if wr_speed > self.core.getConfig("max_wall_run_speed"):
-                wr_speed = self.core.getConfig("max_wall_run_speed")
+            wr_speed = self.core.cfg.wall_run_speed * self.core.current_accleration
+            if wr_speed > self.core.cfg.max_wall_run_speed:
+                wr_speed = self.core.cfg.max_wall_run_speed
             #if wr_speed <= 0:
-            #    wr_speed = self.core.getConfig("min_wall_run_speed")
+            #    wr_speed = self.core.cfg.min_wall_run_speed
             self.core.update_speed.setZ(wr_speed * self.core.dt)
             # Add some forward speed so the character will do wall runs more easy
-            self.core.update_speed.setY(self.core.update_speed.getY() * self.core.getConfig("wall_run_forward_speed_multiplier"))
+            self.core.update_speed.setY(self.core.update_speed.getY() * self.core.cfg.wall_run_forward_speed_multiplier)
             self.do_wall_run = False
 
     #
     # FSM EXTENSION HELPER
     #
+    def getState(self):
+        directions = (None, self.WALLRUN_UP, self.WALLRUN_LEFT, self.WALLRUN_RIGHT)
+        return (
+            directions.index(self.wall_run_direction),
+            self.do_wall_run,
+            self.move_left,
+            self.move_right)
+
+    def setState(self, state):
+        directions = (None, self.WALLRUN_UP, self.WALLRUN_LEFT, self.WALLRUN_RIGHT)
+        self.wall_run_direction = directions[state[0]]
+        self.do_wall_run, self.move_left, self.move_right = state[1:]
+
     def setWallRunDirection(self, direction):
         self.wall_run_direction = direction
 
@@ -20,6 +20,11 @@ See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 """
 
 class Plugin:
+    # the movement update phases this plugin will be called in
+    phases = ("action", "moveRestriction")
+    # the values returned by getState, see StateSnapshot
+    state_format = "6?"
+
     LEDGE_GRAB = "Ledge_Grab"
     LEDGE_GRAB_UP = "LG_Up"
     LEDGE_GRAB_LEFT = "LG_Left"
@@ -36,6 +41,9 @@ class Plugin:
         self.do_ledge_grab = False
         self.request_idle = False
         self.canInitiateGrab = True
+        self.move_left = False
+        self.move_right = False
+        self.core.ledge_grab_can_move = False
 
         #
         # SETUP STATES
@@ -96,54 +104,59 @@ class Plugin:
         #
         # SETUP COLLISION DETECTION
         #
+        self.setupRays()
+
+        #
+        # ACTIVATE PLUGIN
+        #
+        self.active = True
+
+    def setupRays(self):
+        """Register the rays of this plugin, calling this again will move
+        them to the positions given by the current config"""
         # Wall check rays to the front of the player
-        point_a = (0,0,self.core.getConfig("player_height"))
-        point_b = (0, -self.core.getConfig("wall_run_forward_check_dist"), self.core.getConfig("player_height"))
+        point_a = (0,0,self.core.cfg.player_height)
+        point_b = (0, -self.core.cfg.wall_run_forward_check_dist, self.core.cfg.player_height)
         self.forward_ray = "ledge_grab_forward_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.forward_ray, point_a, point_b)
 
         # Add a ray checking if there is a grabable ledge
-        point_a = (0, -self.core.getConfig("ledge_forward_check_dist"), self.core.getConfig("ledge_top_check_dist"))
-        point_b = (0, -self.core.getConfig("ledge_forward_check_dist"), self.core.getConfig("ledge_bottom_check_dist"))
+        point_a = (0, -self.core.cfg.ledge_forward_check_dist, self.core.cfg.ledge_top_check_dist)
+        point_b = (0, -self.core.cfg.ledge_forward_check_dist, self.core.cfg.ledge_bottom_check_dist)
         self.ledge_detect_ray = "ledge_grab_ledge_detect_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.ledge_detect_ray, point_a, point_b)
 
         # Add a ray checking where the player will stand after pulling up a ledge
-        point_a = (0, -self.core.getConfig("ledge_forward_pull_up_dist"), self.core.getConfig("ledge_top_check_dist"))
-        point_b = (0, -self.core.getConfig("ledge_forward_pull_up_dist"), self.core.getConfig("ledge_bottom_check_dist"))
+        point_a = (0, -self.core.cfg.ledge_forward_pull_up_dist, self.core.cfg.ledge_top_check_dist)
+        point_b = (0, -self.core.cfg.ledge_forward_pull_up_dist, self.core.cfg.ledge_bottom_check_dist)
         self.ledge_pull_up_pos_ray = "ledge_grab_ledge_pull_up_pos_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.ledge_pull_up_pos_ray, point_a, point_b)
 
         # Add a ray checking if there is a grabable ledge to the left
-        point_a = (self.core.getConfig("player_radius") / 2.0, -self.core.getConfig("ledge_forward_check_dist"), self.core.getConfig("ledge_top_check_dist"))
-        point_b = (self.core.getConfig("player_radius") / 2.0, -self.core.getConfig("ledge_forward_check_dist"), self.core.getConfig("ledge_bottom_check_dist"))
+        point_a = (self.core.cfg.player_radius / 2.0, -self.core.cfg.ledge_forward_check_dist, self.core.cfg.ledge_top_check_dist)
+        point_b = (self.core.cfg.player_radius / 2.0, -self.core.cfg.ledge_forward_check_dist, self.core.cfg.ledge_bottom_check_dist)
         self.ledge_detect_ray_l = "ledge_grab_ledge_detect_ray_l-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.ledge_detect_ray_l, point_a, point_b)
 
         # Add a ray checking if there is a grabable ledge to the right
-        point_a = (-self.core.getConfig("player_radius") / 2.0, -self.core.getConfig("ledge_forward_check_dist"), self.core.getConfig("ledge_top_check_dist"))
-        point_b = (-self.core.getConfig("player_radius") / 2.0, -self.core.getConfig("ledge_forward_check_dist"), self.core.getConfig("ledge_bottom_check_dist"))
+        point_a = (-self.core.cfg.player_radius / 2.0, -self.core.cfg.ledge_forward_check_dist, self.core.cfg.ledge_top_check_dist)
+        point_b = (-self.core.cfg.player_radius / 2.0, -self.core.cfg.ledge_forward_check_dist, self.core.cfg.ledge_bottom_check_dist)
         self.ledge_detect_ray_r = "ledge_grab_ledge_detect_ray_r-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.ledge_detect_ray_r, point_a, point_b)
 
-        #
-        # ACTIVATE PLUGIN
-        #
-        self.active = True
-
     def updateAnimations(self, firstPersonMode):
         if firstPersonMode:
             self.core.loadAnims({
-                self.LEDGE_GRAB: self.core.getConfig("anim_ledge_grab_fp"),
-                self.LEDGE_GRAB_UP: self.core.getConfig("anim_ledge_grab_up_fp"),
-                self.LEDGE_GRAB_LEFT: self.core.getConfig("anim_ledge_grab_left_fp"),
-                self.LEDGE_GRAB_RIGHT: self.core.getConfig("anim_ledge_grab_right_fp"),})
+                self.LEDGE_GRAB: self.core.cfg.anim_ledge_grab_fp,
+                self.LEDGE_GRAB_UP: self.core.cfg.anim_ledge_grab_up_fp,
+                self.LEDGE_GRAB_LEFT: self.core.cfg.anim_ledge_grab_left_fp,
+                self.LEDGE_GRAB_RIGHT: self.core.cfg.anim_ledge_grab_right_fp,})
         else:
             self.core.loadAnims({
-                self.LEDGE_GRAB: self.core.getConfig("anim_ledge_grab"),
-                self.LEDGE_GRAB_UP: self.core.getConfig("anim_ledge_grab_up"),
-                self.LEDGE_GRAB_LEFT: self.core.getConfig("anim_ledge_grab_left"),
-                self.LEDGE_GRAB_RIGHT: self.core.getConfig("anim_ledge_grab_right"),})
+                self.LEDGE_GRAB: self.core.cfg.anim_ledge_grab,
+                self.LEDGE_GRAB_UP: self.core.cfg.anim_ledge_grab_up,
+                self.LEDGE_GRAB_LEFT: self.core.cfg.anim_ledge_grab_left,
+                self.LEDGE_GRAB_RIGHT: self.core.cfg.anim_ledge_grab_right,})
         # "preload" all animations of the character
         self.core.bindAllAnims()
 
@@ -151,7 +164,7 @@ class Plugin:
         self.canInitiateGrab = True
 
     def action(self, intel_action):
-        if not self.core.getConfig("ledge_grab_enabled"): return
+        if not self.core.cfg.ledge_grab_enabled: return
         #
         # LEDGE GRAB LOGIC
         #
@@ -160,10 +173,10 @@ class Plugin:
             # check for the ledge grab up animation state
             ac = self.core.getAnimControl(self.LEDGE_GRAB_UP)
 
-            if not taskMgr.hasTaskNamed("resetCanGrab"):
+            if not taskMgr.hasTaskNamed(self.core.plugin_getUniqueName("resetCanGrab")):
                 # reset the can initialize grab after a short while
                 # This should be done whenever we leave ledge grab
-                taskMgr.doMethodLater(0.25, self.__resetCanInitiateGrab, "resetCanGrab")
+                taskMgr.doMethodLater(0.25, self.__resetCanInitiateGrab, self.core.plugin_getUniqueName("resetCanGrab"))
 
             if ac.isPlaying():
                 # as long as it's playing we won't transition anywhere
@@ -332,10 +345,10 @@ class Plugin:
             vec.setY(0)
             self.core.plugin_setMoveDirection(vec)
         else:
-            if not taskMgr.hasTaskNamed("resetCanGrab"):
+            if not taskMgr.hasTaskNamed(self.core.plugin_getUniqueName("resetCanGrab")):
                 # reset the can initialize grab after a short while
                 # This should be done whenever we leave ledge grab
-                taskMgr.doMethodLater(0.25, self.__resetCanInitiateGrab, "resetCanGrab")
+                taskMgr.doMethodLater(0.25, self.__resetCanInitiateGrab, self.core.plugin_getUniqueName("resetCanGrab"))
 
         return self.do_ledge_grab
 
@@ -353,7 +366,7 @@ class Plugin:
         and self.core.state != self.STATE_LEDGE_GRAB_UP:
             # in ledge grab mode we can only move left and right but not
             # rotate the player
-            lg_speed = self.core.getConfig("ledge_grab_sidward_move_speed")
+            lg_speed = self.core.cfg.ledge_grab_sidward_move_speed
             if self.move_left:
                 self.core.update_speed.setX(lg_speed * self.core.dt)
             elif self.move_right:
@@ -365,6 +378,23 @@ class Plugin:
     #
     # LEDGE GRAB HELPER FUNCTIONS
     #
+    def getState(self):
+        return (
+            self.do_ledge_grab,
+            self.request_idle,
+            self.canInitiateGrab,
+            self.move_left,
+            self.move_right,
+            self.core.ledge_grab_can_move)
+
+    def setState(self, state):
+        (self.do_ledge_grab,
+         self.request_idle,
+         self.canInitiateGrab,
+         self.move_left,
+         self.move_right,
+         self.core.ledge_grab_can_move) = state
+
     def faceWall(self, char_front_collision_entry):
         if char_front_collision_entry is not None \
         and self.core.hasSurfaceNormal(char_front_collision_entry):
@@ -401,8 +431,8 @@ class Plugin:
         else:
             # we have no positions to work with!
             return
-        wallPos.setZ(ledge_z - self.core.getConfig("player_height") - 0.05)
-        wallPos.setPos(wallPos, (self.core.plugin_getPos(wallPos).getX(), self.core.getConfig("player_radius") + 0.05, 0))
+        wallPos.setZ(ledge_z - self.core.cfg.player_height - 0.05)
+        wallPos.setPos(wallPos, (self.core.plugin_getPos(wallPos).getX(), self.core.cfg.player_radius + 0.05, 0))
 
         self.core.updatePlayerPosFix(wallPos.getPos())
 
@@ -22,21 +22,28 @@ See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 """
 
 class Plugin:
+    # the movement update phases this plugin will be called in
+    phases = ("action",)
+
     def __init__(self, core, pid):
         self.pluginID = pid
         self.core = core
 
-        # Wall check rays to the front, left and right side of the player
-        point_a = (0, 0, self.core.getConfig("player_height")/2.0)
-        point_b = (0, -self.core.getConfig("forward_check_distance"), self.core.getConfig("player_height")/2.0)
-
-        self.wall_avoidance_ray = "wall_avoidance_ray"
-        self.core.plugin_registerCharacterRayCheck(self.wall_avoidance_ray, point_a, point_b)
+        self.wall_avoidance_ray = self.core.plugin_getUniqueName("wall_avoidance_ray")
+        self.setupRays()
 
         self.active = True
 
+    def setupRays(self):
+        """Register the rays of this plugin, calling this again will move
+        them to the positions given by the current config"""
+        # Wall check rays to the front, left and right side of the player
+        point_a = (0, 0, self.core.cfg.player_height/2.0)
+        point_b = (0, -self.core.cfg.forward_check_distance, self.core.cfg.player_height/2.0)
+        self.core.plugin_registerCharacterRayCheck(self.wall_avoidance_ray, point_a, point_b)
+
     def action(self, intel_action):
-        if not self.core.getConfig("wall_avoidance_enable"): return
+        if not self.core.cfg.wall_avoidance_enable: return
         #
         # FRONT WALL COLLISION AVOIDANCE
         #
@@ -56,13 +63,13 @@ class Plugin:
                 and (self.core.plugin_getMoveDirection().getX() > 0 \
                 or self.core.plugin_getMoveDirection().getY() != 0):
                   doStateCheck = False
-                elif coldist <= self.core.getConfig("forward_stop_distance"):
+                elif coldist <= self.core.cfg.forward_stop_distance:
                     # we have a wall in front of us, hence we can't move forward
                     self.core.current_accleration = 0
                 elif self.core.plugin_getMoveDirection() != Vec3():
-                    self.core.current_accleration -= self.core.getConfig("deaccleration") * self.core.dt
+                    self.core.current_accleration -= self.core.cfg.deaccleration * self.core.dt
                     if self.core.current_accleration <= 0:
-                        self.core.current_accleration = self.core.getConfig("forward_min_speed_to_stop")
+                        self.core.current_accleration = self.core.cfg.forward_min_speed_to_stop
                         if self.core.state == self.core.STATE_IDLE:
                             self.core.plugin_requestNewState(self.core.STATE_IDLE_TO_WALK)
                     doStateCheck = False
@@ -73,7 +80,7 @@ class Plugin:
                         self.core.plugin_requestNewState(self.core.STATE_RUN_TO_IDLE)
                     elif self.core.state == self.core.STATE_SPRINT:
                         self.core.plugin_requestNewState(self.core.STATE_SPRINT_TO_IDLE)
-                    elif self.core.STATE_IDLE in self.core.defaultTransitions[self.core.state]:
+                    elif self.core.isTransitionListed(self.core.STATE_IDLE):
                         self.core.plugin_requestNewState(self.core.STATE_IDLE)
                     else:
                         self.core.plugin_requestNewState(None)
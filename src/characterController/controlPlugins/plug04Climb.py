@@ -22,6 +22,13 @@ See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 
 class Plugin(DirectObject):
 
+    # the movement update phases this plugin will be called in
+    phases = ("action", "useStamina", "moveRestriction")
+    # the values returned by getState, see StateSnapshot. The collision
+    # entries of the climb area are not part of it, they will be set
+    # again by the next collision events.
+    state_format = "10?"
+
     ANIM_IDLE = "Climb_idle"
     ANIM_LEFT = "Climb_Left"
     ANIM_RIGHT = "Climb_Right"
@@ -164,81 +171,85 @@ class Plugin(DirectObject):
         #
         # SETUP COLLISION DETECTION
         #
-        self.accept("plugin-character-in-collision", self.check_climbing)
-        self.accept("plugin-character-out-collision", self.check_climbing)
+        self.accept(self.core.plugin_getUniqueName("plugin-character-in-collision"), self.check_climbing)
+        self.accept(self.core.plugin_getUniqueName("plugin-character-out-collision"), self.check_climbing)
+        self.setupRays()
+
+        #
+        # ACTIVATE PLUGIN
+        #
+        self.active = True
 
+    def setupRays(self):
+        """Register the rays of this plugin, calling this again will move
+        them to the positions given by the current config"""
         # Ray check center to get the climbable entry
         point_a = (0,0,0)
-        point_b = (0, -self.core.getConfig("climb_forward_check_dist"), 0)
+        point_b = (0, -self.core.cfg.climb_forward_check_dist, 0)
         self.center_ray = "climb_center_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.center_ray, point_a, point_b)
 
         # set up collision rays to check if the player would leave the climbable area
         # Ray check above the character
-        point_a = (0,0,self.core.getConfig("player_height"))
-        point_b = (0, -self.core.getConfig("climb_forward_check_dist"), self.core.getConfig("player_height"))
+        point_a = (0,0,self.core.cfg.player_height)
+        point_b = (0, -self.core.cfg.climb_forward_check_dist, self.core.cfg.player_height)
         self.top_ray = "climb_top_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.top_ray, point_a, point_b)
 
         # Add a ray checking where the player will stand after climbing up
-        point_a = (0, -self.core.getConfig("climb_forward_exit_up_dist"), self.core.getConfig("climb_top_check_dist"))
-        point_b = (0, -self.core.getConfig("climb_forward_exit_up_dist"), self.core.getConfig("climb_bottom_check_dist"))
+        point_a = (0, -self.core.cfg.climb_forward_exit_up_dist, self.core.cfg.climb_top_check_dist)
+        point_b = (0, -self.core.cfg.climb_forward_exit_up_dist, self.core.cfg.climb_bottom_check_dist)
         self.climb_exit_up_pos_ray = "ledge_grab_ledge_pull_up_pos_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.climb_exit_up_pos_ray, point_a, point_b)
 
         # Ray check below the character
         point_a = (0,0,0)
-        point_b = (0, -self.core.getConfig("climb_forward_check_dist"), 0)
+        point_b = (0, -self.core.cfg.climb_forward_check_dist, 0)
         self.bottom_ray = "climb_bottom_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.bottom_ray, point_a, point_b)
 
         # Ray check left to the character
-        point_a = (self.core.getConfig("player_radius"),0,self.core.getConfig("player_height")/2.0)
-        point_b = (self.core.getConfig("player_radius"), -self.core.getConfig("climb_forward_check_dist"), self.core.getConfig("player_height")/2.0)
+        point_a = (self.core.cfg.player_radius,0,self.core.cfg.player_height/2.0)
+        point_b = (self.core.cfg.player_radius, -self.core.cfg.climb_forward_check_dist, self.core.cfg.player_height/2.0)
         self.left_ray = "climb_left_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.left_ray, point_a, point_b)
 
         # Ray check right the character
-        point_a = (-self.core.getConfig("player_radius"),0,self.core.getConfig("player_height")/2.0)
-        point_b = (-self.core.getConfig("player_radius"), -self.core.getConfig("climb_forward_check_dist"), self.core.getConfig("player_height")/2.0)
+        point_a = (-self.core.cfg.player_radius,0,self.core.cfg.player_height/2.0)
+        point_b = (-self.core.cfg.player_radius, -self.core.cfg.climb_forward_check_dist, self.core.cfg.player_height/2.0)
         self.right_ray = "climb_right_ray-{}".format(self.pluginID)
         self.core.plugin_registerCharacterRayCheck(self.right_ray, point_a, point_b)
 
-        #
-        # ACTIVATE PLUGIN
-        #
-        self.active = True
-
     def updateAnimations(self, firstPersonMode):
         if firstPersonMode:
             self.core.loadAnims({
-                self.ANIM_IDLE: self.core.getConfig("anim_climb_fp"),
-                self.ANIM_UP: self.core.getConfig("anim_climb_up_fp"),
-                self.ANIM_DOWN: self.core.getConfig("anim_climb_down_fp"),
-                self.ANIM_LEFT: self.core.getConfig("anim_climb_left_fp"),
-                self.ANIM_RIGHT: self.core.getConfig("anim_climb_right_fp"),
-                self.ANIM_UP_LEFT: self.core.getConfig("anim_climb_left_up_fp"),
-                self.ANIM_DOWN_LEFT: self.core.getConfig("anim_climb_left_down_fp"),
-                self.ANIM_UP_RIGHT: self.core.getConfig("anim_climb_right_up_fp"),
-                self.ANIM_DOWN_RIGHT: self.core.getConfig("anim_climb_right_down_fp"),
-                self.ANIM_EXIT_UP: self.core.getConfig("anim_climb_exit_up_fp"),})
+                self.ANIM_IDLE: self.core.cfg.anim_climb_fp,
+                self.ANIM_UP: self.core.cfg.anim_climb_up_fp,
+                self.ANIM_DOWN: self.core.cfg.anim_climb_down_fp,
+                self.ANIM_LEFT: self.core.cfg.anim_climb_left_fp,
+                self.ANIM_RIGHT: self.core.cfg.anim_climb_right_fp,
+                self.ANIM_UP_LEFT: self.core.cfg.anim_climb_left_up_fp,
+                self.ANIM_DOWN_LEFT: self.core.cfg.anim_climb_left_down_fp,
+                self.ANIM_UP_RIGHT: self.core.cfg.anim_climb_right_up_fp,
+                self.ANIM_DOWN_RIGHT: self.core.cfg.anim_climb_right_down_fp,
+                self.ANIM_EXIT_UP: self.core.cfg.anim_climb_exit_up_fp,})
         else:
             self.core.loadAnims({
-                self.ANIM_IDLE: self.core.getConfig("anim_climb"),
-                self.ANIM_UP: self.core.getConfig("anim_climb_up"),
-                self.ANIM_DOWN: self.core.getConfig("anim_climb_down"),
-                self.ANIM_LEFT: self.core.getConfig("anim_climb_left"),
-                self.ANIM_RIGHT: self.core.getConfig("anim_climb_right"),
-                self.ANIM_UP_LEFT: self.core.getConfig("anim_climb_left_up"),
-                self.ANIM_DOWN_LEFT: self.core.getConfig("anim_climb_left_down"),
-                self.ANIM_UP_RIGHT: self.core.getConfig("anim_climb_right_up"),
-                self.ANIM_DOWN_RIGHT: self.core.getConfig("anim_climb_right_down"),
-                self.ANIM_EXIT_UP: self.core.getConfig("anim_climb_exit_up"),})
+                self.ANIM_IDLE: self.core.cfg.anim_climb,
+                self.ANIM_UP: self.core.cfg.anim_climb_up,
+                self.ANIM_DOWN: self.core.cfg.anim_climb_down,
+                self.ANIM_LEFT: self.core.cfg.anim_climb_left,
+                self.ANIM_RIGHT: self.core.cfg.anim_climb_right,
+                self.ANIM_UP_LEFT: self.core.cfg.anim_climb_left_up,
+                self.ANIM_DOWN_LEFT: self.core.cfg.anim_climb_left_down,
+                self.ANIM_UP_RIGHT: self.core.cfg.anim_climb_right_up,
+                self.ANIM_DOWN_RIGHT: self.core.cfg.anim_climb_right_down,
+                self.ANIM_EXIT_UP: self.core.cfg.anim_climb_exit_up,})
         # "preload" all animations of the character
         self.core.bindAllAnims()
 
     def action(self, intel_action):
-        if not self.core.getConfig("climb_enabled"): return
+        if not self.core.cfg.climb_enabled: return
 
         # check if we want to request to transition to the idle animation
         if self.request_idle:
@@ -316,7 +327,7 @@ class Plugin(DirectObject):
                     # do we have a collision entry to the left of us
                     entry_left = self.core.getFirstCollisionEntryInLine(self.left_ray)
                     if entry_left is not None \
-                    and "climbable" in entry_left.getIntoNodePath().getNetTag("Type").lower():
+                    and "climbable" in self.core.getIntoNodePath(entry_left).getNetTag("Type").lower():
                         self.left = True
                 if direction.getX() > 0.3:
                     #
@@ -325,7 +336,7 @@ class Plugin(DirectObject):
                     # do we have a collision entry to the right of us
                     entry_right = self.core.getFirstCollisionEntryInLine(self.right_ray)
                     if entry_right is not None \
-                    and "climbable" in entry_right.getIntoNodePath().getNetTag("Type").lower():
+                    and "climbable" in self.core.getIntoNodePath(entry_right).getNetTag("Type").lower():
                         self.right = True
 
             request_climb_exit_up = False
@@ -343,7 +354,7 @@ class Plugin(DirectObject):
                     #
                     entry_top = self.core.getFirstCollisionEntryInLine(self.top_ray)
                     if entry_top is not None \
-                    and "climbable" in entry_top.getIntoNodePath().getNetTag("Type").lower():
+                    and "climbable" in self.core.getIntoNodePath(entry_top).getNetTag("Type").lower():
                         self.up = True
                     elif entry_top is None:
                         climb_exit_up_collision = self.core.getFirstCollisionEntryInLine(self.climb_exit_up_pos_ray)
@@ -376,7 +387,7 @@ class Plugin(DirectObject):
                     #
                     entry_bottom = self.core.getFirstCollisionEntryInLine(self.bottom_ray)
                     if entry_bottom is not None \
-                    and "climbable" in entry_bottom.getIntoNodePath().getNetTag("Type").lower():
+                    and "climbable" in self.core.getIntoNodePath(entry_bottom).getNetTag("Type").lower():
                         self.down = True
 
             # check which direction we are moving
@@ -393,7 +404,7 @@ class Plugin(DirectObject):
             elif self.core.state != self.STATE_CLIMB:
                 self.core.plugin_requestNewState(self.STATE_CLIMB)
             if (self.core.do_sprint and self.core.can_use_sprint) and self.core.state is not self.STATE_CLIMB and not request_climb_exit_up:
-                self.core.plugin_setCurrentAnimationPlayRate(self.core.getConfig("climb_sprint_multiplier"))
+                self.core.plugin_setCurrentAnimationPlayRate(self.core.cfg.climb_sprint_multiplier)
             else:
                 self.core.plugin_setCurrentAnimationPlayRate(1.0)
         else:
@@ -426,17 +437,17 @@ class Plugin(DirectObject):
         if self.do_climb:
             # in climb mode we can, if at all, only move left and right
             # but not rotate the player
-            climb_speed = self.core.getConfig("climb_sidward_move_speed")
+            climb_speed = self.core.cfg.climb_sidward_move_speed
             if self.core.do_sprint and self.core.can_use_sprint:
-                climb_speed *= self.core.getConfig("climb_sprint_multiplier")
+                climb_speed *= self.core.cfg.climb_sprint_multiplier
             if self.left:
                 self.core.update_speed.setX(climb_speed * self.core.dt)
             elif self.right:
                 self.core.update_speed.setX(-climb_speed * self.core.dt)
 
-            climb_speed = self.core.getConfig("climb_vertical_move_speed")
+            climb_speed = self.core.cfg.climb_vertical_move_speed
             if self.core.do_sprint and self.core.can_use_sprint:
-                climb_speed *= self.core.getConfig("climb_sprint_multiplier")
+                climb_speed *= self.core.cfg.climb_sprint_multiplier
             if self.up:
                 self.core.update_speed.setZ(climb_speed * self.core.dt)
             elif self.down:
@@ -448,8 +459,33 @@ class Plugin(DirectObject):
     #
     # CLIMB HELPER FUNCTIONS
     #
+    def getState(self):
+        return (
+            self.can_climb,
+            self.do_climb,
+            self.request_idle,
+            self.respect_steps,
+            self.can_move_vertical,
+            self.can_move_horizontal,
+            self.left,
+            self.right,
+            self.up,
+            self.down)
+
+    def setState(self, state):
+        (self.can_climb,
+         self.do_climb,
+         self.request_idle,
+         self.respect_steps,
+         self.can_move_vertical,
+         self.can_move_horizontal,
+         self.left,
+         self.right,
+         self.up,
+         self.down) = state
+
     def check_climbing(self, collision_entry):
-        entry_np = collision_entry.getIntoNodePath()
+        entry_np = self.core.getIntoNodePath(collision_entry)
         if "climbable" in entry_np.getNetTag("Type").lower():
             self.climb_area_entry = collision_entry
             direction = entry_np.getNetTag("Direction").lower()
@@ -504,7 +540,7 @@ class Plugin(DirectObject):
     def snapToStepps(self, entry):
         if entry is not None \
         and self.core.hasSurfacePoint(entry):
-            entry_np = entry.getIntoNodePath()
+            entry_np = self.core.getIntoNodePath(entry)
             if "true" in entry_np.getNetTag("Stepped").lower():
                 playerPoint = self.core.plugin_getPos()
 
@@ -515,8 +551,8 @@ class Plugin(DirectObject):
                 highest = points[-1].z
                 stepList = []
                 curStepPos = lowest
-                while(curStepPos < highest-self.core.getConfig("climb_step_height")):
-                    curStepPos += self.core.getConfig("climb_step_height")
+                while(curStepPos < highest-self.core.cfg.climb_step_height):
+                    curStepPos += self.core.cfg.climb_step_height
                     stepList.append(Point3F(playerPoint.x, playerPoint.y, curStepPos))
                 stepList.sort(key=lambda p:(p - playerPoint).length_squared())
                 self.core.updatePlayerPosFix(stepList[0])
@@ -541,7 +577,7 @@ class Plugin(DirectObject):
                 # we have no positions to work with!
                 return
 
-            climbPos.setPos(climbPos, (self.core.plugin_getPos(climbPos).getX(), self.core.getConfig("player_radius") + 0.05, self.core.plugin_getPos(climbPos).getZ()))
+            climbPos.setPos(climbPos, (self.core.plugin_getPos(climbPos).getX(), self.core.cfg.player_radius + 0.05, self.core.plugin_getPos(climbPos).getZ()))
             self.core.updatePlayerPosFix(climbPos.getPos())
 
     #
@@ -48,6 +48,9 @@ class InputMapping(object):
 
     def __init__(self):
         self.__map = dict.fromkeys(self.actions)
+        # the device, axis flag and index of each action on the devices
+        # given to compileControls
+        self.__controls = {}
 
     def mapButton(self, action, button):
         self.__map[action] = ("button", str(button))
@@ -55,7 +58,7 @@ class InputMapping(object):
     def mapAxis(self, action, axis):
         self.__map[action] = ("axis", axis.name)
 
-    def unmap(self):
+    def unmap(self, action):
         self.__map[action] = None
 
     def formatMapping(self, action):
@@ -95,6 +98,35 @@ class InputMapping(object):
                     return button.pressed
             return False
 
+    def compileControls(self, devices):
+        """Look up the axis or button of each mapped action on the given
+        devices once, so getControlValue can read them directly. If an
+        action is available on multiple devices, the first one is used.
+        This has to be called again whenever the devices or the mapping
+        change."""
+        self.__controls = {}
+        for action, mapping in self.__map.items():
+            if not mapping: continue
+            for device in devices:
+                if mapping[0] == "axis":
+                    names = [axis.axis.name for axis in device.axes]
+                else:
+                    names = [button.handle.name for button in device.buttons]
+                if mapping[1] in names:
+                    self.__controls[action] = (device, mapping[0] == "axis", names.index(mapping[1]))
+                    break
+
+    def getControlValue(self, action):
+        """Returns the state of the given action as read from the devices
+        passed to compileControls"""
+        control = self.__controls.get(action)
+        if control is None:
+            return 0
+        device, isAxis, index = control
+        if isAxis:
+            return device.axes[index].value
+        return device.buttons[index].pressed
+
     def getMappingJSON(self):
         """Write out the mapping as JSON"""
         return json.dumps(self.__map)
@@ -5,6 +5,7 @@ import logging
 from panda3d.core import Vec3, ButtonHandle, GamepadButton#, loadPrcFileData
 #loadPrcFileData("", "notify-level-device debug")
 from panda3d.core import InputDevice
+from direct.showbase.DirectObject import DirectObject
 
 from .inputMapping import InputMapping
 
@@ -15,44 +16,47 @@ See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
 """
 
 
-class Plugin(InputMapping):
-    """This plugin provides gamepad support for arbitrarry gamepads"""
+class Plugin(InputMapping, DirectObject):
+    """This plugin provides gamepad support for arbitrarry gamepads
+
+    Only the gamepad named in the selectedDevice config is used, unless
+    gamepad_fallback_to_any is enabled, then the first connected gamepad
+    is used while the selected one isn't connected. The connected
+    gamepads are kept in a list in connect order which is updated by the
+    connect-device and disconnect-device events, so the devices don't
+    have to be enumerated on every input poll. The axes and buttons of
+    the mapped actions are looked up once for the used gamepad whenever
+    it changes."""
     def __init__(self, core, pid):
         logging.debug("INIT GAMEPAD PLUGIN...")
 
         InputMapping.__init__(self)
+        DirectObject.__init__(self)
 
         self.core = core
         self.pluginID = pid
         self.active = False
         self.gamepad = None
 
-        if not self.core.used_device: return
-        self.connect(self.core.used_device)
-        if not self.checkGamepads(): return
-
         self.loadMapConfig()
 
-        self.active = True
-
-        self.core.accept("connect-device", self.connect)
-        self.core.accept("disconnect-device", self.disconnect)
-
-        devMap = self.core.getConfig("deviceMaps")["Gamepad"]
-        actionKey = self.unformatedMapping("action1")
-        self.core.accept("gamepad-{}".format(actionKey), base.messenger.send, ["doAction"])
-
-        resetKey = self.unformatedMapping("reset-Avatar")
-        self.core.accept("gamepad-{}".format(resetKey), base.messenger.send, ["reset-Avatar"])
-
         self.deadzone_x = self.core.getConfig("deadzone_x")
         self.deadzone_y = self.core.getConfig("deadzone_y")
+        self.rxcenter = self.rycenter = self.lxcenter = self.lycenter = 0
 
-        self.centerGamepadAxes(True)
+        # all currently connected gamepads in the order they connected
+        self.devices = list(base.devices.getDevices(InputDevice.DeviceClass.gamepad))
+        self.accept("connect-device", self.connect)
+        self.accept("disconnect-device", self.disconnect)
+        self.selectGamepad()
 
         self.sprintState = False
         logging.debug("INIT GAMEPAD PLUGIN DONE")
 
+    def cleanup(self):
+        self.ignoreAll()
+        self.releaseGamepad()
+
     def loadMapConfig(self):
         for key, mapping in self.core.getConfig("deviceMaps")["Gamepad"].items():
             if hasattr(InputDevice.Axis, mapping):
@@ -65,101 +69,138 @@ class Plugin(InputMapping):
 
     def connect(self, device):
         """Event handler that is called when a device is discovered."""
-
-        # We're only interested if this is a gamepad and we don't have a
-        # gamepad yet.
-        if device.device_class == InputDevice.DeviceClass.gamepad and not self.gamepad:
-            self.gamepad = device
-
-            # Enable this device to ShowBase so that we can receive events.
-            # We set up the events with a prefix of "gamepad-".
-            try:
-                base.attachInputDevice(device, prefix="gamepad")
-            except:
-                # the device has probably already been attached
-                pass
+        # We're only interested if this is a gamepad
+        if device.device_class != InputDevice.DeviceClass.gamepad: return
+        if device in self.devices: return
+        self.devices.append(device)
+        self.selectGamepad()
 
     def disconnect(self, device):
         """Event handler that is called when a device is removed."""
+        if device not in self.devices: return
+        self.devices.remove(device)
+        if self.gamepad == device:
+            self.selectGamepad()
+
+    def selectGamepad(self):
+        """Use the gamepad selected in the config if it is connected. If
+        it isn't and gamepad_fallback_to_any is enabled, the gamepad which
+        connected first is used instead."""
+        gamepad = None
+        for device in self.devices:
+            if device.name == self.core.getConfig("selectedDevice"):
+                gamepad = device
+                break
+        if gamepad is None \
+        and self.devices \
+        and self.core.getConfig("gamepad_fallback_to_any"):
+            gamepad = self.devices[0]
+        if gamepad == self.gamepad: return
+        self.releaseGamepad()
+        self.gamepad = gamepad
+        self.active = gamepad is not None
+        if gamepad is None: return
+
+        # Enable this device to ShowBase so that we can receive events.
+        # We set up the events with a prefix of "gamepad-".
+        try:
+            base.attachInputDevice(gamepad, prefix="gamepad")
+        except:
+            # the device has probably already been attached
+            pass
+        self.compileControls([gamepad])
 
-        if self.gamepad != device:
-            # We don't care since it's not our gamepad.
-            return
+        actionKey = self.unformatedMapping("action1")
+        self.accept("gamepad-{}".format(actionKey), base.messenger.send, ["doAction"])
+
+        resetKey = self.unformatedMapping("reset-Avatar")
+        self.accept("gamepad-{}".format(resetKey), base.messenger.send, ["reset-Avatar"])
 
+        self.centerGamepadAxes(True)
+
+    def releaseGamepad(self):
+        """Stop using the current gamepad"""
+        if self.gamepad is None: return
+        self.ignore("gamepad-{}".format(self.unformatedMapping("action1")))
+        self.ignore("gamepad-{}".format(self.unformatedMapping("reset-Avatar")))
         # Tell ShowBase that the device is no longer needed.
-        base.detachInputDevice(device)
+        try:
+            base.detachInputDevice(self.gamepad)
+        except:
+            # the device has probably already been detached
+            pass
         self.gamepad = None
+        self.active = False
+        self.compileControls([])
 
     def checkGamepads(self):
         # list of connected gamepad devices
         return self.gamepad is not None
 
     def hasGamepad(self):
-        return len(base.devices.getDevices(InputDevice.DeviceClass.gamepad)) > 0
+        return self.gamepad is not None
 
     def centerGamepadAxes(self, forceCalibrate=False):
-        devMap = self.core.getConfig("deviceMaps")["Gamepad"]
         if not forceCalibrate:
-            if not self.getValue("recalibrate", self.gamepad): return
-        self.rxcenter = self.getValue("axis-right-x", self.gamepad)
-        self.rycenter = self.getValue("axis-right-y", self.gamepad)
-        self.lxcenter = self.getValue("axis-left-x", self.gamepad)
-        self.lycenter = self.getValue("axis-left-y", self.gamepad)
+            if not self.getControlValue("recalibrate"): return
+        self.rxcenter = self.getControlValue("axis-right-x")
+        self.rycenter = self.getControlValue("axis-right-y")
+        self.lxcenter = self.getControlValue("axis-left-x")
+        self.lycenter = self.getControlValue("axis-left-y")
 
     def getMovementVec(self):
-        if not self.hasGamepad(): return Vec3()
+        if self.gamepad is None: return Vec3()
         movementVec = Vec3()
 
         y_vec = -1 if self.core.plugin_isFirstPersonMode() else 1
 
-        devMap = self.core.getConfig("deviceMaps")["Gamepad"]
         # Move left/Right
-        axis_x = self.getValue("axis-left-x", self.gamepad)
+        axis_x = self.getControlValue("axis-left-x")
         if abs(axis_x) > self.deadzone_x:
             movementVec.setX(axis_x - self.lxcenter)
         # Move forward/backward
-        axis_y = self.getValue("axis-left-y", self.gamepad)
+        axis_y = self.getControlValue("axis-left-y")
         if abs(axis_y) > self.deadzone_y:
             movementVec.setY(-(axis_y - self.lycenter)*y_vec)
         return movementVec
 
     def getRotationVec(self):
-        if not self.hasGamepad(): return Vec3()
+        if self.gamepad is None: return Vec3()
         rotationVec = Vec3()
-        devMap = self.core.getConfig("deviceMaps")["Gamepad"]
-        rx = self.getValue("axis-right-x", self.gamepad)
-        ry = self.getValue("axis-right-y", self.gamepad)
+        rx = self.getControlValue("axis-right-x")
+        ry = self.getControlValue("axis-right-y")
         rotationVec.setX(-(rx - self.rxcenter))
         rotationVec.setY(-(ry - self.rycenter))
         return rotationVec
 
     def getCamButton(self, direction):
-        amount = self.getValue(direction, self.gamepad)
+        if self.gamepad is None: return False
+        amount = self.getControlValue(direction)
         if direction.endswith("-up") or direction.endswith("-left"):
             return amount >= 0.3
         else:
             return amount <= -0.3
 
     def getJumpState(self):
-        if not self.hasGamepad(): return False
-        return self.getValue("jump", self.gamepad)
+        if self.gamepad is None: return False
+        return self.getControlValue("jump")
 
     def getCenterCamState(self):
-        if not self.hasGamepad(): return False
-        return self.getValue("center-camera", self.gamepad)
+        if self.gamepad is None: return False
+        return self.getControlValue("center-camera")
 
     def getIntelActionState(self):
-        if not self.hasGamepad(): return False
-        return self.getValue("intel-action", self.gamepad)
+        if self.gamepad is None: return False
+        return self.getControlValue("intel-action")
 
     def getAction1State(self):
-        if not self.hasGamepad(): return False
-        return self.getValue("action1", self.gamepad)
+        if self.gamepad is None: return False
+        return self.getControlValue("action1")
 
     def getSprintState(self):
-        if not self.hasGamepad(): return False
-        return self.getValue("sprint", self.gamepad)
+        if self.gamepad is None: return False
+        return self.getControlValue("sprint")
 
     def getWalkState(self):
-        if not self.hasGamepad(): return False
-        return self.getValue("walk", self.gamepad)
+        if self.gamepad is None: return False
+        return self.getControlValue("walk")
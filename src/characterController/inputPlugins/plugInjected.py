@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import logging
+from panda3d.core import Vec3
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+class Plugin:
+    """This plugin doesn't read any device. All its values are set from
+    outside, for example by an AI, a network connection or a test
+    script, which makes it the input source for headless characters."""
+    def __init__(self, core, pid):
+        logging.debug("INIT INJECTED INPUT PLUGIN...")
+
+        self.core = core
+        self.pluginID = pid
+        self.active = True
+
+        self.movementVec = Vec3()
+        self.rotationVec = Vec3()
+        # the pressed states of the button actions as named in the
+        # InputMapping class
+        self.buttons = {}
+        logging.debug("INIT INJECTED INPUT PLUGIN DONE")
+
+    def activate(self):
+        self.active = True
+
+    def deactivate(self):
+        self.active = False
+
+    def setMovementVec(self, movementVec):
+        self.movementVec = Vec3(movementVec)
+
+    def setRotationVec(self, rotationVec):
+        self.rotationVec = Vec3(rotationVec)
+
+    def setButton(self, action, pressed):
+        """Set the pressed state of the given action, e.g. "jump". The
+        camera actions may also be given an analog value from 0 to 1."""
+        self.buttons[action] = pressed
+
+    def reset(self):
+        """Release all buttons and stop all movements"""
+        self.movementVec = Vec3()
+        self.rotationVec = Vec3()
+        self.buttons = {}
+
+    def centerGamepadAxes(self):
+        # Nothing to recalibrate here
+        return
+
+    def getMovementVec(self):
+        return Vec3(self.movementVec)
+
+    def getRotationVec(self):
+        return Vec3(self.rotationVec)
+
+    def getCamButton(self, direction):
+        return float(self.buttons.get(direction, 0.0))
+
+    def getJumpState(self):
+        return self.buttons.get("jump", False)
+
+    def getCenterCamState(self):
+        return self.buttons.get("center-camera", False)
+
+    def getIntelActionState(self):
+        return self.buttons.get("intel-action", False)
+
+    def getAction1State(self):
+        return self.buttons.get("action1", False)
+
+    def getSprintState(self):
+        return self.buttons.get("sprint", False)
+
+    def getWalkState(self):
+        return self.buttons.get("walk", False)
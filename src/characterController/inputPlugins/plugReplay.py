@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import logging
+from panda3d.core import Vec3
+
+from ..InputRecording import InputRecording, BUTTONS, CAM_BUTTONS
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+# the index of the value of each camera button in the recorded frames
+CAM_DIRECTIONS = {
+    "camera-left": CAM_BUTTONS.index("cam_left"),
+    "camera-right": CAM_BUTTONS.index("cam_right"),
+    "camera-up": CAM_BUTTONS.index("cam_up"),
+    "camera-down": CAM_BUTTONS.index("cam_down")}
+
+
+class Plugin:
+    """This plugin plays back an input recording written with
+    PlayerController.startInputRecording. Other than the device plugins,
+    it also drives the movement updates and the physics of the
+    character, each with the recorded dt, so the movement task of the
+    character has to be stopped with stopControl and it must not be
+    updated by a CharacterManager while it is replayed. The character is
+    taken out of the physics simulation while replayed, call stopReplay
+    to put it back."""
+    def __init__(self, core, pid):
+        logging.debug("INIT REPLAY INPUT PLUGIN...")
+
+        self.core = core
+        self.pluginID = pid
+        self.active = True
+
+        self.recording = None
+        # the number of the next frame to play
+        self.frame = 0
+        self.movementVec = Vec3()
+        self.rotationVec = Vec3()
+        self.camera = (0.0, 0.0, 0.0, 0.0)
+        self.flags = 0
+        logging.debug("INIT REPLAY INPUT PLUGIN DONE")
+
+    def activate(self):
+        self.active = True
+
+    def deactivate(self):
+        self.active = False
+
+    def loadRecording(self, filename):
+        """Load the given recording and start at its first frame. The
+        character needs the same control plugins as the recorded one."""
+        self.recording = InputRecording(filename)
+        if self.recording.state_size != self.core.getStateSize():
+            raise ValueError("The state layout of {} doesn't match the character".format(filename))
+        self.seek(0)
+
+    def getFrameCount(self):
+        if self.recording is None: return 0
+        return len(self.recording.frames)
+
+    def isFinished(self):
+        return self.frame >= self.getFrameCount()
+
+    def playFrame(self):
+        """Run the movement update of the next recorded frame. Returns
+        False if the end of the recording has been reached."""
+        if self.isFinished(): return False
+        frame = self.recording.frames[self.frame]
+        self.frame += 1
+        self.simulateFrame(frame)
+        return True
+
+    def simulateFrame(self, frame):
+        """Run one movement update and physics step of the character with
+        the input of the given frame tuple, instead of the input of the
+        characters own input plugins. The character is stepped manually
+        like while it has been recorded, so it gets taken out of the
+        physics simulation if it isn't yet."""
+        plugins = self.core.inputPlugins
+        self.core.inputPlugins = [self]
+        try:
+            self.setFrame(frame)
+            self.core.suspendSimulation()
+            self.core.stepMovement(frame[0])
+        finally:
+            self.core.inputPlugins = plugins
+
+    def stopReplay(self):
+        """Put the character back into the physics simulation"""
+        self.core.resumeSimulation()
+
+    def setFrame(self, frame):
+        """Use the input of the given frame tuple, as stored in an
+        InputRecording, until another frame is set"""
+        dt, self.movementVec, self.rotationVec, self.camera, self.flags = frame
+
+    def play(self, frames=None):
+        """Run the given number of frames or all remaining ones as fast
+        as possible and return the number of frames played"""
+        played = 0
+        while (frames is None or played < frames) and self.playFrame():
+            played += 1
+        return played
+
+    def seek(self, frame):
+        """Continue the replay at the given frame. The character is put
+        into the state of the closest keyframe before it and the frames
+        from there on get played again."""
+        keyframe = self.recording.getKeyframeBefore(frame)
+        if keyframe is None:
+            raise ValueError("No keyframe before frame {}".format(frame))
+        self.core.restoreState(self.recording.keyframes[keyframe])
+        self.frame = keyframe
+        self.play(frame - keyframe)
+
+    def isPressed(self, button):
+        return bool(self.flags & (1 << BUTTONS.index(button)))
+
+    def centerGamepadAxes(self):
+        # Nothing to recalibrate here
+        return
+
+    def getMovementVec(self):
+        return Vec3(self.movementVec)
+
+    def getRotationVec(self):
+        return Vec3(self.rotationVec)
+
+    def getCamButton(self, direction):
+        if direction in CAM_DIRECTIONS: return self.camera[CAM_DIRECTIONS[direction]]
+        return 0.0
+
+    def getJumpState(self):
+        return self.isPressed("jump")
+
+    def getCenterCamState(self):
+        return self.isPressed("center_cam")
+
+    def getIntelActionState(self):
+        return self.isPressed("intel_action")
+
+    def getAction1State(self):
+        return self.isPressed("action1")
+
+    def getSprintState(self):
+        return self.isPressed("sprint")
+
+    def getWalkState(self):
+        return self.isPressed("walk")
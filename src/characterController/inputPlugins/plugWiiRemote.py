@@ -1,107 +1,166 @@
-from panda3d.core import Vec3, ButtonHandle, loadPrcFileData
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import logging
+from panda3d.core import Vec3, GamepadButton#, loadPrcFileData
 #loadPrcFileData("", "notify-level-device debug")
+from panda3d.core import InputDevice
+from direct.showbase.DirectObject import DirectObject
+
 from .inputMapping import InputMapping
-try:
-    from panda3d.core import InputDevice
-    gamepadsupport = True
-except:
-    gamepadsupport = False
-
-class Plugin(InputMapping):
-    """This plugin provides gamepad support for wii remotes plus nunchuk"""
-    def __init__(self, core):
-        if not gamepadsupport: return
-        if not self.checkGamepads(): return
+
+__author__ = "Fireclaw the Fox"
+__license__ = """
+Simplified BSD (BSD 2-Clause) License.
+See License.txt or http://opensource.org/licenses/BSD-2-Clause for more info
+"""
+
+WII = "Nintendo Wii Remote"
+NUNCHUK = "Nintendo Wii Remote Nunchuk"
+
+
+class Plugin(InputMapping, DirectObject):
+    """This plugin provides gamepad support for wii remotes plus nunchuk
+
+    Like the gamepad plugin, the connected remotes and nunchuks are kept
+    up to date by the connect-device and disconnect-device events and
+    the mapped controls are looked up once whenever they change."""
+    def __init__(self, core, pid):
+        logging.debug("INIT WII REMOTE PLUGIN...")
 
         InputMapping.__init__(self)
+        DirectObject.__init__(self)
 
         self.core = core
-        self.getConfig("deviceMap")["Nintendo Wii Remote"] = self.core.getConfig("getConfig("deviceMap")["Nintendo Wii Remote"]")
-        self.usedGamepadID = self.core.usedGamepadID
-        self.deadzone_x = self.core.getConfig("deadzone_x")
-        self.deadzone_y = self.core.getConfig("deadzone_y")
+        self.pluginID = pid
+        self.active = False
+        self.remote = None
+        self.nunchuk = None
 
         self.loadMapConfig()
 
-        # set the center position of the control sticks
-        # NOTE: here we assume, that the wheel is centered when the application get started.
-        #       In real world applications, you should notice the user and give him enough time
-        #       to center the wheel until you store the center position of the controler!
-        self.lxcenter = self.nunchuk.findControl(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["axis-left-x"]).state
-        self.lycenter = self.nunchuk.findControl(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["axis-left-y"]).state
+        self.deadzone_x = self.core.getConfig("deadzone_x")
+        self.deadzone_y = self.core.getConfig("deadzone_y")
+        self.lxcenter = self.lycenter = 0
 
-        self.sprintState = False
+        # all currently connected remotes and nunchuks in connect order
+        self.devices = []
+        for device in base.devices.getDevices():
+            if WII in device.name:
+                self.devices.append(device)
+        self.accept("connect-device", self.connect)
+        self.accept("disconnect-device", self.disconnect)
+        self.selectDevices()
 
-    def checkGamepads(self):
-        # list of connected gamepad devices
-        self.gamepads = []
-        self.nunchuk = None
-        connectedDevices = base.devices.getDevices()
-        for device in connectedDevices:
-            if device.get_device_class() == InputDevice.DC_gamepad \
-            and "Nintendo Wii Remote" in device.name \
-            and "Nintendo Wii Remote Nunchuk" not in device.name:
-                self.gamepads.append(device)
-            elif "Nintendo Wii Remote Nunchuk" in device.name:
-                self.gamepads.append(device)
-                self.nunchuk = device
-        return len(self.gamepads) > 0 and self.nunchuk is not None
+        self.sprintState = False
+        logging.debug("INIT WII REMOTE PLUGIN DONE")
 
-    def hasGamepad(self):
-        if not gamepadsupport: return False
-        return len(self.gamepads) > 0 and self.nunchuk is not None
+    def cleanup(self):
+        self.ignoreAll()
 
     def loadMapConfig(self):
-        for key, mapping in self.core.getConfig("deviceMaps")["Nintendo Wii Remote"].items():
+        for key, mapping in self.core.getConfig("deviceMaps")[WII].items():
             if hasattr(InputDevice.Axis, mapping):
-                self.mapAxis(key, getattr(InputDevice.Axis, mapping)())
-            elif hasattr(MouseButton, mapping):
+                self.mapAxis(key, getattr(InputDevice.Axis, mapping))
+            elif hasattr(GamepadButton, mapping):
                 self.mapButton(key, getattr(GamepadButton, mapping)())
             else:
                 #unsupported key or axis
                 logging.error("Unsupported Axis or Button {}:{}".format(key, mapping))
 
+    def connect(self, device):
+        """Event handler that is called when a device is discovered."""
+        if WII not in device.name: return
+        if device in self.devices: return
+        self.devices.append(device)
+        self.selectDevices()
+
+    def disconnect(self, device):
+        """Event handler that is called when a device is removed."""
+        if device not in self.devices: return
+        self.devices.remove(device)
+        self.selectDevices()
+
+    def selectDevices(self):
+        """Pick the first connected remote and nunchuk and look up the
+        mapped controls on them"""
+        self.remote = None
+        self.nunchuk = None
+        for device in self.devices:
+            if NUNCHUK in device.name:
+                if self.nunchuk is None:
+                    self.nunchuk = device
+            elif device.device_class == InputDevice.DeviceClass.gamepad:
+                if self.remote is None:
+                    self.remote = device
+        self.active = self.hasGamepad()
+        if not self.active:
+            self.compileControls([])
+            return
+        # the stick is on the nunchuk, so look there first
+        self.compileControls([self.nunchuk, self.remote])
+
+        # set the center position of the control sticks
+        # NOTE: here we assume, that the stick is centered when the device
+        #       get connected. In real world applications, you should notice
+        #       the user and give him enough time to center the stick until
+        #       you store the center position of the controler!
+        self.lxcenter = self.getControlValue("axis-left-x")
+        self.lycenter = self.getControlValue("axis-left-y")
+
+    def checkGamepads(self):
+        return self.hasGamepad()
+
+    def hasGamepad(self):
+        return self.remote is not None and self.nunchuk is not None
+
+    def centerGamepadAxes(self, forceCalibrate=False):
+        if not self.active: return
+        if not forceCalibrate:
+            if not self.getControlValue("recalibrate"): return
+        self.lxcenter = self.getControlValue("axis-left-x")
+        self.lycenter = self.getControlValue("axis-left-y")
+
     def getMovementVec(self):
-        if not self.hasGamepad(): return Vec3()
+        if not self.active: return Vec3()
         movementVec = Vec3()
         # Move left/Right
-        axis_x = self.nunchuk.findControl(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["axis-left-x"]).state
+        axis_x = self.getControlValue("axis-left-x")
         if abs(axis_x) > self.deadzone_x:
             movementVec.setX(axis_x - self.lxcenter)
         # Move forward/backward
-        axis_y = self.nunchuk.findControl(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["axis-left-y"]).state
+        axis_y = self.getControlValue("axis-left-y")
         if abs(axis_y) > self.deadzone_y:
             movementVec.setY(-(axis_y - self.lycenter))
         return movementVec
 
     def getRotationVec(self):
-        if not self.hasGamepad(): return Vec3()
-        rotationVec = Vec3()
-        return rotationVec
+        return Vec3()
 
     def getCamButton(self, direction):
-        if not self.hasGamepad(): return False
-        if direction not in self.core.getConfig("deviceMap")["Nintendo Wii Remote"]: return False
-
-        self.checkGamepads()
-        return self.gamepads[self.usedGamepadID].findButton(self.core.getConfig("deviceMap")["Nintendo Wii Remote"][direction]).state == InputDevice.S_down
+        if not self.active: return False
+        return self.getControlValue(direction)
 
     def getJumpState(self):
-        if not self.hasGamepad(): return False
-        return self.gamepads[self.usedGamepadID].findButton(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["jump"]).state == InputDevice.S_down
+        if not self.active: return False
+        return self.getControlValue("jump")
 
     def getCenterCamState(self):
-        if not self.hasGamepad(): return False
-        return self.gamepads[self.usedGamepadID].findButton(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["center-camera"]).state == InputDevice.S_down
+        if not self.active: return False
+        return self.getControlValue("center-camera")
 
     def getIntelActionState(self):
-        if not self.hasGamepad(): return False
-        return self.gamepads[self.usedGamepadID].findButton(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["intel-action"]).state == InputDevice.S_down
+        if not self.active: return False
+        return self.getControlValue("intel-action")
 
     def getAction1State(self):
-        if not self.hasGamepad(): return False
-        return self.gamepads[self.usedGamepadID].findButton(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["action1"]).state == InputDevice.S_down
+        if not self.active: return False
+        return self.getControlValue("action1")
 
     def getSprintState(self):
-        if not self.hasGamepad(): return False
-        return self.nunchuk.findButton(self.core.getConfig("deviceMap")["Nintendo Wii Remote"]["sprint"]).state == InputDevice.S_down
+        if not self.active: return False
+        return self.getControlValue("sprint")
+
+    def getWalkState(self):
+        if not self.active: return False
+        return self.getControlValue("walk")
@@ -270,6 +270,13 @@ class Main(ShowBase):
         # THE CHARACTER
         #
         self.playerController = PlayerController(self.world, "../data/config.json")
+        # let the character know about the moving platforms so it
+        # doesn't have to search for them in the scene graph
+        for platform in getattr(self, "platforms", []):
+            self.playerController.registerPlatform(platform)
+        # index the static level collisions so the step and free space
+        # checks only need to test the geometry around the character
+        self.playerController.buildCollisionIndex(render)
         self.playerController.startPlayer()
         # find the start position for the character
         startpos = self.level.find("**/StartPos").getPos()